@@ -1,15 +1,28 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
+from flask.globals import request_ctx
+import contextvars
+import multiprocessing
 import os
+import queue
+import shutil
+import sys
 import tempfile
+import threading
+import time
+from functools import wraps
 import base64
 from io import BytesIO
 from OCC.Core.STEPControl import STEPControl_Reader
 from OCC.Core.IFSelect import IFSelect_RetDone
-from OCC.Core.BRep import BRep_Tool
+from OCC.Core.BRep import BRep_Builder, BRep_Tool
 from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
 from OCC.Core.TopLoc import TopLoc_Location
 from OCC.Core.BRepTools import BRepTools_WireExplorer
+from OCC.Core.BinTools import bintools_Read, bintools_Write
 from OCC.Core.TopAbs import (
+    TopAbs_IN,
+    TopAbs_ON,
+    TopAbs_REVERSED,
     TopAbs_VERTEX,
     TopAbs_EDGE,
     TopAbs_FACE,
@@ -19,11 +32,12 @@ from OCC.Core.TopAbs import (
     TopAbs_COMPOUND,
     TopAbs_COMPSOLID,
 )
-from OCC.Core.TopExp import TopExp_Explorer, topexp_MapShapesAndAncestors
+from OCC.Core.TopExp import TopExp_Explorer, topexp_MapShapes, topexp_MapShapesAndAncestors
 from OCC.Core.TopTools import (
     TopTools_ListOfShape,
     TopTools_ListIteratorOfListOfShape,
     TopTools_IndexedDataMapOfShapeListOfShape,
+    TopTools_IndexedMapOfShape,
 )
 from OCC.Core.TopoDS import (
     topods,
@@ -45,23 +59,33 @@ from OCC.Core.TopoDS import (
 # Additional imports for rendering
 from OCC.Core.Bnd import Bnd_Box
 from OCC.Core.BRepBndLib import brepbndlib_Add
-from OCC.Core.gp import gp_Trsf, gp_Pnt, gp_Dir
-from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_Transform, BRepBuilderAPI_MakeVertex
-from OCC.Core.Graphic3d import Graphic3d_TOSM_FRAGMENT, Graphic3d_NameOfMaterial, Graphic3d_MaterialAspect
-from OCC.Display.OCCViewer import Viewer3d
-from OCC.Core.Quantity import Quantity_Color, Quantity_TOC_RGB, Quantity_NOC_RED
-from OCC.Core.AIS import AIS_Shape
-from OCC.Extend.TopologyUtils import TopologyExplorer
-from OCC.Core.BRepAdaptor import BRepAdaptor_Surface
+from OCC.Core.gp import gp_Pnt, gp_Dir, gp_Pnt2d, gp_Vec
+from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_MakeVertex
+from OCC.Core.BRepAdaptor import BRepAdaptor_Curve, BRepAdaptor_Curve2d, BRepAdaptor_Surface
+from OCC.Core.BRepGProp import brepgprop_LinearProperties, brepgprop_SurfaceProperties
+from OCC.Core.GProp import GProp_GProps
+from OCC.Core.BRepTopAdaptor import BRepTopAdaptor_FClass2d
 from OCC.Core.GeomAbs import (
     GeomAbs_Plane, GeomAbs_Cylinder, GeomAbs_Cone, GeomAbs_Sphere,
     GeomAbs_Torus, GeomAbs_SurfaceOfRevolution, GeomAbs_SurfaceOfExtrusion,
-    GeomAbs_BezierSurface, GeomAbs_BSplineSurface
+    GeomAbs_BezierSurface, GeomAbs_BSplineSurface, GeomAbs_OffsetSurface,
+    GeomAbs_Line, GeomAbs_Circle, GeomAbs_Ellipse, GeomAbs_Hyperbola, GeomAbs_Parabola,
+    GeomAbs_BezierCurve, GeomAbs_BSplineCurve, GeomAbs_OffsetCurve
 )
 import numpy as np
-from math import cos, sin, radians
+from math import cos, isfinite, sin, sqrt, radians
 import zipfile
 import glob
+import json
+import hashlib
+import fcntl
+from step_prescan import prescan_step_file, estimate_step_cost
+from mesh_arrays import closest_points_on_mesh_2d, encode_glb, grid_parameters, weld_mesh
+from artifact_store import ArtifactStore, BrepArrayWriter, FaceResultCache
+from instrumentation import DeadlineExceeded, MetricsRegistry, StageTimer
+from topology_arrays import (CURVE_TYPE_NAMES, EDGE_CONVEXITY_CODES, SURFACE_TYPE_NAMES, CoedgeTable, CompactTopology,
+                             CsrRelation, classify_convexity, dual_graphs, resolve_graph_format)
+from worker_pool import WorkerPool
 
 class WireExplorer(object):
     """
@@ -83,7 +107,7 @@ class WireExplorer(object):
             self._reinitialize()
         topologyType = topods_Edge if edges else topods_Vertex
         seq = []
-        hashes = []  # list that stores hashes to avoid redundancy
+        hashes = set()  # set that stores hashes to avoid redundancy
         occ_seq = TopTools_ListOfShape()
         while self.wire_explorer.More():
             # loop edges
@@ -94,7 +118,7 @@ class WireExplorer(object):
                 current_item = self.wire_explorer.CurrentVertex()
             current_item_hash = current_item.__hash__()
             if not current_item_hash in hashes:
-                hashes.append(current_item_hash)
+                hashes.add(current_item_hash)
                 occ_seq.Append(current_item)
             self.wire_explorer.Next()
 
@@ -165,14 +189,14 @@ class Topo(object):
         elif topologyTypeToAvoid:
             self.topExp.Init(topologicalEntity, topologyType, topologyTypeToAvoid)
         seq = []
-        hashes = []  # list that stores hashes to avoid redundancy
+        hashes = set()  # set that stores hashes to avoid redundancy
         occ_seq = TopTools_ListOfShape()
         while self.topExp.More():
             current_item = self.topExp.Current()
             current_item_hash = current_item.__hash__()
 
             if not current_item_hash in hashes:
-                hashes.append(current_item_hash)
+                hashes.add(current_item_hash)
                 occ_seq.Append(current_item)
 
             self.topExp.Next()
@@ -253,7 +277,6 @@ class Topo(object):
 # === Rendering Configuration === #
 IMAGE_SIZE = (1280, 960)
 RENDERS_FOLDER = './renders'
-os.makedirs(RENDERS_FOLDER, exist_ok=True)
 
 # View directions for orbit rendering
 CAMERA_VIEWS = {
@@ -266,33 +289,38 @@ CAMERA_VIEWS = {
     "iso": gp_Dir(1, -1, 1),
 }
 
-def normalize_shape(shape):
-    """Normalize shape into [-1, 1]^3 bounding box"""
-    bbox = Bnd_Box()
-    brepbndlib_Add(shape, bbox)
-    xmin, ymin, zmin, xmax, ymax, zmax = bbox.Get()
+# Surface and curve type codes shared by render coloring and the attribute tables
+SURFACE_TYPE_CODES = {
+    GeomAbs_Plane: 0,
+    GeomAbs_Cylinder: 1,
+    GeomAbs_Cone: 2,
+    GeomAbs_Sphere: 3,
+    GeomAbs_Torus: 4,
+    GeomAbs_SurfaceOfRevolution: 5,
+    GeomAbs_SurfaceOfExtrusion: 6,
+    GeomAbs_BezierSurface: 7,
+    GeomAbs_BSplineSurface: 8,
+    GeomAbs_OffsetSurface: 9,
+}
+
+CURVE_TYPE_CODES = {
+    GeomAbs_Line: 0,
+    GeomAbs_Circle: 1,
+    GeomAbs_Ellipse: 2,
+    GeomAbs_Hyperbola: 3,
+    GeomAbs_Parabola: 4,
+    GeomAbs_BezierCurve: 5,
+    GeomAbs_BSplineCurve: 6,
+    GeomAbs_OffsetCurve: 7,
+}
 
-    center = gp_Pnt((xmin + xmax) / 2, (ymin + ymax) / 2, (zmin + zmax) / 2)
-    scale = 2.0 / max(xmax - xmin, ymax - ymin, zmax - zmin)
-    trsf = gp_Trsf()
-    trsf.SetScale(center, scale)
-    return BRepBuilderAPI_Transform(shape, trsf, True).Shape()
 
 def get_face_type_code(face):
     """Get surface type code for face coloring"""
     surf = BRepAdaptor_Surface(face, True)
     surf_type = surf.GetType()
-    return {
-        GeomAbs_Plane: 0,
-        GeomAbs_Cylinder: 1,
-        GeomAbs_Cone: 2,
-        GeomAbs_Sphere: 3,
-        GeomAbs_Torus: 4,
-        GeomAbs_SurfaceOfRevolution: 5,
-        GeomAbs_SurfaceOfExtrusion: 6,
-        GeomAbs_BezierSurface: 7,
-        GeomAbs_BSplineSurface: 8
-    }.get(surf_type, 7)  # fallback to Bezier for unknowns
+    code = SURFACE_TYPE_CODES.get(surf_type, 7)  # fallback to Bezier for unknowns
+    return code if code < 9 else 7
 
 def generate_face_membership_colors(face_ids):
     """Generate colors for face membership visualization"""
@@ -318,9 +346,13 @@ def generate_face_type_colors(face_types):
     ]
     return np.array([type_colors[ft] if ft < len(type_colors) else [0.5, 0.5, 0.5] for ft in face_types])
 
-def assign_face_colors(shape: TopoDS_Shape, mode="uniform"):
+def assign_face_colors(shape: TopoDS_Shape, mode="uniform", faces=None):
     """Assign colors to faces based on the specified mode"""
-    faces = list(TopologyExplorer(shape).faces())
+    from OCC.Core.Quantity import Quantity_Color, Quantity_TOC_RGB
+    from OCC.Extend.TopologyUtils import TopologyExplorer
+
+    if faces is None:
+        faces = list(TopologyExplorer(shape).faces())
     color_map = []
 
     if mode == "uniform":
@@ -342,8 +374,9 @@ def assign_face_colors(shape: TopoDS_Shape, mode="uniform"):
 
     return list(zip(faces, color_map))
 
-def render_step_model(shape, output_dir, model_name, render_options=None):
-    """Render STEP model to multiple view images"""
+def render_step_model(shape, output_dir, model_name, render_options=None, timer=None):
+    """Render STEP model (a shape or ShapeModel) to multiple view images"""
+    timer = timer or StageTimer()
     if render_options is None:
         render_options = {
             'face_coloring_mode': 'uniform',
@@ -352,9 +385,17 @@ def render_step_model(shape, output_dir, model_name, render_options=None):
             'num_orbit_views': 12
         }
     
-    # Normalize shape
-    shape = normalize_shape(shape)
-    
+    with timer.stage('scene'):
+        return _render_step_model(as_shape_model(shape), output_dir, model_name, render_options, timer)
+
+
+def _render_step_model(model, output_dir, model_name, render_options, timer):
+    # The display stack is imported on first render only, see load_render_stack
+    from OCC.Core.AIS import AIS_Shape
+    from OCC.Core.Graphic3d import Graphic3d_TOSM_FRAGMENT, Graphic3d_NameOfMaterial, Graphic3d_MaterialAspect
+    from OCC.Core.Quantity import Quantity_Color, Quantity_TOC_RGB, Quantity_NOC_RED
+    from OCC.Display.OCCViewer import Viewer3d
+
     # Create renderer
     renderer = Viewer3d()
     renderer.Create()
@@ -363,9 +404,12 @@ def render_step_model(shape, output_dir, model_name, render_options=None):
     renderer.SetModeShaded()
     renderer.View.SetShadingModel(Graphic3d_TOSM_FRAGMENT)
 
+    # Faces whose mesh came from the face cache or shards are tessellated like the rest
+    model.triangulate(timer)
+
     # Render faces with coloring
     face_coloring_mode = render_options.get('face_coloring_mode', 'uniform')
-    for face, color in assign_face_colors(shape, mode=face_coloring_mode):
+    for face, color in assign_face_colors(model.shape, mode=face_coloring_mode, faces=model.faces):
         face_ais = AIS_Shape(face)
         face_ais.SetMaterial(Graphic3d_MaterialAspect(Graphic3d_NameOfMaterial.Graphic3d_NOM_PLASTIC))
         face_ais.SetTransparency(0.2)  # subtle transparency
@@ -375,7 +419,7 @@ def render_step_model(shape, output_dir, model_name, render_options=None):
     # Render edges if requested
     if render_options.get('show_edges', True):
         edge_color = Quantity_Color(0.0, 0.0, 0.0, Quantity_TOC_RGB)
-        for edge in TopologyExplorer(shape).edges():
+        for edge in model.edges:
             edge_ais = AIS_Shape(edge)
             edge_ais.SetMaterial(Graphic3d_MaterialAspect(Graphic3d_NameOfMaterial.Graphic3d_NOM_PLASTIC))
             edge_ais.SetWidth(4.0)  # thicker edges
@@ -385,7 +429,7 @@ def render_step_model(shape, output_dir, model_name, render_options=None):
     # Render vertices if requested
     if render_options.get('show_vertices', True):
         vertex_color = Quantity_Color(Quantity_NOC_RED)
-        for vertex in TopologyExplorer(shape).vertices():
+        for vertex in model.vertices:
             pnt = BRep_Tool.Pnt(vertex)  # Extract gp_Pnt from TopoDS_Vertex
             vertex_shape = BRepBuilderAPI_MakeVertex(pnt).Shape()
             vertex_ais = AIS_Shape(vertex_shape)
@@ -397,23 +441,26 @@ def render_step_model(shape, output_dir, model_name, render_options=None):
     renderer.FitAll()
     renderer.Repaint()
 
-    # Generate orbit views
+    # Generate orbit views around the bounding box center; FitAll frames the
+    # shape, so the model is rendered in place instead of a normalized copy
     rendered_files = []
-    radius = 3.0
+    xmin, ymin, zmin, xmax, ymax, zmax = model.bounds()
+    radius = 1.5 * max(xmax - xmin, ymax - ymin, zmax - zmin, 1e-6)
     inclination_deg = 45
     inclination_rad = radians(inclination_deg)
-    center = gp_Pnt(0, 0, 0)
+    center = gp_Pnt((xmin + xmax) / 2, (ymin + ymax) / 2, (zmin + zmax) / 2)
     
     num_views = render_options.get('num_orbit_views', 12)
     angle_step = 360 // num_views
+    view_angles = range(0, 360, angle_step)
 
-    for i, theta_deg in enumerate(range(0, 360, angle_step)):
+    for i, theta_deg in enumerate(view_angles):
         theta_rad = radians(theta_deg)
         x = radius * cos(theta_rad) * cos(inclination_rad)
         y = radius * sin(theta_rad) * cos(inclination_rad)
         z = radius * sin(inclination_rad)
 
-        eye = gp_Pnt(x, y, z)
+        eye = gp_Pnt(center.X() + x, center.Y() + y, center.Z() + z)
         renderer.camera.SetEye(eye)
         renderer.camera.SetCenter(center)
         renderer.camera.SetUp(gp_Dir(0, 0, 1))  # Z-up
@@ -422,23 +469,861 @@ def render_step_model(shape, output_dir, model_name, render_options=None):
 
         filename = f"{model_name}_orbit_{i:02d}.png"
         filepath = os.path.join(output_dir, filename)
-        renderer.View.Dump(filepath)
+        with timer.stage('render'):
+            renderer.View.Dump(filepath)
         rendered_files.append(filepath)
+        timer.progress('views', len(rendered_files), len(view_angles))
+
+    timer.count('views', len(rendered_files))
 
     return rendered_files
 
 app = Flask(__name__)
 UPLOAD_FOLDER = './uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 
-def extract_face_data(face):
-    """Extract triangulation data from a face"""
-    # Mesh the face for triangulation
-    BRepMesh_IncrementalMesh(face, 0.01)
-    
+# === Worker roles === #
+# 'parse' workers never import the display/graphics modules and run without an
+# X server; 'render' workers load them at startup; 'all' loads them on first use.
+WORKER_ROLES = ('all', 'parse', 'render')
+WORKER_ROLE = os.environ.get('WORKER_ROLE', 'all').lower()
+if WORKER_ROLE not in WORKER_ROLES:
+    raise ValueError(f"Unknown WORKER_ROLE '{WORKER_ROLE}', expected one of: {', '.join(WORKER_ROLES)}")
+
+
+def load_render_stack():
+    """Import the display and graphics modules used for rendering"""
+    import OCC.Core.AIS
+    import OCC.Core.Graphic3d
+    import OCC.Core.Quantity
+    import OCC.Display.OCCViewer
+    import OCC.Extend.TopologyUtils
+
+
+def render_stack_loaded():
+    return 'OCC.Display.OCCViewer' in sys.modules
+
+
+def serves_role(role):
+    return WORKER_ROLE in ('all', role)
+
+
+def worker_role(role):
+    """
+    Only serve the decorated endpoint in workers of this role (or 'all').
+    role may also be a function returning the roles the current request needs.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            for needed in (role() if callable(role) else (role,)):
+                if not serves_role(needed):
+                    return jsonify({
+                        'error': f"This worker does not serve {needed} requests",
+                        'role': WORKER_ROLE
+                    }), 503
+            return view(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+if WORKER_ROLE == 'render':
+    load_render_stack()
+
+
+# === Render artifact store === #
+RENDERS_MAX_BYTES = int(float(os.environ.get('RENDERS_MAX_MB', '2048')) * 2**20)
+RENDERS_TTL_SECONDS = float(os.environ.get('RENDERS_TTL_SECONDS', str(24 * 3600)))
+RENDERS_SWEEP_INTERVAL = float(os.environ.get('RENDERS_SWEEP_INTERVAL', '300'))
+
+RENDER_STORE = ArtifactStore(RENDERS_FOLDER, RENDERS_MAX_BYTES, RENDERS_TTL_SECONDS)
+
+
+@app.route('/renders', methods=['GET'])
+@worker_role('render')
+def list_renders():
+    """Usage of the render artifact store"""
+    return jsonify(RENDER_STORE.usage())
+
+
+@app.route('/renders/<render_id>', methods=['GET'])
+@app.route('/renders/<render_id>/<filename>', methods=['GET'])
+@worker_role('render')
+def get_render(render_id, filename=None):
+    """Download a finished render (or one of its images) by id, with Range and ETag support"""
+    manifest = RENDER_STORE.get(render_id)
+    if manifest is None:
+        return jsonify({'error': f"Unknown or expired render '{render_id}'"}), 404
+
+    path = RENDER_STORE.file_path(render_id, filename or manifest['primary'])
+    if path is None:
+        return jsonify({'error': f"Render '{render_id}' has no file '{filename}'"}), 404
+
+    download_name = manifest['download_name'] if filename is None else filename
+    response = send_file(path, as_attachment=True, download_name=download_name,
+                         conditional=True, etag=True, max_age=int(RENDERS_TTL_SECONDS))
+    response.headers['X-Render-Id'] = render_id
+    return response
+
+
+# === Memory-mapped result store === #
+RESULTS_FOLDER = './results'
+RESULTS_MAX_BYTES = int(float(os.environ.get('RESULTS_MAX_MB', '8192')) * 2**20)
+RESULTS_TTL_SECONDS = float(os.environ.get('RESULTS_TTL_SECONDS', str(6 * 3600)))
+RESULTS_SWEEP_INTERVAL = float(os.environ.get('RESULTS_SWEEP_INTERVAL', '300'))
+
+RESULT_STORE = ArtifactStore(RESULTS_FOLDER, RESULTS_MAX_BYTES, RESULTS_TTL_SECONDS)
+
+
+@app.route('/results/<result_id>', methods=['GET'])
+@app.route('/results/<result_id>/<filename>', methods=['GET'])
+@worker_role('parse')
+def get_result(result_id, filename=None):
+    """Manifest of a stored result, or one of its .npy arrays with Range and ETag support"""
+    manifest = RESULT_STORE.get(result_id)
+    if manifest is None:
+        return jsonify({'error': f"Unknown or expired result '{result_id}'"}), 404
+    if filename is None:
+        return jsonify(manifest)
+
+    path = RESULT_STORE.file_path(result_id, filename)
+    if path is None:
+        return jsonify({'error': f"Result '{result_id}' has no file '{filename}'"}), 404
+    response = send_file(path, mimetype='application/octet-stream', as_attachment=True, download_name=filename,
+                         conditional=True, etag=True, max_age=int(RESULTS_TTL_SECONDS))
+    response.headers['X-Result-Id'] = result_id
+    return response
+
+
+# === Request instrumentation === #
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+ENTITY_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+# Optional JSON-lines log of incoming requests that loadtest.py can replay
+REQUEST_LOG = os.environ.get('REQUEST_LOG')
+_request_log_lock = threading.Lock()
+
+METRICS = MetricsRegistry()
+METRICS.histogram('step_request_duration_seconds', 'End-to-end request latency', LATENCY_BUCKETS)
+METRICS.histogram('step_stage_duration_seconds', 'Time spent per pipeline stage', LATENCY_BUCKETS)
+METRICS.histogram('step_request_entities', 'Entities processed per request', ENTITY_BUCKETS)
+
+
+def read_step_file(filepath, timer=None):
+    """Read and transfer a STEP file, returning None if it cannot be read"""
+    timer = timer or StageTimer()
+
+    reader = STEPControl_Reader()
+    # ReadFile and TransferRoot cannot be interrupted; the deadline is checked around them
+    with timer.stage('read'):
+        status = reader.ReadFile(filepath)
+
+    if status != IFSelect_RetDone:
+        return None
+
+    with timer.stage('transfer'):
+        reader.TransferRoot()
+        shape = reader.OneShape()
+    return shape
+
+
+# === Request deadlines === #
+# Work past the deadline stops at the next stage boundary with a 504. OCC calls
+# cannot be interrupted from Python (the 7.5 bindings do not let Python subclass
+# Message_ProgressIndicator), so a worker still busy DEADLINE_GRACE_SECONDS
+# later is stuck inside one and exits; gunicorn forks a replacement.
+REQUEST_DEADLINE_SECONDS = float(os.environ.get('REQUEST_DEADLINE_SECONDS', '600'))
+DEADLINE_GRACE_SECONDS = float(os.environ.get('DEADLINE_GRACE_SECONDS', '60'))
+MESH_CHUNK_FACES = int(os.environ.get('MESH_CHUNK_FACES', '500'))
+
+_armed_deadlines = {}  # thread id -> (hard deadline, request path)
+_armed_deadlines_lock = threading.Lock()
+_deadline_watchdog = None
+
+
+def resolve_deadline(value):
+    """Deadline in seconds for a request: the `deadline` it asks for, capped by REQUEST_DEADLINE_SECONDS"""
+    if value is None or value == '':
+        return REQUEST_DEADLINE_SECONDS or None
+    seconds = float(value)
+    if not isfinite(seconds) or seconds <= 0:
+        raise ValueError(f"deadline must be a positive number of seconds, got '{value}'")
+    return min(seconds, REQUEST_DEADLINE_SECONDS) if REQUEST_DEADLINE_SECONDS else seconds
+
+
+def arm_deadline_watchdog(timer, path):
+    """Have the watchdog end this worker if the request overruns its deadline by the grace period"""
+    global _deadline_watchdog
+    if timer.deadline is None:
+        return
+    with _armed_deadlines_lock:
+        _armed_deadlines[threading.get_ident()] = (timer.deadline + DEADLINE_GRACE_SECONDS, path)
+        if _deadline_watchdog is None:
+            _deadline_watchdog = threading.Thread(target=_watch_deadlines, name='deadline-watchdog', daemon=True)
+            _deadline_watchdog.start()
+
+
+def disarm_deadline_watchdog():
+    with _armed_deadlines_lock:
+        _armed_deadlines.pop(threading.get_ident(), None)
+
+
+def _watch_deadlines():
+    while True:
+        time.sleep(1.0)
+        now = time.perf_counter()
+        with _armed_deadlines_lock:
+            overdue = [(ident, path) for ident, (deadline, path) in _armed_deadlines.items() if now > deadline]
+            for ident, path in overdue:
+                _armed_deadlines.pop(ident)
+        for ident, path in overdue:
+            print(f"[deadline] {path} is still running {DEADLINE_GRACE_SECONDS:g}s past its deadline", flush=True)
+            # Only a supervised worker can be replaced; the development server keeps running
+            if 'gunicorn' in sys.modules:
+                record_recycle_event('deadline')
+                os._exit(1)
+
+
+@app.errorhandler(DeadlineExceeded)
+def deadline_exceeded(e):
+    timer = g.get('timer')
+    return jsonify({
+        'error': str(e),
+        'stage': e.stage,
+        'deadline_seconds': e.deadline_seconds,
+        'timings': timer.stages if timer else {}
+    }), 504
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.rss_before = current_rss_bytes()
+    try:
+        deadline = resolve_deadline(request.values.get('deadline'))
+    except ValueError as e:
+        g.timer = StageTimer()
+        return jsonify({'error': f"Invalid deadline: {str(e)}"}), 400
+    g.timer = StageTimer(deadline)
+    arm_deadline_watchdog(g.timer, request.path)
+
+
+@app.teardown_request
+def stop_deadline_watchdog(exc):
+    disarm_deadline_watchdog()
+
+
+@app.after_request
+def record_request_timings(response):
+    timer = g.get('timer')
+    if timer is None or request.endpoint in (None, 'metrics', 'static'):
+        return response
+    if g.get('progress_stream'):
+        # The work has not run yet; the stream records it when it ends
+        return response
+
+    total = time.perf_counter() - g.request_start
+    response.headers['Server-Timing'] = timer.server_timing(total)
+    record_request_metrics(response.status_code, total)
+    return response
+
+
+def record_request_metrics(status_code, total):
+    """Observe a finished request's duration, stages, entities and memory"""
+    timer = g.timer
+    endpoint = request.endpoint
+    METRICS.observe('step_request_duration_seconds', total,
+                    endpoint=endpoint, status=str(status_code))
+    for name, seconds in timer.stages.items():
+        METRICS.observe('step_stage_duration_seconds', seconds, endpoint=endpoint, stage=name)
+    for name, value in timer.counts.items():
+        METRICS.observe('step_request_entities', value, endpoint=endpoint, entity=name)
+
+    # Track worker memory per request; gunicorn.conf.py recycles on the watermark
+    rss_after = current_rss_bytes()
+    METRICS.observe('step_request_rss_growth_bytes', max(0, rss_after - g.rss_before), endpoint=endpoint)
+    stats = worker_stats()
+    stats.record_request(g.rss_before, rss_after)
+    stats.publish_state()
+
+    if REQUEST_LOG and request.method == 'POST':
+        record = {
+            'timestamp': time.time(),
+            'endpoint': request.full_path.rstrip('?'),
+            'files': [f.filename for f in request.files.values() if f.filename],
+            'form': request.form.to_dict(),
+            'status': status_code,
+            'duration': total
+        }
+        with _request_log_lock, open(REQUEST_LOG, 'a') as log:
+            log.write(json.dumps(record) + '\n')
+
+    if timer.stages:
+        stages = ' '.join(f"{name}={seconds:.3f}s" for name, seconds in timer.stages.items())
+        print(f"[{request.path.strip('/')}] {status_code} in {total:.3f}s ({stages})", flush=True)
+
+
+# === Progress streams === #
+# Clients opt in with progress=sse or Accept: text/event-stream and get
+# 'estimate', 'stage' and 'progress' events while the request runs, then a
+# final 'result' event with the status and JSON body (or render id).
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def wants_progress_stream():
+    return request.values.get('progress') == 'sse' or request.accept_mimetypes.best == 'text/event-stream'
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_result(response):
+    """Payload of the final 'result' event for a finished view's response"""
+    data = {'status': response.status_code}
+    body = response.get_json(silent=True)
+    if body is not None:
+        data['body'] = body
+    render_id = response.headers.get('X-Render-Id')
+    if render_id:
+        data['render_id'] = render_id
+        data['url'] = f"/renders/{render_id}"
+    response.close()
+    return data
+
+
+def progress_stream(view):
+    """Serve a view as a Server-Sent Events progress stream when the client asks for one"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not wants_progress_stream():
+            return view(*args, **kwargs)
+
+        timer = g.timer
+        events = queue.Queue()
+        timer.listeners.append(events.put)
+        done = object()
+
+        def run():
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except DeadlineExceeded as e:
+                response = app.make_response(deadline_exceeded(e))
+            except Exception as e:
+                response = app.make_response((jsonify({'error': str(e)}), 500))
+            events.put(('result', stream_result(response)))
+            events.put(done)
+
+        # The view runs in its own thread but in this request's context (same request and g).
+        # Hold that context until the response is closed: popping it when this function
+        # returns would close the uploaded files and run the teardown handlers (releasing
+        # the heavy slot) before the view has even started
+        ctx = request_ctx._get_current_object()
+        ctx.push()
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True)
+        g.progress_stream = True
+
+        def generate():
+            status = 500
+            worker.start()
+            try:
+                while True:
+                    try:
+                        item = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+                    except queue.Empty:
+                        # Comment lines keep proxies from timing out a quiet stream
+                        yield ': keepalive\n\n'
+                        continue
+                    if item is done:
+                        break
+                    event, data = item
+                    if event == 'result':
+                        status = data['status']
+                        data['timings'] = timer.stages
+                    yield sse_event(event, data)
+            finally:
+                # A client that hangs up does not stop the work; keep the context until it ends
+                worker.join()
+                record_request_metrics(status, time.perf_counter() - g.request_start)
+
+        response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.call_on_close(ctx.pop)
+        return response
+    return wrapper
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus-style metrics for request latency, stage timings and entity counts"""
+    # Merge the snapshots every worker publishes so any worker can answer the scrape;
+    # metrics_retired.json holds the totals of workers that have exited
+    snapshots = []
+    for path in glob.glob(os.path.join(WORKER_STATE_DIR, 'metrics_*.json')):
+        if path.endswith(f"metrics_{os.getpid()}.json"):
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    body = METRICS.render(snapshots) + render_worker_metrics()
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
+# === Worker memory tracking === #
+# OCC does not reliably hand memory back to the OS, so long-lived workers are
+# recycled once they pass an RSS watermark or a request count (see gunicorn.conf.py).
+WORKER_RSS_WATERMARK_MB = float(os.environ.get('WORKER_RSS_WATERMARK_MB', '2048'))
+WORKER_MAX_REQUESTS = int(os.environ.get('WORKER_MAX_REQUESTS', '500'))
+WORKER_STATE_DIR = os.environ.get('WORKER_STATE_DIR', './worker_state')
+# Seconds between state and metrics snapshots while the recycle status is unchanged
+WORKER_STATE_INTERVAL = float(os.environ.get('WORKER_STATE_INTERVAL', '5'))
+RECYCLE_LOG = os.path.join(WORKER_STATE_DIR, 'recycle_events.jsonl')
+
+RSS_BUCKETS = tuple(mb * 2**20 for mb in (1, 4, 16, 64, 256, 1024, 4096))
+METRICS.histogram('step_request_rss_growth_bytes', 'Worker RSS growth per request', RSS_BUCKETS)
+
+
+# Current RSS needs /proc; elsewhere only the peak is known, which never drops
+# after a large request, so recycling on it would loop
+RSS_FROM_PROC = os.path.exists('/proc/self/statm')
+if not RSS_FROM_PROC:
+    print("[workers] /proc is unavailable: reporting peak RSS and disabling RSS watermark recycling", flush=True)
+
+
+def current_rss_bytes():
+    """Resident set size of this process in bytes (the peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def pid_alive(pid):
+    """Check whether a process with this PID still exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WorkerStats(object):
+    """
+    Memory and request counters of the current worker process
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.started_at = time.time()
+        self.requests = 0
+        self.rss = current_rss_bytes()
+        self.peak_rss = self.rss
+        self.recycling = None
+        self._published_at = None      # time.monotonic() of the last write_state
+        self._published_reason = None  # recycle_reason() at the last write_state
+
+    def record_request(self, rss_before, rss_after):
+        self.requests += 1
+        self.rss = rss_after
+        self.peak_rss = max(self.peak_rss, rss_after)
+
+    def recycle_reason(self):
+        """Why this worker should be recycled, or None"""
+        if RSS_FROM_PROC and self.rss > WORKER_RSS_WATERMARK_MB * 2**20:
+            return 'rss_watermark'
+        if WORKER_MAX_REQUESTS and self.requests >= WORKER_MAX_REQUESTS:
+            return 'max_requests'
+        return None
+
+    def to_dict(self):
+        return {
+            'pid': self.pid,
+            'role': WORKER_ROLE,
+            'started_at': self.started_at,
+            'requests': self.requests,
+            'rss_bytes': self.rss,
+            'peak_rss_bytes': self.peak_rss,
+            'recycling': self.recycling
+        }
+
+    def write_state(self):
+        """Publish this worker's counters and metrics for the other workers to report"""
+        write_json_atomic(os.path.join(WORKER_STATE_DIR, f"worker_{self.pid}.json"), self.to_dict())
+        write_json_atomic(os.path.join(WORKER_STATE_DIR, f"metrics_{self.pid}.json"), METRICS.snapshot())
+        self._published_at = time.monotonic()
+        self._published_reason = self.recycle_reason()
+
+    def publish_state(self):
+        """
+        write_state after a request, but only when the recycle status changed or
+        WORKER_STATE_INTERVAL has passed since the last write; returns whether it wrote
+        """
+        if (self._published_at is not None and self.recycle_reason() == self._published_reason
+                and time.monotonic() - self._published_at < WORKER_STATE_INTERVAL):
+            return False
+        self.write_state()
+        return True
+
+
+_worker_stats = None
+
+
+def worker_stats():
+    """Stats of the current process; workers forked from a preloaded app get fresh ones"""
+    global _worker_stats
+    if _worker_stats is None or _worker_stats.pid != os.getpid():
+        _worker_stats = WorkerStats()
+    return _worker_stats
+
+
+def write_json_atomic(path, data):
+    """Write JSON through a temp file and rename so readers never see partial files"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def record_recycle_event(reason, stats=None):
+    """Log that a worker is being recycled, draining its in-flight work first"""
+    stats = stats or worker_stats()
+    stats.recycling = reason
+    event = {
+        'timestamp': time.time(),
+        'pid': stats.pid,
+        'reason': reason,
+        'requests': stats.requests,
+        'rss_bytes': stats.rss,
+        'peak_rss_bytes': stats.peak_rss
+    }
+    with open(RECYCLE_LOG, 'a') as log:
+        log.write(json.dumps(event) + '\n')
+    stats.write_state()
+    print(f"[worker {stats.pid}] recycling ({reason}) after {stats.requests} requests, "
+          f"rss {stats.rss / 2**20:.0f} MiB", flush=True)
+    return event
+
+
+def read_recycle_events(limit=None):
+    """Recycle events logged by all workers, oldest first"""
+    if not os.path.exists(RECYCLE_LOG):
+        return []
+    with open(RECYCLE_LOG) as log:
+        events = [json.loads(line) for line in log if line.strip()]
+    return events[-limit:] if limit else events
+
+
+def read_worker_states():
+    """Latest published state of every live worker"""
+    states = []
+    for path in glob.glob(os.path.join(WORKER_STATE_DIR, 'worker_*.json')):
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if pid_alive(state['pid']):
+            states.append(state)
+        else:
+            os.remove(path)
+    return sorted(states, key=lambda state: state['pid'])
+
+
+def render_worker_metrics():
+    """Prometheus gauges for worker memory, watermarks and recycle counts"""
+    lines = [
+        '# HELP step_worker_rss_bytes Current resident set size per worker',
+        '# TYPE step_worker_rss_bytes gauge'
+    ]
+    states = read_worker_states()
+    for state in states:
+        lines.append(f'step_worker_rss_bytes{{pid="{state["pid"]}"}} {state["rss_bytes"]}')
+    lines += [
+        '# HELP step_worker_requests Requests handled per worker since it started',
+        '# TYPE step_worker_requests gauge'
+    ]
+    for state in states:
+        lines.append(f'step_worker_requests{{pid="{state["pid"]}"}} {state["requests"]}')
+    lines += [
+        '# HELP step_worker_rss_watermark_bytes RSS at which a worker is recycled',
+        '# TYPE step_worker_rss_watermark_bytes gauge',
+        f'step_worker_rss_watermark_bytes {int(WORKER_RSS_WATERMARK_MB * 2**20)}',
+        '# HELP step_worker_max_requests Requests after which a worker is recycled',
+        '# TYPE step_worker_max_requests gauge',
+        f'step_worker_max_requests {WORKER_MAX_REQUESTS}',
+        '# HELP step_worker_recycles_total Worker recycle events by reason',
+        '# TYPE step_worker_recycles_total counter'
+    ]
+    counts = {}
+    for event in read_recycle_events():
+        counts[event['reason']] = counts.get(event['reason'], 0) + 1
+    for reason, count in sorted(counts.items()):
+        lines.append(f'step_worker_recycles_total{{reason="{reason}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+@app.route('/workers', methods=['GET'])
+def workers():
+    """Memory watermarks, live worker states and recent recycle events"""
+    return jsonify({
+        'watermarks': {
+            'rss_bytes': int(WORKER_RSS_WATERMARK_MB * 2**20),
+            'max_requests': WORKER_MAX_REQUESTS
+        },
+        'current_pid': os.getpid(),
+        'workers': read_worker_states(),
+        'recycle_events': read_recycle_events(limit=100)
+    })
+
+
+# === Admission control === #
+# Uploads are pre-scanned (step_prescan) before any OCC call. Files past the
+# cost or face limits are rejected with 413; heavy files wait for one of
+# HEAVY_JOB_SLOTS slots shared by all workers through file locks.
+STEP_MAX_COST = float(os.environ.get('STEP_MAX_COST', '0'))  # 0 disables the limit
+STEP_MAX_FACES = int(os.environ.get('STEP_MAX_FACES', '0'))
+STEP_HEAVY_COST = float(os.environ.get('STEP_HEAVY_COST', '20000'))
+HEAVY_JOB_SLOTS = int(os.environ.get('HEAVY_JOB_SLOTS', '1'))
+HEAVY_JOB_QUEUE_TIMEOUT = float(os.environ.get('HEAVY_JOB_QUEUE_TIMEOUT', '300'))
+
+COST_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+METRICS.histogram('step_request_estimated_cost', 'Pre-scan cost estimate per uploaded file', COST_BUCKETS)
+
+
+def acquire_heavy_slot(timeout):
+    """Take a cross-worker heavy job slot, returning the locked file or None on timeout"""
+    deadline = time.time() + timeout
+    while True:
+        for slot in range(HEAVY_JOB_SLOTS):
+            handle = open(os.path.join(WORKER_STATE_DIR, f"heavy_slot_{slot}.lock"), 'a')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return handle
+            except OSError:
+                handle.close()
+        if time.time() >= deadline:
+            return None
+        time.sleep(0.25)
+
+
+def heavy_queue_timeout(timer):
+    """Seconds a request may wait for a heavy slot: HEAVY_JOB_QUEUE_TIMEOUT, cut short by its deadline"""
+    remaining = timer.remaining()
+    return HEAVY_JOB_QUEUE_TIMEOUT if remaining is None else min(HEAVY_JOB_QUEUE_TIMEOUT, remaining)
+
+
+def release_heavy_slot(handle):
+    fcntl.flock(handle, fcntl.LOCK_UN)
+    handle.close()
+
+
+def admit_step_upload(filepath, timer, acquire_slot=True):
+    """
+    Pre-scan an uploaded STEP file and apply the admission limits.
+    Returns (estimate, rejection) where rejection is None or (message, status).
+    With acquire_slot=False a heavy file is only flagged (estimate['heavy'])
+    and the caller takes a slot for it when it starts the work.
+    """
+    with timer.stage('prescan'):
+        scan = prescan_step_file(filepath)
+    estimate = estimate_step_cost(scan)
+    estimate['schema'] = scan['schema']
+    estimate['length_units'] = scan['length_units']
+    timer.count('step_instances', scan['instance_count'])
+    timer.emit('estimate', **estimate)
+    METRICS.observe('step_request_estimated_cost', estimate['cost'], endpoint=request.endpoint)
+
+    if not scan['is_part21'] and not scan['instance_count']:
+        return estimate, ('Not a STEP (ISO 10303-21) file', 400)
+    if (STEP_MAX_COST and estimate['cost'] > STEP_MAX_COST) or \
+            (STEP_MAX_FACES and estimate['faces'] > STEP_MAX_FACES):
+        return estimate, ('STEP file exceeds the processing limits', 413)
+
+    estimate['heavy'] = bool(STEP_HEAVY_COST and estimate['cost'] > STEP_HEAVY_COST)
+    if estimate['heavy'] and acquire_slot and g.get('heavy_slot') is None:
+        with timer.stage('queue'):
+            g.heavy_slot = acquire_heavy_slot(heavy_queue_timeout(timer))
+        if g.heavy_slot is None:
+            if timer.remaining() == 0.0:
+                # The deadline ran out in the queue; reject like an overrun stage
+                return estimate, (str(DeadlineExceeded('queue', timer.deadline_seconds)), 504)
+            return estimate, ('Timed out waiting for a heavy job slot', 503)
+    return estimate, None
+
+
+@app.teardown_request
+def release_admission(exc):
+    handle = g.pop('heavy_slot', None)
+    if handle is not None:
+        release_heavy_slot(handle)
+
+
+@app.route('/prescan-step', methods=['POST'])
+@worker_role('parse')
+def prescan_step():
+    """Header, entity counts and cost estimate of a STEP file, without OCC"""
+    file = request.files.get('file')
+    if not file:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    filepath = os.path.join(UPLOAD_FOLDER, file.filename)
+    with g.timer.stage('upload'):
+        file.save(filepath)
+
+    try:
+        with g.timer.stage('prescan'):
+            scan = prescan_step_file(filepath)
+        scan['estimate'] = estimate_step_cost(scan)
+        scan['estimate']['heavy'] = bool(STEP_HEAVY_COST and scan['estimate']['cost'] > STEP_HEAVY_COST)
+        return jsonify(scan)
+    finally:
+        os.remove(filepath)
+
+
+# === Tessellation Configuration === #
+# Named levels of detail. Linear deflection is a fraction of the model's
+# bounding-box diagonal so meshes track model size, angular deflection is in radians.
+MESH_LODS = {
+    'coarse': {'relative_deflection': 0.005, 'angular_deflection': 0.8},
+    'medium': {'relative_deflection': 0.001, 'angular_deflection': 0.5},
+    'fine': {'relative_deflection': 0.0002, 'angular_deflection': 0.2},
+}
+DEFAULT_MESH_LOD = os.environ.get('MESH_LOD', 'medium')
+MESH_IN_PARALLEL = os.environ.get('MESH_IN_PARALLEL', 'true').lower() == 'true'
+
+# Deflections used when a face is meshed on its own without mesh settings
+DEFAULT_LINEAR_DEFLECTION = 0.01
+DEFAULT_ANGULAR_DEFLECTION = 0.5
+
+
+def resolve_mesh_lod(value):
+    """Validate a requested level of detail, falling back to the default"""
+    lod = (value or DEFAULT_MESH_LOD).strip().lower()
+    if lod not in MESH_LODS:
+        raise ValueError(f"Unknown lod '{lod}', expected one of: {', '.join(MESH_LODS)}")
+    return lod
+
+
+def mesh_settings(shape, lod=None):
+    """Compute absolute mesh deflections for a shape at the given level of detail"""
+    lod = resolve_mesh_lod(lod)
+    preset = MESH_LODS[lod]
+
+    bbox = Bnd_Box()
+    brepbndlib_Add(shape, bbox)
+    if bbox.IsVoid():
+        diagonal = 0.0
+    else:
+        xmin, ymin, zmin, xmax, ymax, zmax = bbox.Get()
+        diagonal = ((xmax - xmin) ** 2 + (ymax - ymin) ** 2 + (zmax - zmin) ** 2) ** 0.5
+
+    linear_deflection = diagonal * preset['relative_deflection']
+    if linear_deflection <= 0:
+        linear_deflection = DEFAULT_LINEAR_DEFLECTION
+
+    return {
+        'lod': lod,
+        'linear_deflection': linear_deflection,
+        'angular_deflection': preset['angular_deflection'],
+        'parallel': MESH_IN_PARALLEL
+    }
+
+
+def mesh_shape(shape, lod=None, timer=None):
+    """Tessellate all faces of a shape in one (parallel) pass and return the settings used"""
+    settings = mesh_settings(shape, lod)
+    mesh_with_settings(shape, settings, timer)
+    return settings
+
+
+def mesh_with_settings(shape, settings, timer=None):
+    """
+    Tessellate a shape (or a compound of some of its faces) with precomputed
+    settings. Under a deadline, large shapes are meshed MESH_CHUNK_FACES faces
+    at a time with a deadline check between chunks.
+    """
+    if timer is None or timer.deadline is None:
+        chunks = [shape]
+    else:
+        chunks = []
+        builder = BRep_Builder()
+        explorer = TopExp_Explorer(shape, TopAbs_FACE)
+        count = 0
+        while explorer.More():
+            if count % MESH_CHUNK_FACES == 0:
+                chunks.append(TopoDS_Compound())
+                builder.MakeCompound(chunks[-1])
+            builder.Add(chunks[-1], explorer.Current())
+            count += 1
+            explorer.Next()
+        if len(chunks) <= 1:
+            chunks = [shape]
+
+    for chunk in chunks:
+        if timer is not None:
+            timer.check_deadline('mesh')
+        BRepMesh_IncrementalMesh(
+            chunk,
+            settings['linear_deflection'],
+            False,
+            settings['angular_deflection'],
+            settings['parallel']
+        )
+
+
+def face_triangulation(face):
+    """Get a face triangulation, meshing the face only if it has none yet"""
     loc = TopLoc_Location()
     triangulation = BRep_Tool.Triangulation(face, loc)
+    if not triangulation:
+        BRepMesh_IncrementalMesh(face, DEFAULT_LINEAR_DEFLECTION, False, DEFAULT_ANGULAR_DEFLECTION)
+        loc = TopLoc_Location()
+        triangulation = BRep_Tool.Triangulation(face, loc)
+    return triangulation, loc
+
+
+def triangulation_arrays(face):
+    """Get a face triangulation as (nodes, triangles) arrays in world coordinates"""
+    triangulation, loc = face_triangulation(face)
+    if not triangulation:
+        return None, None
+
+    nodes = triangulation.Nodes()
+    points = np.empty((nodes.Length(), 3), dtype=np.float64)
+    for i in range(nodes.Length()):
+        node = nodes.Value(i + 1)
+        points[i] = (node.X(), node.Y(), node.Z())
+
+    # Apply the face location so shared edges line up between faces
+    if not loc.IsIdentity():
+        trsf = loc.Transformation()
+        matrix = np.array([[trsf.Value(r, c) for c in range(1, 5)] for r in range(1, 4)])
+        points = points @ matrix[:, :3].T + matrix[:, 3]
+
+    tris = triangulation.Triangles()
+    triangles = np.empty((tris.Length(), 3), dtype=np.int64)
+    for i in range(tris.Length()):
+        tri = tris.Value(i + 1)
+        triangles[i] = (tri.Value(1) - 1, tri.Value(2) - 1, tri.Value(3) - 1)
+
+    # Keep triangle winding consistent with the outward face normal
+    if face.Orientation() == TopAbs_REVERSED:
+        triangles = triangles[:, [0, 2, 1]]
+
+    return points, triangles
+
+
+def extract_face_data(face):
+    """Extract triangulation data from a face"""
+    # Reuse the triangulation from mesh_shape when the shape was meshed up front
+    triangulation, loc = face_triangulation(face)
     
     if triangulation:
         nodes = triangulation.Nodes()
@@ -499,20 +1384,16 @@ def generate_face_grid_points(face, u_samples=32, v_samples=32):
         surf_adaptor = BRepAdaptor_Surface(face, True)
         
         # Get parameter bounds
-        u_min = surf_adaptor.FirstUParameter()
-        u_max = surf_adaptor.LastUParameter()
-        v_min = surf_adaptor.FirstVParameter()
-        v_max = surf_adaptor.LastVParameter()
+        u_min, u_max, v_min, v_max = surface_parameter_bounds(surf_adaptor)
+        u_values, v_values = grid_parameters(u_min, u_max, v_min, v_max, u_samples, v_samples)
         
         # Generate grid points
         grid_points = []
         
-        for i in range(u_samples):
+        for u in u_values.tolist():
             row = []
-            u = u_min + (u_max - u_min) * i / (u_samples - 1) if u_samples > 1 else (u_min + u_max) / 2
             
-            for j in range(v_samples):
-                v = v_min + (v_max - v_min) * j / (v_samples - 1) if v_samples > 1 else (v_min + v_max) / 2
+            for v in v_values.tolist():
                 
                 try:
                     # Get point on surface
@@ -543,32 +1424,48 @@ def generate_face_grid_points(face, u_samples=32, v_samples=32):
             return None
 
 
+def surface_parameter_bounds(surf_adaptor):
+    """(u_min, u_max, v_min, v_max) of a surface adaptor"""
+    return (surf_adaptor.FirstUParameter(), surf_adaptor.LastUParameter(),
+            surf_adaptor.FirstVParameter(), surf_adaptor.LastVParameter())
+
+
+def classify_face_grid(face, u_samples=32, v_samples=32):
+    """Classify the grid_points parameters of a face as inside (True) or off the trimmed face"""
+    try:
+        # Same parameter grid as generate_face_grid_points
+        surf_adaptor = BRepAdaptor_Surface(face, True)
+        u_values, v_values = grid_parameters(*surface_parameter_bounds(surf_adaptor), u_samples, v_samples)
+
+        # FClass2d classifies one point per Perform call (OCC 7.5 has no batch
+        # classifier), so the grid goes through one classifier and one point
+        classifier = BRepTopAdaptor_FClass2d(face, BRep_Tool.Tolerance(face))
+        point = gp_Pnt2d()
+        states = []
+        for u in u_values.tolist():
+            for v in v_values.tolist():
+                point.SetCoord(u, v)
+                states.append(classifier.Perform(point))
+
+        # Points on the boundary count as inside
+        inside = np.isin(states, (TopAbs_IN, TopAbs_ON))
+        return inside.reshape(len(u_values), len(v_values)).tolist()
+
+    except Exception:
+        return None
+
+
 def generate_face_grid_from_mesh(face, u_samples=32, v_samples=32):
     """Generate grid points from face triangulation as fallback"""
     try:
         # Mesh the face
-        BRepMesh_IncrementalMesh(face, 0.01)
-        
-        loc = TopLoc_Location()
-        triangulation = BRep_Tool.Triangulation(face, loc)
+        mesh_points, triangles = triangulation_arrays(face)
         
-        if not triangulation:
+        # Need at least 4 points and a triangle for interpolation
+        if mesh_points is None or len(mesh_points) < 4 or len(triangles) == 0:
             return None
         
-        nodes = triangulation.Nodes()
-        
-        # Extract all mesh vertices
-        mesh_points = []
-        for i in range(nodes.Length()):
-            node = nodes.Value(i + 1)
-            mesh_points.append([node.X(), node.Y(), node.Z()])
-        
-        if len(mesh_points) < 4:  # Need at least 4 points for interpolation
-            return None
-        
-        mesh_points = np.array(mesh_points)
-        
-        # Create a regular grid by interpolating from mesh points
+        # Create a regular grid by projecting onto the mesh triangles
         # This is a simplified approach - for production use more sophisticated surface fitting
         
         # Get bounding box of mesh points
@@ -581,313 +1478,1546 @@ def generate_face_grid_from_mesh(face, u_samples=32, v_samples=32):
         dim1, dim2 = sorted_dims[1], sorted_dims[2]  # Use the two largest dimensions
         
         # Create grid in the 2D parameter space
-        grid_points = []
+        u, v = grid_parameters(0.0, 1.0, 0.0, 1.0, u_samples, v_samples)
+        uu, vv = np.meshgrid(u, v, indexing='ij')
+        queries = np.stack([
+            min_bounds[dim1] + uu.reshape(-1) * ranges[dim1],
+            min_bounds[dim2] + vv.reshape(-1) * ranges[dim2]
+        ], axis=1)
         
-        for i in range(u_samples):
-            row = []
-            u = i / (u_samples - 1) if u_samples > 1 else 0.5
-            
-            for j in range(v_samples):
-                v = j / (v_samples - 1) if v_samples > 1 else 0.5
-                
-                # Map (u,v) to the face's parameter space
-                param_point = np.zeros(3)
-                param_point[dim1] = min_bounds[dim1] + u * ranges[dim1]
-                param_point[dim2] = min_bounds[dim2] + v * ranges[dim2]
-                
-                # Find closest mesh point and use it (simple nearest neighbor)
-                distances = np.linalg.norm(mesh_points[:, [dim1, dim2]] - param_point[[dim1, dim2]], axis=1)
-                closest_idx = np.argmin(distances)
-                closest_point = mesh_points[closest_idx]
-                
-                row.append([closest_point[0], closest_point[1], closest_point[2]])
-            
-            grid_points.append(row)
+        # Answer all grid queries in one batch
+        grid = closest_points_on_mesh_2d(queries, mesh_points[:, [dim1, dim2]], mesh_points, triangles)
         
-        return grid_points
+        return grid.reshape(u_samples, v_samples, 3).tolist()
         
     except Exception as e:
         return None
 
 
+# === Geometric fingerprints === #
+# Content-based keys that stay stable across processes, files and revisions,
+# unlike TopoDS_Shape.__hash__ which depends on the TShape pointer. Coordinates
+# are quantized to FINGERPRINT_QUANTUM model units before hashing.
+#
+# Quantization buckets at fixed boundaries: two copies of a value that differ
+# by far less than the quantum still get different keys when they fall on
+# either side of a boundary (a coordinate near k.5 quanta). Such entities are
+# only ever missed, never confused with other ones, so the face cache and the
+# shard keys lose reuse on them but stay correct.
+FINGERPRINT_QUANTUM = float(os.environ.get('FINGERPRINT_QUANTUM', '1e-6'))
+FINGERPRINT_SAMPLES = 5
+# Relative accuracy of the face area and centroid integrals
+FINGERPRINT_INTEGRATION_TOLERANCE = 1e-9
+
+
+def quantize(values, quantum=None):
+    """Values as integer multiples of quantum (see the boundary caveat above)"""
+    quantum = quantum or FINGERPRINT_QUANTUM
+    return [int(round(value / quantum)) for value in values]
+
+
+def fingerprint_digest(signature):
+    """Short stable hex digest of a JSON-serializable signature"""
+    return hashlib.sha1(json.dumps(signature, separators=(',', ':')).encode()).hexdigest()[:20]
+
+
+def vertex_fingerprint(vertex):
+    pnt = BRep_Tool.Pnt(vertex)
+    return fingerprint_digest(['V', quantize((pnt.X(), pnt.Y(), pnt.Z()))])
+
+
+def edge_fingerprint(edge):
+    """Fingerprint an edge by curve type and quantized samples, independent of its direction"""
+    if BRep_Tool.Degenerated(edge):
+        pnt = BRep_Tool.Pnt(topods.Vertex(TopExp_Explorer(edge, TopAbs_VERTEX).Current()))
+        return fingerprint_digest(['E', 'degenerated', quantize((pnt.X(), pnt.Y(), pnt.Z()))])
+
+    curve = BRepAdaptor_Curve(edge)
+    first, last = curve.FirstParameter(), curve.LastParameter()
+    samples = []
+    for i in range(FINGERPRINT_SAMPLES):
+        pnt = curve.Value(first + (last - first) * i / (FINGERPRINT_SAMPLES - 1))
+        samples.append(quantize((pnt.X(), pnt.Y(), pnt.Z())))
+    # An edge traversed in either direction gets the same key
+    samples = min(samples, samples[::-1])
+    return fingerprint_digest(['E', int(curve.GetType()), samples])
+
+
+def face_fingerprint(face, edge_fingerprints):
+    """
+    Fingerprint a face by surface type, orientation, area and centroid and its
+    boundary edge fingerprints (so trims and holes count). Area and centroid
+    are integrals over the face, so a re-parameterized surface keeps its key.
+    """
+    surface = BRepAdaptor_Surface(face, True)
+    props = GProp_GProps()
+    brepgprop_SurfaceProperties(face, props, FINGERPRINT_INTEGRATION_TOLERANCE)
+    centroid = props.CentreOfMass()
+    # The square root of the area is a length, so it is quantized like the coordinates
+    size = sqrt(abs(props.Mass()))
+    return fingerprint_digest(['F', int(surface.GetType()), int(face.Orientation()),
+                               quantize((size, centroid.X(), centroid.Y(), centroid.Z())),
+                               sorted(edge_fingerprints)])
+
+
+# === Incremental per-face result cache === #
+# Per-face results (mesh, grid, grid mask) keyed by face fingerprint and the
+# settings they were computed with, so a revised model only recomputes the
+# faces that changed. Shared by all workers through FaceResultCache
+# (artifact_store.py); least recently used entries are evicted past FACE_CACHE_MAX_MB.
+FACE_CACHE_DIR = os.environ.get('FACE_CACHE_DIR', './face_cache')
+FACE_CACHE_MAX_BYTES = int(float(os.environ.get('FACE_CACHE_MAX_MB', '1024')) * 2**20)
+FACE_CACHE = FaceResultCache(FACE_CACHE_DIR, FACE_CACHE_MAX_BYTES)
+
+
+def mesh_cache_params(settings):
+    # Keyed on the LOD's relative deflection rather than the absolute one, which
+    # follows the bounding box and so changes with every revision that resizes it
+    preset = MESH_LODS[settings['lod']]
+    return [settings['lod'], preset['relative_deflection'], preset['angular_deflection']]
+
+
+def location_params(shape):
+    """Quantized location of a sub-shape; triangulation nodes are stored in its local frame"""
+    trsf = shape.Location().Transformation()
+    return quantize([trsf.Value(row, col) for row in range(1, 4) for col in range(1, 5)])
+
+
+def parameterization_params(face):
+    """
+    Quantized surface points at the corners and middle of a face's UV bounds.
+    Grids and grid masks sample the UV bounds, so unlike the face fingerprint
+    their cache keys must change when the surface is re-parameterized.
+    """
+    surface = BRepAdaptor_Surface(face, True)
+    u_min, u_max, v_min, v_max = surface_parameter_bounds(surface)
+    points = []
+    for u, v in ((u_min, v_min), (u_max, v_min), (u_min, v_max), (u_max, v_max),
+                 ((u_min + u_max) / 2, (v_min + v_max) / 2)):
+        pnt = surface.Value(u, v)
+        points.append(quantize((pnt.X(), pnt.Y(), pnt.Z())))
+    return points
+
+
+# === Shared shape model === #
+class ShapeModel(object):
+    """
+    A transferred shape with its topology index, tessellation and per-entity
+    extraction results computed once and shared by every output of a request.
+    With a face_cache, per-face results are also reused across requests and
+    only faces whose fingerprint is new are meshed and sampled.
+    """
+
+    def __init__(self, shape, face_cache=None, allow_shards=True):
+        self.shape = shape
+        self.face_cache = face_cache
+        # Off where the model is already processed inside a worker process
+        self.allow_shards = allow_shards
+        self.topo = Topo(shape)
+        self._maps = {}           # TopAbs kind -> TopTools_IndexedMapOfShape
+        self._shapes = {}         # TopAbs kind -> sub-shapes in index order
+        self._mesh_settings = {}  # lod -> settings of the mesh_shape call
+        self._bounds = None
+        self._face_data = {}      # hash -> extract_face_data result
+        self._edge_data = {}      # hash -> extract_edge_data result
+        self._grids = {}          # (hash, size) -> grid points
+        self._grid_masks = {}     # (hash, size) -> grid mask
+        self._fingerprints = {}   # TopAbs kind -> fingerprints in index order
+        self._mesh_params = None  # settings cached meshes are keyed by
+        self._reuse = {}          # product -> {'reused': n, 'computed': n}
+        self._recomputed = set()  # hashes of faces with a recomputed product
+        self._reused = set()      # hashes of faces with a product from the face cache
+        self._loaded = {}         # face cache key -> mesh value loaded by mesh()
+        self._unmeshed = {}       # hash -> face whose triangulation was not built in this shape
+        self._unmeshed_settings = None
+        self._coedges = None      # CoedgeTable, built on first use
+        self._ancestors = {}      # (kind, ancestor kind) -> TopTools_IndexedDataMapOfShapeListOfShape
+        self._sharded_meshes = {}  # lod -> settings the shards meshed the faces with
+        self._sharded_grids = {}   # grid size -> whether the shards also classified the masks
+
+    def shape_map(self, kind):
+        """Indexed map of the unique sub-shapes of a kind (orientation ignored)"""
+        if kind not in self._maps:
+            shape_map = TopTools_IndexedMapOfShape()
+            topexp_MapShapes(self.shape, kind, shape_map)
+            self._maps[kind] = shape_map
+        return self._maps[kind]
+
+    def shapes(self, kind):
+        """Unique sub-shapes of a kind in exploration order"""
+        if kind not in self._shapes:
+            shape_map = self.shape_map(kind)
+            cast = self.topo.topoFactory[kind]
+            self._shapes[kind] = [cast(shape_map.FindKey(i)) for i in range(1, shape_map.Size() + 1)]
+        return self._shapes[kind]
+
+    def index(self, sub_shape, kind):
+        """Zero-based index of a sub-shape, or -1 if it is not part of the model"""
+        return self.shape_map(kind).FindIndex(sub_shape) - 1
+
+    @property
+    def faces(self):
+        return self.shapes(TopAbs_FACE)
+
+    @property
+    def edges(self):
+        return self.shapes(TopAbs_EDGE)
+
+    @property
+    def vertices(self):
+        return self.shapes(TopAbs_VERTEX)
+
+    def ancestor_map(self, kind, ancestor_kind):
+        """Map from the sub-shapes of a kind to their ancestors of another kind, built once"""
+        key = (kind, ancestor_kind)
+        if key not in self._ancestors:
+            ancestor_map = TopTools_IndexedDataMapOfShapeListOfShape()
+            topexp_MapShapesAndAncestors(self.shape, kind, ancestor_kind, ancestor_map)
+            self._ancestors[key] = ancestor_map
+        return self._ancestors[key]
+
+    def ancestors(self, sub_shape, kind, ancestor_kind):
+        """Ancestors of a sub-shape as listed by TopExp (a seam edge lists its face twice)"""
+        ancestor_map = self.ancestor_map(kind, ancestor_kind)
+        if not ancestor_map.Contains(sub_shape):
+            return []
+        cast = self.topo.topoFactory[ancestor_kind]
+        ancestors = []
+        iterator = TopTools_ListIteratorOfListOfShape(ancestor_map.FindFromKey(sub_shape))
+        while iterator.More():
+            ancestors.append(cast(iterator.Value()))
+            iterator.Next()
+        return ancestors
+
+    @property
+    def coedges(self):
+        """Coedge table of the model, built in one pass on first use"""
+        if self._coedges is None:
+            self._coedges = build_coedge_table(self)
+        return self._coedges
+
+    def fingerprints(self, kind):
+        """Geometric fingerprints of the unique sub-shapes of a kind, in index order"""
+        if kind not in self._fingerprints:
+            if kind == TopAbs_VERTEX:
+                fingerprints = [vertex_fingerprint(vertex) for vertex in self.vertices]
+            elif kind == TopAbs_EDGE:
+                fingerprints = [edge_fingerprint(edge) for edge in self.edges]
+            elif kind == TopAbs_FACE:
+                edge_fingerprints = self.fingerprints(TopAbs_EDGE)
+                fingerprints = [
+                    face_fingerprint(face, [edge_fingerprints[self.index(edge, TopAbs_EDGE)]
+                                            for edge in self.topo.edges_from_face(face)])
+                    for face in self.faces
+                ]
+            else:
+                raise ValueError(f"No fingerprints for shape kind {kind}")
+            self._fingerprints[kind] = fingerprints
+        return self._fingerprints[kind]
+
+    def fingerprint(self, sub_shape, kind):
+        return self.fingerprints(kind)[self.index(sub_shape, kind)]
+
+    def bounds(self):
+        """Axis-aligned bounding box as (xmin, ymin, zmin, xmax, ymax, zmax)"""
+        if self._bounds is None:
+            bbox = Bnd_Box()
+            brepbndlib_Add(self.shape, bbox)
+            self._bounds = (0.0,) * 6 if bbox.IsVoid() else bbox.Get()
+        return self._bounds
+
+    def mesh(self, lod=None, timer=None):
+        """Tessellate the shape once per level of detail and return the settings used"""
+        lod = resolve_mesh_lod(lod)
+        if lod not in self._mesh_settings:
+            if self.face_cache is None:
+                self._mesh_settings[lod] = mesh_shape(self.shape, lod, timer)
+            else:
+                # Only tessellate the faces whose mesh is not cached yet. The entries are
+                # loaded here, so an eviction before face_data() cannot leave a face unmeshed
+                settings = mesh_settings(self.shape, lod)
+                self._mesh_params = mesh_cache_params(settings)
+                missing = []
+                cached = []
+                for face in self.faces:
+                    key = self._face_cache_key(face, 'mesh')
+                    entry = self.face_cache.get(key)
+                    if entry is None:
+                        missing.append(face)
+                    else:
+                        self._loaded[key] = entry['value']
+                        cached.append(face)
+                self.defer_triangulation(cached, settings)
+                if missing:
+                    builder = BRep_Builder()
+                    compound = TopoDS_Compound()
+                    builder.MakeCompound(compound)
+                    for face in missing:
+                        builder.Add(compound, face)
+                    mesh_with_settings(compound, settings, timer)
+                self._mesh_settings[lod] = settings
+        return self._mesh_settings[lod]
+
+    def defer_triangulation(self, faces, settings):
+        """Record faces whose mesh data came from elsewhere, to be tessellated only when needed"""
+        for face in faces:
+            self._unmeshed[face.__hash__()] = face
+        if faces:
+            self._unmeshed_settings = settings
+
+    def meshed_face(self, face):
+        """The face, tessellated with the model's settings if mesh() left it for later"""
+        if self._unmeshed.pop(face.__hash__(), None) is not None:
+            mesh_with_settings(face, self._unmeshed_settings)
+        return face
+
+    def triangulate(self, timer=None):
+        """Tessellate every deferred face, for consumers that read triangulations off the shape"""
+        if not self._unmeshed:
+            return
+        builder = BRep_Builder()
+        compound = TopoDS_Compound()
+        builder.MakeCompound(compound)
+        for face in self._unmeshed.values():
+            builder.Add(compound, face)
+        mesh_with_settings(compound, self._unmeshed_settings, timer)
+        self._unmeshed = {}
+
+    def _face_cache_key(self, face, product, params=None):
+        if product == 'mesh':
+            params = [self._mesh_params, location_params(face)]
+        else:
+            params = [params, parameterization_params(face)]
+        return self.face_cache.key(self.fingerprint(face, TopAbs_FACE), product, params)
+
+    def _face_product(self, face, product, compute, params=None):
+        """Compute a per-face product, or reuse it from the face cache"""
+        if self.face_cache is None or (product == 'mesh' and self._mesh_params is None):
+            return compute()
+        counts = self._reuse.setdefault(product, {'reused': 0, 'computed': 0})
+        key = self._face_cache_key(face, product, params)
+        if product == 'mesh':
+            # mesh() already loaded every cached mesh and tessellated the other faces
+            entry = {'value': self._loaded.pop(key)} if key in self._loaded else None
+        else:
+            entry = self.face_cache.get(key)
+        if entry is not None:
+            counts['reused'] += 1
+            self._reused.add(face.__hash__())
+            return entry['value']
+        value = compute()
+        self.face_cache.put(key, value)
+        counts['computed'] += 1
+        self._recomputed.add(face.__hash__())
+        return value
+
+    def reuse_report(self):
+        """Per-product and per-face counts of cached versus recomputed results"""
+        return {
+            'faces': len(self.faces),
+            'recomputed_faces': len(self._recomputed),
+            'reused_faces': len(self._reused - self._recomputed),
+            'products': self._reuse
+        }
+
+    def face_data(self, face):
+        """extract_face_data once per face; callers get their own copy"""
+        key = face.__hash__()
+        if key not in self._face_data:
+            self._face_data[key] = self._face_product(face, 'mesh', lambda: extract_face_data(self.meshed_face(face)))
+        data = self._face_data[key]
+        return dict(data) if data is not None else None
+
+    def edge_data(self, edge):
+        """extract_edge_data once per edge; callers get their own copy"""
+        key = edge.__hash__()
+        if key not in self._edge_data:
+            self._edge_data[key] = extract_edge_data(edge)
+        data = self._edge_data[key]
+        return dict(data) if data is not None else None
+
+    def grid_points(self, face, size):
+        key = (face.__hash__(), size)
+        if key not in self._grids:
+            self._grids[key] = self._face_product(
+                face, 'grid', lambda: generate_face_grid_points(self.meshed_face(face), size, size), [size])
+        return self._grids[key]
+
+    def grid_mask(self, face, size):
+        key = (face.__hash__(), size)
+        if key not in self._grid_masks:
+            self._grid_masks[key] = self._face_product(
+                face, 'grid_mask', lambda: classify_face_grid(face, size, size), [size])
+        return self._grid_masks[key]
+
+    def release_face(self, face, grid_size):
+        """Drop the memoized results of a face once the caller has stored them elsewhere"""
+        key = face.__hash__()
+        self._face_data.pop(key, None)
+        self._grids.pop((key, grid_size), None)
+        self._grid_masks.pop((key, grid_size), None)
+
+    def release_edge(self, edge):
+        self._edge_data.pop(edge.__hash__(), None)
+
+    def shard_faces(self, lod=None, mesh=True, grid_size=None, grid_mask=False, timer=None):
+        """
+        Compute the per-face mesh data, grids and grid masks of a large model
+        in FACE_SHARD_WORKERS processes and memoize them in face order.
+        Returns the mesh settings when the shards meshed the faces, else None;
+        small models, models with a face cache (which already skips unchanged
+        faces) and failures are left to the serial path. The parent shape is
+        not meshed; its faces are tessellated on demand (see triangulate).
+        Products an earlier call already sharded are not computed again.
+        """
+        faces = self.faces
+        if not self.allow_shards or FACE_SHARD_WORKERS < 2 or len(faces) < FACE_SHARD_MIN_FACES:
+            return None
+        if self.face_cache is not None:
+            return None
+        if not (mesh or grid_size):
+            return None
+        lod = resolve_mesh_lod(lod)
+
+        # Only shard what earlier calls (e.g. topology before brep in /analyze) did not cover
+        shard_mesh = mesh and lod not in self._sharded_meshes
+        covered_mask = self._sharded_grids.get(grid_size)
+        shard_grid = bool(grid_size) and covered_mask is None
+        shard_mask = bool(grid_size) and grid_mask and not covered_mask
+        if not (shard_mesh or shard_grid or shard_mask):
+            return self._sharded_meshes[lod] if mesh else None
+
+        settings = mesh_settings(self.shape, lod) if shard_mesh else None
+        try:
+            results = shard_face_products(self.shape, len(faces), settings, grid_size if shard_grid else None,
+                                          grid_size if shard_mask else None, timer or StageTimer())
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            print(f"[shards] Falling back to serial face processing: {str(e)}", flush=True)
+            return self._sharded_meshes.get(lod) if mesh else None
+
+        for face, (face_data, grid, mask) in zip(faces, results):
+            key = face.__hash__()
+            if shard_mesh:
+                self._face_data[key] = face_data
+            if shard_grid:
+                self._grids[(key, grid_size)] = grid
+            if shard_mask:
+                self._grid_masks[(key, grid_size)] = mask
+        if shard_mesh:
+            self.defer_triangulation(faces, settings)
+            self._sharded_meshes[lod] = settings
+        if shard_grid or shard_mask:
+            self._sharded_grids[grid_size] = bool(covered_mask or shard_mask)
+        return self._sharded_meshes.get(lod) if mesh else None
+
+
+def as_shape_model(shape):
+    """Wrap a shape in a ShapeModel unless it already is one"""
+    return shape if isinstance(shape, ShapeModel) else ShapeModel(shape)
+
+
+# === Face sharding === #
+# Per-face meshing and grid sampling of one large part spread over processes.
+# The shape is written once as binary BRep, every worker reads it back (the
+# face map order is the same) and processes a contiguous range of face indices.
+# Every service worker may shard at once, so by default they split the CPUs
+# between them (WEB_CONCURRENCY is the worker count gunicorn.conf.py uses).
+SERVICE_WORKERS = max(1, int(os.environ.get('WEB_CONCURRENCY', '2')))
+FACE_SHARD_WORKERS = int(os.environ.get('FACE_SHARD_WORKERS', str((os.cpu_count() or 1) // SERVICE_WORKERS)))
+# Shard and batch worker processes start from a fresh interpreter rather than a
+# fork of the (threaded) service worker, so they never inherit a lock another thread held
+FACE_SHARD_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+FACE_SHARD_MIN_FACES = int(os.environ.get('FACE_SHARD_MIN_FACES', '2000'))
+# Shards per worker, so uneven faces still balance across processes
+FACE_SHARDS_PER_WORKER = 4
+
+_shard_model = None  # (brep path, ShapeModel) read by this worker process
+
+
+def face_shard_products(brep_path, num_faces, start, stop, settings, grid_size, mask_size):
+    """
+    (start, [(face_data, grid, mask)]) for faces [start, stop); runs in a worker
+    process. Products whose settings or size is None are left as None.
+    """
+    global _shard_model
+    if _shard_model is None or _shard_model[0] != brep_path:
+        shape = TopoDS_Shape()
+        if not bintools_Read(shape, brep_path):
+            raise RuntimeError(f"Failed to read {brep_path}")
+        _shard_model = (brep_path, ShapeModel(shape, allow_shards=False))
+    model = _shard_model[1]
+    if len(model.faces) != num_faces:
+        raise RuntimeError(f"Shard model has {len(model.faces)} faces, expected {num_faces}")
+
+    faces = model.faces[start:stop]
+    if settings:
+        builder = BRep_Builder()
+        compound = TopoDS_Compound()
+        builder.MakeCompound(compound)
+        for face in faces:
+            builder.Add(compound, face)
+        mesh_with_settings(compound, dict(settings, parallel=False))
+
+    results = []
+    for face in faces:
+        face_data = extract_face_data(face) if settings else None
+        grid = generate_face_grid_points(face, grid_size, grid_size) if grid_size else None
+        mask = classify_face_grid(face, mask_size, mask_size) if mask_size else None
+        results.append((face_data, grid, mask))
+    return start, results
+
+
+def shard_face_products(shape, num_faces, settings, grid_size, mask_size, timer):
+    """Per-face (face_data, grid, mask) of a shape, computed in a process pool, in face order"""
+    fd, brep_path = tempfile.mkstemp(suffix='.brep', dir=UPLOAD_FOLDER)
+    os.close(fd)
+    workers = min(FACE_SHARD_WORKERS, num_faces)
+    shard_size = -(-num_faces // (workers * FACE_SHARDS_PER_WORKER))
+    pool = None
+    try:
+        with timer.stage('shard'):
+            if not bintools_Write(shape, brep_path):
+                raise RuntimeError('Failed to write the shape as binary BRep')
+            # A multiprocessing pool (unlike ProcessPoolExecutor) can be terminated, so
+            # shards still running after a deadline or an error stop with the request
+            pool = FACE_SHARD_CONTEXT.Pool(workers)
+            shards = [pool.apply_async(face_shard_products, (brep_path, num_faces, start,
+                                                             min(start + shard_size, num_faces),
+                                                             settings, grid_size, mask_size))
+                      for start in range(0, num_faces, shard_size)]
+
+            results = [None] * num_faces
+            done = 0
+            for pending in shards:
+                # Wait no longer than the request may run; the pool is terminated below
+                try:
+                    start, shard = pending.get(timer.remaining())
+                except multiprocessing.TimeoutError:
+                    raise DeadlineExceeded('shard', timer.deadline_seconds)
+                results[start:start + len(shard)] = shard
+                done += len(shard)
+                timer.progress('faces', done, num_faces)
+                timer.check_deadline('shard')
+        timer.count('face_shards', len(shards))
+        return results
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        os.remove(brep_path)
+
+
+# === Face and edge attribute tables === #
+def surface_normal(surface, u, v, reversed_face):
+    """Unit outward normal of a surface adaptor at (u, v), or None where it is singular"""
+    pnt = gp_Pnt()
+    d1u = gp_Vec()
+    d1v = gp_Vec()
+    surface.D1(u, v, pnt, d1u, d1v)
+    normal = d1u.Crossed(d1v)
+    if normal.Magnitude() < 1e-12:
+        return None
+    normal.Normalize()
+    if reversed_face:
+        normal.Reverse()
+    return np.array([normal.X(), normal.Y(), normal.Z()])
+
+
+def build_face_attributes(faces, adaptors):
+    """Columnar face attributes; adaptors maps face hash -> BRepAdaptor_Surface and is filled here"""
+    columns = {'surface_type': [], 'area': [], 'centroid': [], 'bbox_min': [], 'bbox_max': [],
+               'mean_normal': []}
+    other = len(SURFACE_TYPE_NAMES) - 1
+    for face in faces:
+        surface = BRepAdaptor_Surface(face, True)
+        adaptors[face.__hash__()] = surface
+        columns['surface_type'].append(SURFACE_TYPE_CODES.get(surface.GetType(), other))
+
+        props = GProp_GProps()
+        brepgprop_SurfaceProperties(face, props)
+        centre = props.CentreOfMass()
+        columns['area'].append(props.Mass())
+        columns['centroid'].append([centre.X(), centre.Y(), centre.Z()])
+
+        bbox = Bnd_Box()
+        brepbndlib_Add(face, bbox)
+        bounds = (0.0,) * 6 if bbox.IsVoid() else bbox.Get()
+        columns['bbox_min'].append(list(bounds[:3]))
+        columns['bbox_max'].append(list(bounds[3:]))
+
+        # Mean of the normals at the centers of a 3x3 grid over the UV bounds
+        u_min, u_max = surface.FirstUParameter(), surface.LastUParameter()
+        v_min, v_max = surface.FirstVParameter(), surface.LastVParameter()
+        reversed_face = face.Orientation() == TopAbs_REVERSED
+        normals = []
+        for i in range(3):
+            for j in range(3):
+                normal = surface_normal(surface, u_min + (u_max - u_min) * (i + 0.5) / 3,
+                                        v_min + (v_max - v_min) * (j + 0.5) / 3, reversed_face)
+                if normal is not None:
+                    normals.append(normal)
+        mean = np.sum(normals, axis=0) if normals else np.zeros(3)
+        length = np.linalg.norm(mean)
+        columns['mean_normal'].append((mean / length).tolist() if length > 1e-12 else [0.0, 0.0, 0.0])
+    return columns
+
+
+def edge_convexity(edge, faces, adaptors):
+    """Classify an edge from the normals of its two faces at the edge midpoint; returns (name, angle)"""
+    if BRep_Tool.Degenerated(edge) or len(faces) != 2:
+        return 'undefined', None
+    if faces[0].IsSame(faces[1]):
+        # Seam edge of a periodic surface
+        return 'smooth', 0.0
+
+    curve = BRepAdaptor_Curve(edge)
+    mid = (curve.FirstParameter() + curve.LastParameter()) / 2
+    pnt = gp_Pnt()
+    tangent = gp_Vec()
+    curve.D1(mid, pnt, tangent)
+
+    normals = []
+    for face in faces:
+        surface = adaptors.get(face.__hash__())
+        if surface is None:
+            surface = adaptors[face.__hash__()] = BRepAdaptor_Surface(face, True)
+        uv = BRepAdaptor_Curve2d(edge, face).Value(mid)
+        normal = surface_normal(surface, uv.X(), uv.Y(), face.Orientation() == TopAbs_REVERSED)
+        if normal is None:
+            return 'undefined', None
+        normals.append(normal)
+
+    # The edge runs along the first face's boundary in the face's own direction
+    direction = np.array([tangent.X(), tangent.Y(), tangent.Z()])
+    for oriented in Topo(faces[0]).edges_from_face(faces[0]):
+        if oriented.IsSame(edge):
+            if oriented.Orientation() == TopAbs_REVERSED:
+                direction = -direction
+            break
+    return classify_convexity(normals[0], normals[1], direction)
+
+
+def build_edge_attributes(model, edges, adaptors):
+    """Columnar edge attributes, reusing the face adaptors of build_face_attributes"""
+    columns = {'curve_type': [], 'length': [], 'convexity': [], 'dihedral_angle': []}
+    other = len(CURVE_TYPE_NAMES) - 1
+    for edge in edges:
+        if BRep_Tool.Degenerated(edge):
+            columns['curve_type'].append(other)
+        else:
+            columns['curve_type'].append(CURVE_TYPE_CODES.get(BRepAdaptor_Curve(edge).GetType(), other))
+
+        props = GProp_GProps()
+        brepgprop_LinearProperties(edge, props)
+        columns['length'].append(props.Mass())
+
+        faces = model.ancestors(edge, TopAbs_EDGE, TopAbs_FACE)
+        try:
+            convexity, angle = edge_convexity(edge, faces, adaptors)
+        except Exception:
+            convexity, angle = 'undefined', None
+        columns['convexity'].append(EDGE_CONVEXITY_CODES[convexity])
+        columns['dihedral_angle'].append(angle)
+    return columns
+
+
+def build_attribute_tables(model, faces, edges):
+    """Face and edge attribute tables as columns aligned with the output indices"""
+    adaptors = {}
+    return {
+        'faces': build_face_attributes(faces, adaptors),
+        'edges': build_edge_attributes(model, edges, adaptors),
+        'codes': {
+            'surface_type': list(SURFACE_TYPE_NAMES),
+            'curve_type': list(CURVE_TYPE_NAMES),
+            'convexity': EDGE_CONVEXITY_CODES
+        }
+    }
+
+
+# === Compact topology === #
+def build_coedge_table(model):
+    """Walk every wire of the model once, in order, and link its coedges"""
+    columns = {'edge': [], 'face': [], 'wire': [], 'vertex': [], 'reversed': []}
+    next_coedge = []
+    wires = model.shapes(TopAbs_WIRE)
+    wire_rows = [None] * len(wires)
+
+    def walk(wire_index, face_index, explorer, closed):
+        start = len(columns['edge'])
+        while explorer.More():
+            columns['edge'].append(model.index(explorer.Current(), TopAbs_EDGE))
+            columns['vertex'].append(model.index(explorer.CurrentVertex(), TopAbs_VERTEX))
+            columns['reversed'].append(explorer.Orientation() == TopAbs_REVERSED)
+            explorer.Next()
+        stop = len(columns['edge'])
+        columns['face'].extend([face_index] * (stop - start))
+        columns['wire'].extend([wire_index] * (stop - start))
+        next_coedge.extend(range(start + 1, stop))
+        if stop > start:
+            next_coedge.append(start if closed else -1)
+        wire_rows[wire_index] = range(start, stop)
+
+    # Face wires are closed; the face lets the explorer order seam and degenerate edges by their pcurves
+    for face_index, face in enumerate(model.faces):
+        for wire in model.topo.wires_from_face(face):
+            wire_index = model.index(wire, TopAbs_WIRE)
+            if wire_rows[wire_index] is None:
+                walk(wire_index, face_index, BRepTools_WireExplorer(wire, face), True)
+    for wire_index, wire in enumerate(wires):
+        if wire_rows[wire_index] is None:
+            walk(wire_index, -1, BRepTools_WireExplorer(wire), BRep_Tool.IsClosed(wire))
+
+    count = len(columns['edge'])
+    prev_coedge = [-1] * count
+    for coedge, following in enumerate(next_coedge):
+        if following >= 0:
+            prev_coedge[following] = coedge
+
+    uses = {}
+    for coedge, edge_index in enumerate(columns['edge']):
+        uses.setdefault(edge_index, []).append(coedge)
+    mate = [-1] * count
+    for group in uses.values():
+        if len(group) > 1:
+            for position, coedge in enumerate(group):
+                mate[coedge] = group[(position + 1) % len(group)]
+
+    return CoedgeTable(columns['edge'], columns['face'], columns['wire'], columns['vertex'],
+                       next_coedge, prev_coedge, mate, columns['reversed'], CsrRelation.from_rows(wire_rows))
+
+
+def build_compact_topology(model):
+    """Index every unique sub-shape of a model into a CompactTopology"""
+    topo = model.topo
+    faces = model.faces
+    edges = model.edges
+    wires = model.shapes(TopAbs_WIRE)
+    coedges = model.coedges
+
+    def indices(sub_shapes, kind):
+        return [model.index(sub_shape, kind) for sub_shape in sub_shapes]
+
+    vertices = np.array([extract_vertex_data(vertex) for vertex in model.vertices], dtype=np.float64)
+
+    other_surface = len(SURFACE_TYPE_NAMES) - 1
+    face_surface_type = [SURFACE_TYPE_CODES.get(BRepAdaptor_Surface(face, False).GetType(), other_surface)
+                         for face in faces]
+    other_curve = len(CURVE_TYPE_NAMES) - 1
+    edge_curve_type = [other_curve if BRep_Tool.Degenerated(edge)
+                       else CURVE_TYPE_CODES.get(BRepAdaptor_Curve(edge).GetType(), other_curve)
+                       for edge in edges]
+
+    relations = {
+        'face_edges': CsrRelation.from_rows(indices(topo.edges_from_face(face), TopAbs_EDGE) for face in faces),
+        'face_wires': CsrRelation.from_rows(indices(topo.wires_from_face(face), TopAbs_WIRE) for face in faces),
+        'edge_vertices': CsrRelation.from_rows(indices(topo.vertices_from_edge(edge), TopAbs_VERTEX)
+                                               for edge in edges),
+        'wire_edges': CsrRelation.from_rows(coedges.ordered_edges(wire_index) for wire_index in range(len(wires))),
+        'shell_faces': CsrRelation.from_rows(indices(topo._loop_topo(TopAbs_FACE, shell), TopAbs_FACE)
+                                             for shell in model.shapes(TopAbs_SHELL)),
+        'solid_faces': CsrRelation.from_rows(indices(topo._loop_topo(TopAbs_FACE, solid), TopAbs_FACE)
+                                             for solid in model.shapes(TopAbs_SOLID)),
+    }
+    return CompactTopology(vertices, face_surface_type, edge_curve_type, relations, coedges)
+
+
+# === Dual graphs === #
+def build_dual_graphs(model, face_shapes, edge_shapes, vertex_shapes, graph_format='coo', edge_attributes=None):
+    """
+    Collect the faces of every edge and the edges of every vertex from the
+    ancestor maps and assemble the dual graphs with dual_graphs. Convexity is
+    taken from edge_attributes when the attribute tables were already built,
+    else classified here with edge_convexity.
+    """
+    face_output = {face.__hash__(): index for index, face in enumerate(face_shapes)}
+    edge_output = {edge.__hash__(): index for index, edge in enumerate(edge_shapes)}
+
+    def distinct_indices(shapes, output):
+        indices = []
+        for sub_shape in shapes:
+            index = output.get(sub_shape.__hash__(), -1)
+            if index >= 0 and index not in indices:
+                indices.append(index)
+        return indices
+
+    adaptors = {}
+    edge_faces, convexity, angles = [], [], []
+    for edge_index, edge in enumerate(edge_shapes):
+        ancestors = model.ancestors(edge, TopAbs_EDGE, TopAbs_FACE)
+        faces = distinct_indices(ancestors, face_output)
+        code, angle = EDGE_CONVEXITY_CODES['undefined'], None
+        if len(faces) < 2:
+            # Boundary and seam edges link no two faces
+            faces = []
+        elif edge_attributes is not None:
+            code = edge_attributes['convexity'][edge_index]
+            angle = edge_attributes['dihedral_angle'][edge_index]
+        else:
+            try:
+                name, angle = edge_convexity(edge, ancestors, adaptors)
+                code = EDGE_CONVEXITY_CODES[name]
+            except Exception:
+                pass
+        edge_faces.append(faces)
+        convexity.append(code)
+        angles.append(angle)
+
+    vertex_edges = [distinct_indices(model.ancestors(vertex, TopAbs_VERTEX, TopAbs_EDGE), edge_output)
+                    for vertex in vertex_shapes]
+    return dual_graphs(len(face_shapes), edge_faces, vertex_edges, convexity, angles, graph_format)
+
+
+# === /parse-step field selection === #
+# Fields a client can request from /parse-step. Any 'faces.*' field implies the
+# face records themselves ('faces'), which always carry their edge_indices.
+# Indices do not depend on the selection: faces and vertices are numbered in
+# model order, edges likewise skipping edges without a 3D curve, so results of
+# calls with different fields can be joined on them.
+PARSE_STEP_FIELDS = (
+    'summary',
+    'adjacency',
+    'vertices',
+    'edges',
+    'faces',
+    'faces.mesh',
+    'faces.grid',
+    'faces.wires',
+    'wires',
+    'shells',
+    'solids',
+)
+
+# Fields that are only computed when requested by name, never by default or 'all'
+PARSE_STEP_OPTIONAL_FIELDS = (
+    'faces.grid_mask',
+    'fingerprints',
+    'attributes',
+    'graphs',
+)
+
+# Shorthands accepted in the fields/include parameter
+PARSE_STEP_FIELD_GROUPS = {
+    'all': PARSE_STEP_FIELDS,
+    'topology': ('vertices', 'edges', 'faces', 'faces.mesh', 'faces.grid', 'faces.wires',
+                 'wires', 'shells', 'solids'),
+    'faces': ('faces', 'faces.mesh', 'faces.grid', 'faces.wires'),
+}
+
+
+def resolve_parse_fields(value):
+    """Expand a comma-separated fields/include value into a set of field names"""
+    if not value or not value.strip():
+        return set(PARSE_STEP_FIELDS)
+
+    fields = set()
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name in PARSE_STEP_FIELD_GROUPS:
+            fields.update(PARSE_STEP_FIELD_GROUPS[name])
+        elif name in PARSE_STEP_FIELDS or name in PARSE_STEP_OPTIONAL_FIELDS:
+            fields.add(name)
+        else:
+            known = sorted(set(PARSE_STEP_FIELDS) | set(PARSE_STEP_OPTIONAL_FIELDS)
+                           | set(PARSE_STEP_FIELD_GROUPS))
+            raise ValueError(f"Unknown field '{name}', expected one of: {', '.join(known)}")
+
+    if any(name.startswith('faces.') for name in fields):
+        fields.add('faces')
+    return fields
+
+
+def edge_has_curve(edge):
+    """Check whether an edge carries a 3D curve (degenerated edges do not)"""
+    curve, first, last = BRep_Tool.Curve(edge)
+    return bool(curve)
+
+
+def build_parse_result(shape, fields, lod=None, timer=None, graph_format='coo'):
+    """Build the /parse-step response, running only the stages the fields need"""
+    timer = timer or StageTimer()
+    with timer.stage('topology'):
+        return _build_parse_result(as_shape_model(shape), fields, lod, timer, graph_format)
+
+
+def _build_parse_result(model, fields, lod, timer, graph_format):
+    topo = model.topo
+
+    want_faces = 'faces' in fields
+    want_mesh = 'faces.mesh' in fields
+    want_grid = 'faces.grid' in fields
+    want_grid_mask = 'faces.grid_mask' in fields
+    want_face_wires = 'faces.wires' in fields
+    want_fingerprints = 'fingerprints' in fields
+    want_attributes = 'attributes' in fields
+    # Face and edge indices are needed by everything except a bare summary
+    need_indices = bool(fields - {'summary'})
+
+    # Large models compute their per-face products in parallel shards first
+    settings = None
+    if need_indices and (want_mesh or want_grid or want_grid_mask):
+        settings = model.shard_faces(lod, want_mesh, 32 if want_grid or want_grid_mask else None,
+                                     want_grid_mask, timer)
+
+    # Tessellate the whole shape once at the requested level of detail
+    if want_mesh and settings is None:
+        with timer.stage('mesh'):
+            settings = model.mesh(lod, timer)
+
+    # First pass: Extract all unique vertices, edges, and faces with hash-based tracking
+    all_vertices = {}  # hash -> (index, data)
+    all_edges = {}     # hash -> (index, data)
+    all_faces = {}     # hash -> (index, data)
+
+    vertex_counter = 0
+    edge_counter = 0
+    face_counter = 0
+
+    # Sub-shapes in output index order, for the per-entity sections
+    vertex_shapes = []
+    edge_shapes = []
+    face_shapes = []
+
+    # Build vertices mapping
+    for vertex in model.vertices:
+        vertex_hash = vertex.__hash__()
+        if vertex_hash not in all_vertices:
+            vertex_data = extract_vertex_data(vertex)
+            all_vertices[vertex_hash] = (vertex_counter, vertex_data)
+            vertex_counter += 1
+            vertex_shapes.append(vertex)
+
+    # Build edges mapping
+    for edge in model.edges:
+        edge_hash = edge.__hash__()
+        if edge_hash not in all_edges:
+            if 'edges' in fields:
+                with timer.stage('edges'):
+                    edge_data = model.edge_data(edge)
+            else:
+                # Points are not requested, only keep the edge filter
+                edge_data = {} if edge_has_curve(edge) else None
+            if edge_data is not None:
+                # Get vertex indices for this edge
+                edge_vertices = list(topo.vertices_from_edge(edge)) if need_indices else []
+                vertex_indices = []
+                for v in edge_vertices:
+                    v_hash = v.__hash__()
+                    if v_hash in all_vertices:
+                        vertex_indices.append(all_vertices[v_hash][0])
+
+                edge_data['vertex_indices'] = vertex_indices
+                all_edges[edge_hash] = (edge_counter, edge_data)
+                edge_counter += 1
+                edge_shapes.append(edge)
+
+    # Wire ordering comes from the coedge table, mapped to output indices
+    if want_face_wires or 'wires' in fields:
+        coedges = model.coedges
+        edge_output = [-1] * len(model.edges)
+        for index, edge in enumerate(edge_shapes):
+            edge_output[model.index(edge, TopAbs_EDGE)] = index
+        vertex_output = [-1] * len(model.vertices)
+        for index, vertex in enumerate(vertex_shapes):
+            vertex_output[model.index(vertex, TopAbs_VERTEX)] = index
+
+        def ordered_wire_indices(wire):
+            wire_index = model.index(wire, TopAbs_WIRE)
+            return ([edge_output[e] for e in coedges.ordered_edges(wire_index) if e >= 0 and edge_output[e] >= 0],
+                    [vertex_output[v] for v in coedges.ordered_vertices(wire_index)
+                     if v >= 0 and vertex_output[v] >= 0])
+
+    # Build faces mapping with edge adjacency
+    for face_number, face in enumerate(model.faces if need_indices else (), 1):
+        face_hash = face.__hash__()
+        if face_hash not in all_faces:
+            # Every face keeps its index whatever the fields; one that cannot be meshed gets an empty mesh
+            face_data = {}
+            if want_mesh:
+                with timer.stage('mesh'):
+                    face_data = model.face_data(face) or {'vertices': [], 'indices': []}
+            # Get edge indices for this face
+            face_edges = list(topo.edges_from_face(face))
+            edge_indices = []
+            for e in face_edges:
+                e_hash = e.__hash__()
+                if e_hash in all_edges:
+                    edge_indices.append(all_edges[e_hash][0])
+
+            face_data['edge_indices'] = edge_indices
+
+            if want_face_wires:
+                # Get wire information with ordered connectivity
+                wires_data = []
+                for wire in topo.wires_from_face(face):
+                    ordered_edge_indices, ordered_vertex_indices = ordered_wire_indices(wire)
+                    wires_data.append({
+                        'ordered_edge_indices': ordered_edge_indices,
+                        'ordered_vertex_indices': ordered_vertex_indices
+                    })
+
+                face_data['wires'] = wires_data
+
+            if want_grid:
+                # Generate 32x32 grid points for surface reconstruction
+                try:
+                    with timer.stage('grid'):
+                        grid_points = model.grid_points(face, 32)
+                    if grid_points is not None:
+                        face_data['grid_points'] = grid_points
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    # Grid generation failed, continue without it
+                    print(f"Warning: Could not generate grid points for face: {e}")
+
+            if want_grid_mask:
+                # Inside/outside flags for the trimmed face, aligned with grid_points
+                with timer.stage('grid'):
+                    grid_mask = model.grid_mask(face, 32)
+                if grid_mask is not None:
+                    face_data['grid_mask'] = grid_mask
+
+            all_faces[face_hash] = (face_counter, face_data)
+            face_counter += 1
+            face_shapes.append(face)
+        timer.progress('faces', face_number, len(model.faces))
+
+    # Convert to arrays sorted by index
+    vertices_data = [None] * len(all_vertices)
+    for vertex_hash, (index, data) in all_vertices.items():
+        vertices_data[index] = data
+
+    edges_data = [None] * len(all_edges)
+    for edge_hash, (index, data) in all_edges.items():
+        edges_data[index] = data
+
+    faces_data = [None] * len(all_faces)
+    for face_hash, (index, data) in all_faces.items():
+        faces_data[index] = data
+
+    timer.count('faces', len(faces_data))
+    timer.count('edges', len(edges_data))
+    timer.count('vertices', len(vertices_data))
+
+    # Extract higher-level topology with proper indexing
+    solids_data = []
+    for solid in (model.shapes(TopAbs_SOLID) if 'solids' in fields else ()):
+        solid_faces = list(topo._loop_topo(TopAbs_FACE, solid))
+        solid_edges = list(topo._loop_topo(TopAbs_EDGE, solid))
+        solid_vertices = list(topo._loop_topo(TopAbs_VERTEX, solid))
+
+        # Map to indices
+        face_indices = []
+        for f in solid_faces:
+            f_hash = f.__hash__()
+            if f_hash in all_faces:
+                face_indices.append(all_faces[f_hash][0])
+
+        edge_indices = []
+        for e in solid_edges:
+            e_hash = e.__hash__()
+            if e_hash in all_edges:
+                edge_indices.append(all_edges[e_hash][0])
+
+        vertex_indices = []
+        for v in solid_vertices:
+            v_hash = v.__hash__()
+            if v_hash in all_vertices:
+                vertex_indices.append(all_vertices[v_hash][0])
+
+        solid_info = {
+            'face_indices': face_indices,
+            'edge_indices': edge_indices,
+            'vertex_indices': vertex_indices,
+            'faces_count': len(face_indices),
+            'edges_count': len(edge_indices),
+            'vertices_count': len(vertex_indices)
+        }
+        solids_data.append(solid_info)
+
+    shells_data = []
+    for shell in (model.shapes(TopAbs_SHELL) if 'shells' in fields else ()):
+        shell_faces = list(topo._loop_topo(TopAbs_FACE, shell))
+        shell_edges = list(topo._loop_topo(TopAbs_EDGE, shell))
+        shell_vertices = list(topo._loop_topo(TopAbs_VERTEX, shell))
+
+        # Map to indices
+        face_indices = []
+        for f in shell_faces:
+            f_hash = f.__hash__()
+            if f_hash in all_faces:
+                face_indices.append(all_faces[f_hash][0])
+
+        edge_indices = []
+        for e in shell_edges:
+            e_hash = e.__hash__()
+            if e_hash in all_edges:
+                edge_indices.append(all_edges[e_hash][0])
+
+        vertex_indices = []
+        for v in shell_vertices:
+            v_hash = v.__hash__()
+            if v_hash in all_vertices:
+                vertex_indices.append(all_vertices[v_hash][0])
+
+        shell_info = {
+            'face_indices': face_indices,
+            'edge_indices': edge_indices,
+            'vertex_indices': vertex_indices,
+            'faces_count': len(face_indices),
+            'edges_count': len(edge_indices),
+            'vertices_count': len(vertex_indices)
+        }
+        shells_data.append(shell_info)
+
+    wires_data = []
+    for wire in (model.shapes(TopAbs_WIRE) if 'wires' in fields else ()):
+        wire_edges = list(topo._loop_topo(TopAbs_EDGE, wire))
+        wire_vertices = list(topo._loop_topo(TopAbs_VERTEX, wire))
+
+        # Map to indices
+        edge_indices = []
+        for e in wire_edges:
+            e_hash = e.__hash__()
+            if e_hash in all_edges:
+                edge_indices.append(all_edges[e_hash][0])
+
+        vertex_indices = []
+        for v in wire_vertices:
+            v_hash = v.__hash__()
+            if v_hash in all_vertices:
+                vertex_indices.append(all_vertices[v_hash][0])
+
+        ordered_edge_indices, ordered_vertex_indices = ordered_wire_indices(wire)
+
+        wire_info = {
+            'edge_indices': edge_indices,
+            'vertex_indices': vertex_indices,
+            'ordered_edge_indices': ordered_edge_indices,
+            'ordered_vertex_indices': ordered_vertex_indices,
+            'edges_count': len(edge_indices),
+            'vertices_count': len(vertex_indices)
+        }
+        wires_data.append(wire_info)
+
+    result = {}
+
+    topology = {}
+    if want_faces:
+        topology['faces'] = faces_data
+    if 'edges' in fields:
+        topology['edges'] = edges_data
+    if 'vertices' in fields:
+        topology['vertices'] = vertices_data
+    if 'wires' in fields:
+        topology['wires'] = wires_data
+    if 'shells' in fields:
+        topology['shells'] = shells_data
+    if 'solids' in fields:
+        topology['solids'] = solids_data
+    if topology:
+        result['topology'] = topology
+    if settings is not None:
+        result['mesh_settings'] = settings
+    if want_fingerprints:
+        result['fingerprints'] = {
+            'faces': [model.fingerprint(face, TopAbs_FACE) for face in face_shapes],
+            'edges': [model.fingerprint(edge, TopAbs_EDGE) for edge in edge_shapes],
+            'vertices': [model.fingerprint(vertex, TopAbs_VERTEX) for vertex in vertex_shapes]
+        }
+    if want_attributes:
+        with timer.stage('attributes'):
+            result['attributes'] = build_attribute_tables(model, face_shapes, edge_shapes)
+
+    if 'graphs' in fields:
+        with timer.stage('graphs'):
+            result['graphs'] = build_dual_graphs(
+                model, face_shapes, edge_shapes, vertex_shapes, graph_format,
+                result['attributes']['edges'] if want_attributes else None)
+
+    if 'adjacency' in fields:
+        result['adjacency'] = {
+            'face_edge_adj': [face.get('edge_indices', []) for face in faces_data],
+            'edge_vertex_adj': [edge.get('vertex_indices', []) for edge in edges_data],
+            'face_count': len(faces_data),
+            'edge_count': len(edges_data),
+            'vertex_count': len(vertices_data)
+        }
+
+    if 'summary' in fields:
+        # Count higher-level entities without walking them when they are not requested
+        result['summary'] = {
+            'faces_count': len(faces_data) if need_indices else len(model.faces),
+            'edges_count': len(edges_data),
+            'vertices_count': len(vertices_data),
+            'wires_count': len(wires_data) if 'wires' in fields else len(model.shapes(TopAbs_WIRE)),
+            'shells_count': len(shells_data) if 'shells' in fields else len(model.shapes(TopAbs_SHELL)),
+            'solids_count': len(solids_data) if 'solids' in fields else len(model.shapes(TopAbs_SOLID))
+        }
+
+    return result
+
+
 @app.route('/parse-step', methods=['POST'])
+@worker_role('parse')
+@progress_stream
 def parse_step():
+    """Parse STEP file topology; `fields` (or `include`) selects what is computed"""
     file = request.files.get('file')
     if not file:
         return jsonify({'error': 'No file uploaded'}), 400
 
+    try:
+        fields = resolve_parse_fields(request.values.get('fields') or request.values.get('include'))
+        lod = resolve_mesh_lod(request.values.get('lod'))
+        graph_format = resolve_graph_format(request.values.get('graph_format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Reuse per-face results of earlier revisions from the face cache
+    incremental = request.values.get('incremental', 'false').lower() == 'true'
+
     filepath = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(filepath)
+    with g.timer.stage('upload'):
+        file.save(filepath)
+
+    estimate, rejection = admit_step_upload(filepath, g.timer)
+    if rejection:
+        os.remove(filepath)
+        message, status = rejection
+        return jsonify({'error': message, 'estimate': estimate}), status
 
     try:
         # Read STEP file
-        reader = STEPControl_Reader()
-        status = reader.ReadFile(filepath)
+        shape = read_step_file(filepath, g.timer)
 
-        if status != IFSelect_RetDone:
+        if shape is None:
             return jsonify({'error': 'Failed to read STEP file'}), 500
 
-        reader.TransferRoot()
-        shape = reader.OneShape()
+        model = ShapeModel(shape, FACE_CACHE if incremental else None)
+        result = build_parse_result(model, fields, lod, g.timer, graph_format)
+        if incremental:
+            result['incremental'] = model.reuse_report()
 
-        # Create topology explorer
-        topo = Topo(shape)
+        # Cleanup uploaded file
+        os.remove(filepath)
 
-        # First pass: Extract all unique vertices, edges, and faces with hash-based tracking
-        all_vertices = {}  # hash -> (index, data)
-        all_edges = {}     # hash -> (index, data) 
-        all_faces = {}     # hash -> (index, data)
-        
-        vertex_counter = 0
-        edge_counter = 0
-        face_counter = 0
-
-        # Build vertices mapping
-        for vertex in topo.vertices():
-            vertex_hash = vertex.__hash__()
-            if vertex_hash not in all_vertices:
-                vertex_data = extract_vertex_data(vertex)
-                all_vertices[vertex_hash] = (vertex_counter, vertex_data)
-                vertex_counter += 1
-
-        # Build edges mapping
-        for edge in topo.edges():
-            edge_hash = edge.__hash__()
-            if edge_hash not in all_edges:
-                edge_data = extract_edge_data(edge)
-                if edge_data:
-                    # Get vertex indices for this edge
-                    edge_vertices = list(topo.vertices_from_edge(edge))
-                    vertex_indices = []
-                    for v in edge_vertices:
-                        v_hash = v.__hash__()
-                        if v_hash in all_vertices:
-                            vertex_indices.append(all_vertices[v_hash][0])
-                    
-                    edge_data['vertex_indices'] = vertex_indices
-                    all_edges[edge_hash] = (edge_counter, edge_data)
-                    edge_counter += 1
-
-        # Build faces mapping with edge adjacency
-        for face in topo.faces():
-            face_hash = face.__hash__()
-            if face_hash not in all_faces:
-                face_data = extract_face_data(face)
-                if face_data:
-                    # Get edge indices for this face
-                    face_edges = list(topo.edges_from_face(face))
-                    edge_indices = []
-                    for e in face_edges:
-                        e_hash = e.__hash__()
-                        if e_hash in all_edges:
-                            edge_indices.append(all_edges[e_hash][0])
-                    
-                    face_data['edge_indices'] = edge_indices
-                    
-                    # Get wire information with ordered connectivity
-                    wires_data = []
-                    for wire in topo.wires_from_face(face):
-                        wire_info = {
-                            'ordered_edge_indices': [],
-                            'ordered_vertex_indices': []
-                        }
-                        
-                        # Get ordered edges from wire
-                        ordered_edges = list(topo.ordered_edges_from_wire(wire))
-                        for edge in ordered_edges:
-                            e_hash = edge.__hash__()
-                            if e_hash in all_edges:
-                                wire_info['ordered_edge_indices'].append(all_edges[e_hash][0])
-                        
-                        # Get ordered vertices from wire
-                        ordered_vertices = list(topo.ordered_vertices_from_wire(wire))
-                        for vertex in ordered_vertices:
-                            v_hash = vertex.__hash__()
-                            if v_hash in all_vertices:
-                                wire_info['ordered_vertex_indices'].append(all_vertices[v_hash][0])
-                        
-                        wires_data.append(wire_info)
-                    
-                    face_data['wires'] = wires_data
-                    
-                    # Optional: Generate 32x32 grid points for surface reconstruction
-                    # This can be added later if needed for specific surface types
-                    try:
-                        grid_points = generate_face_grid_points(face, 32, 32)
-                        if grid_points is not None:
-                            face_data['grid_points'] = grid_points
-                    except Exception as e:
-                        # Grid generation failed, continue without it
-                        print(f"Warning: Could not generate grid points for face: {e}")
-                    
-                    all_faces[face_hash] = (face_counter, face_data)
-                    face_counter += 1
-
-        # Convert to arrays sorted by index
-        vertices_data = [None] * len(all_vertices)
-        for vertex_hash, (index, data) in all_vertices.items():
-            vertices_data[index] = data
+        with g.timer.stage('serialize'):
+            return jsonify(result)
 
-        edges_data = [None] * len(all_edges)
-        for edge_hash, (index, data) in all_edges.items():
-            edges_data[index] = data
+    except Exception as e:
+        # Cleanup uploaded file in case of error
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        if isinstance(e, DeadlineExceeded):
+            raise
+        return jsonify({'error': f'Failed to parse STEP file: {str(e)}'}), 500
 
-        faces_data = [None] * len(all_faces)
-        for face_hash, (index, data) in all_faces.items():
-            faces_data[index] = data
-
-        # Extract higher-level topology with proper indexing
-        solids_data = []
-        for solid in topo.solids():
-            solid_faces = list(topo._loop_topo(TopAbs_FACE, solid))
-            solid_edges = list(topo._loop_topo(TopAbs_EDGE, solid))
-            solid_vertices = list(topo._loop_topo(TopAbs_VERTEX, solid))
-            
-            # Map to indices
-            face_indices = []
-            for f in solid_faces:
-                f_hash = f.__hash__()
-                if f_hash in all_faces:
-                    face_indices.append(all_faces[f_hash][0])
-            
-            edge_indices = []
-            for e in solid_edges:
-                e_hash = e.__hash__()
-                if e_hash in all_edges:
-                    edge_indices.append(all_edges[e_hash][0])
-            
-            vertex_indices = []
-            for v in solid_vertices:
-                v_hash = v.__hash__()
-                if v_hash in all_vertices:
-                    vertex_indices.append(all_vertices[v_hash][0])
-            
-            solid_info = {
-                'face_indices': face_indices,
-                'edge_indices': edge_indices,
-                'vertex_indices': vertex_indices,
-                'faces_count': len(face_indices),
-                'edges_count': len(edge_indices),
-                'vertices_count': len(vertex_indices)
-            }
-            solids_data.append(solid_info)
 
-        shells_data = []
-        for shell in topo.shells():
-            shell_faces = list(topo._loop_topo(TopAbs_FACE, shell))
-            shell_edges = list(topo._loop_topo(TopAbs_EDGE, shell))
-            shell_vertices = list(topo._loop_topo(TopAbs_VERTEX, shell))
-            
-            # Map to indices
-            face_indices = []
-            for f in shell_faces:
-                f_hash = f.__hash__()
-                if f_hash in all_faces:
-                    face_indices.append(all_faces[f_hash][0])
-            
-            edge_indices = []
-            for e in shell_edges:
-                e_hash = e.__hash__()
-                if e_hash in all_edges:
-                    edge_indices.append(all_edges[e_hash][0])
-            
-            vertex_indices = []
-            for v in shell_vertices:
-                v_hash = v.__hash__()
-                if v_hash in all_vertices:
-                    vertex_indices.append(all_vertices[v_hash][0])
-            
-            shell_info = {
-                'face_indices': face_indices,
-                'edge_indices': edge_indices,
-                'vertex_indices': vertex_indices,
-                'faces_count': len(face_indices),
-                'edges_count': len(edge_indices),
-                'vertices_count': len(vertex_indices)
-            }
-            shells_data.append(shell_info)
+COMPACT_FORMATS = ('npz', 'arrow', 'json')
 
-        wires_data = []
-        for wire in topo.wires():
-            wire_edges = list(topo._loop_topo(TopAbs_EDGE, wire))
-            wire_vertices = list(topo._loop_topo(TopAbs_VERTEX, wire))
-            
-            # Get ordered topology
-            ordered_edges = list(topo.ordered_edges_from_wire(wire))
-            ordered_vertices = list(topo.ordered_vertices_from_wire(wire))
-            
-            # Map to indices
-            edge_indices = []
-            for e in wire_edges:
-                e_hash = e.__hash__()
-                if e_hash in all_edges:
-                    edge_indices.append(all_edges[e_hash][0])
-            
-            vertex_indices = []
-            for v in wire_vertices:
-                v_hash = v.__hash__()
-                if v_hash in all_vertices:
-                    vertex_indices.append(all_vertices[v_hash][0])
-            
-            ordered_edge_indices = []
-            for e in ordered_edges:
-                e_hash = e.__hash__()
-                if e_hash in all_edges:
-                    ordered_edge_indices.append(all_edges[e_hash][0])
-            
-            ordered_vertex_indices = []
-            for v in ordered_vertices:
-                v_hash = v.__hash__()
-                if v_hash in all_vertices:
-                    ordered_vertex_indices.append(all_vertices[v_hash][0])
-            
-            wire_info = {
-                'edge_indices': edge_indices,
-                'vertex_indices': vertex_indices,
-                'ordered_edge_indices': ordered_edge_indices,
-                'ordered_vertex_indices': ordered_vertex_indices,
-                'edges_count': len(edge_indices),
-                'vertices_count': len(vertex_indices)
-            }
-            wires_data.append(wire_info)
 
-        # Cleanup uploaded file
+@app.route('/parse-step-compact', methods=['POST'])
+@worker_role('parse')
+def parse_step_compact():
+    """Parse STEP file topology into CSR arrays; `format` is npz (default), arrow or json"""
+    file = request.files.get('file')
+    if not file:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    output_format = request.values.get('format', 'npz').lower()
+    if output_format not in COMPACT_FORMATS:
+        return jsonify({'error': f"Unknown format '{output_format}', expected one of: {', '.join(COMPACT_FORMATS)}"}), 400
+    if output_format == 'arrow':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return jsonify({'error': 'format=arrow requires pyarrow, which is not installed'}), 400
+
+    filepath = os.path.join(UPLOAD_FOLDER, file.filename)
+    with g.timer.stage('upload'):
+        file.save(filepath)
+
+    estimate, rejection = admit_step_upload(filepath, g.timer)
+    if rejection:
+        os.remove(filepath)
+        message, status = rejection
+        return jsonify({'error': message, 'estimate': estimate}), status
+
+    try:
+        shape = read_step_file(filepath, g.timer)
         os.remove(filepath)
+        if shape is None:
+            return jsonify({'error': 'Failed to read STEP file'}), 500
 
-        return jsonify({
-            'topology': {
-                'faces': faces_data,
-                'edges': edges_data,
-                'vertices': vertices_data,
-                'wires': wires_data,
-                'shells': shells_data,
-                'solids': solids_data
-            },
-            'adjacency': {
-                'face_edge_adj': [face.get('edge_indices', []) for face in faces_data],
-                'edge_vertex_adj': [edge.get('vertex_indices', []) for edge in edges_data],
-                'face_count': len(faces_data),
-                'edge_count': len(edges_data),
-                'vertex_count': len(vertices_data)
-            },
-            'summary': {
-                'faces_count': len(faces_data),
-                'edges_count': len(edges_data),
-                'vertices_count': len(vertices_data),
-                'wires_count': len(wires_data),
-                'shells_count': len(shells_data),
-                'solids_count': len(solids_data)
-            }
-        })
+        with g.timer.stage('topology'):
+            compact = build_compact_topology(ShapeModel(shape))
+        counts = compact.counts()
+        for kind in ('faces', 'edges', 'vertices'):
+            g.timer.count(kind, counts[kind])
+
+        model_name = os.path.splitext(file.filename)[0]
+        with g.timer.stage('serialize'):
+            if output_format == 'json':
+                result = compact.to_dict()
+                result['nbytes'] = compact.nbytes
+                return jsonify(result)
+            buffer = BytesIO()
+            if output_format == 'npz':
+                compact.to_npz(buffer)
+            else:
+                compact.to_arrow(buffer)
+            buffer.seek(0)
+        extension = 'npz' if output_format == 'npz' else 'arrow.zip'
+        response = send_file(buffer, mimetype='application/zip', as_attachment=True,
+                             download_name=f"{model_name}.{extension}")
+        response.headers['X-Topology-Bytes'] = str(compact.nbytes)
+        return response
 
     except Exception as e:
-        # Cleanup uploaded file in case of error
         if os.path.exists(filepath):
             os.remove(filepath)
+        if isinstance(e, DeadlineExceeded):
+            raise
         return jsonify({'error': f'Failed to parse STEP file: {str(e)}'}), 500
 
 
+def build_brep_result(shape, grid_size=32, edge_samples=32, grid_mode='full', lod=None, timer=None,
+                      fingerprints=False, store=None):
+    """
+    Build the /parse-step-for-brep arrays for a transferred shape; with a
+    BrepArrayWriter as store the arrays go to disk and 'arrays' holds their manifest
+    """
+    timer = timer or StageTimer()
+    with timer.stage('topology'):
+        return _build_brep_result(as_shape_model(shape), grid_size, edge_samples, grid_mode, lod, timer,
+                                  fingerprints, store)
+
+
+def _build_brep_result(model, grid_size, edge_samples, grid_mode, lod, timer, want_fingerprints, store):
+    topo = model.topo
+
+    # Large models compute their per-face products in parallel shards first. Not
+    # with a store: shards return every face's products at once, while the store
+    # exists to hold only one face's rows in memory at a time
+    settings = None if store else model.shard_faces(lod, True, grid_size, grid_mode == 'trimmed', timer)
+
+    # Tessellate the whole shape once at the requested level of detail
+    if settings is None:
+        with timer.stage('mesh'):
+            settings = model.mesh(lod, timer)
+
+    # Build unique topology elements with hash-based tracking
+    all_vertices = {}  # hash -> (index, data)
+    all_edges = {}     # hash -> (index, data)
+    all_faces = {}     # hash -> (index, data)
+    
+    vertex_counter = 0
+    edge_counter = 0
+    face_counter = 0
+
+    # Geometric fingerprints aligned with the output indices
+    fingerprints = {'faces': [], 'edges': [], 'vertices': []}
+
+    # Extract vertices
+    for vertex in model.vertices:
+        vertex_hash = vertex.__hash__()
+        if vertex_hash not in all_vertices:
+            vertex_data = extract_vertex_data(vertex)
+            if store:
+                store.write('vertices', vertex_counter, vertex_data or [0, 0, 0])
+                vertex_data = None
+            all_vertices[vertex_hash] = (vertex_counter, vertex_data)
+            vertex_counter += 1
+            if want_fingerprints:
+                fingerprints['vertices'].append(model.fingerprint(vertex, TopAbs_VERTEX))
+
+    # Extract edges with vertex connectivity
+    for edge in model.edges:
+        edge_hash = edge.__hash__()
+        if edge_hash not in all_edges:
+            with timer.stage('edges'):
+                edge_data = model.edge_data(edge)
+            if edge_data:
+                # Get vertex indices for this edge
+                edge_vertices = list(topo.vertices_from_edge(edge))
+                vertex_indices = []
+                for v in edge_vertices:
+                    v_hash = v.__hash__()
+                    if v_hash in all_vertices:
+                        vertex_indices.append(all_vertices[v_hash][0])
+                
+                # Ensure we have exactly edge_samples points
+                points = edge_data['points']
+                if len(points) != edge_samples:
+                    # Resample to get exactly edge_samples points
+                    with timer.stage('edges'):
+                        if len(points) > 1:
+                            # Interpolate to get the right number of samples
+                            points = resample_curve_points(points, edge_samples)
+                        else:
+                            # Duplicate single point
+                            points = [points[0]] * edge_samples if points else [[0,0,0]] * edge_samples
+                
+                if store:
+                    # Written straight to disk; only the connectivity stays in memory
+                    if points:
+                        store.write('edge_wcs', edge_counter, points)
+                    model.release_edge(edge)
+                    points = None
+
+                edge_info = {
+                    'points': points,  # This becomes edge_wcs
+                    'vertex_indices': vertex_indices
+                }
+                all_edges[edge_hash] = (edge_counter, edge_info)
+                edge_counter += 1
+                if want_fingerprints:
+                    fingerprints['edges'].append(model.fingerprint(edge, TopAbs_EDGE))
+
+    # Extract faces with edge connectivity and grid points
+    for face_number, face in enumerate(model.faces, 1):
+        face_hash = face.__hash__()
+        if face_hash not in all_faces:
+            with timer.stage('mesh'):
+                face_data = model.face_data(face)
+            if face_data:
+                # Get edge indices for this face
+                face_edges = list(topo.edges_from_face(face))
+                edge_indices = []
+                for e in face_edges:
+                    e_hash = e.__hash__()
+                    if e_hash in all_edges:
+                        edge_indices.append(all_edges[e_hash][0])
+                
+                # Generate grid points for surface reconstruction
+                with timer.stage('grid'):
+                    grid_points = model.grid_points(face, grid_size)
+                    grid_mask = None
+                    if grid_points is None:
+                        # Fallback: create a flat grid from face bounds
+                        grid_points = create_fallback_face_grid(model.meshed_face(face), grid_size, grid_size)
+                        grid_mask = [[False] * grid_size for _ in range(grid_size)]
+                    elif grid_mode == 'trimmed':
+                        grid_mask = model.grid_mask(face, grid_size)
+
+                if store:
+                    store.write('surf_wcs', face_counter, grid_points)
+                    store.write('surf_mask', face_counter, True if grid_mask is None else grid_mask)
+                    model.release_face(face, grid_size)
+                    grid_points = grid_mask = None
+                
+                face_info = {
+                    'edge_indices': edge_indices,  # This becomes FaceEdgeAdj
+                    'grid_points': grid_points,    # This becomes surf_wcs
+                    'grid_mask': grid_mask         # This becomes surf_mask
+                }
+                all_faces[face_hash] = (face_counter, face_info)
+                face_counter += 1
+                if want_fingerprints:
+                    fingerprints['faces'].append(model.fingerprint(face, TopAbs_FACE))
+        timer.progress('faces', face_number, len(model.faces))
+
+    timer.count('faces', len(all_faces))
+    timer.count('edges', len(all_edges))
+    timer.count('vertices', len(all_vertices))
+
+    # Convert to the arrays expected by construct_brep function, sorted by index
+    with timer.stage('serialize'):
+        faces_info = [None] * len(all_faces)
+        for face_hash, (index, data) in all_faces.items():
+            faces_info[index] = data
+
+        edges_info = [None] * len(all_edges)
+        for edge_hash, (index, data) in all_edges.items():
+            edges_info[index] = data
+
+        vertices_info = [None] * len(all_vertices)
+        for vertex_hash, (index, data) in all_vertices.items():
+            vertices_info[index] = data
+
+        if store:
+            # The arrays are already on disk; trim them and add the adjacency as CSR
+            arrays = store.finish(
+                {'surf_wcs': len(faces_info), 'surf_mask': len(faces_info),
+                 'edge_wcs': len(edges_info), 'vertices': len(vertices_info)},
+                {'FaceEdgeAdj': [face_info['edge_indices'] for face_info in faces_info],
+                 'EdgeVertexAdj': [edge_info['vertex_indices'] for edge_info in edges_info]})
+        else:
+            # 1. surf_wcs: Array of face grid points [num_faces, grid_size, grid_size, 3]
+            surf_wcs = []
+            surf_mask = []  # [num_faces, grid_size, grid_size] inside flags in trimmed mode
+            for face_info in faces_info:
+                if face_info and face_info['grid_points']:
+                    surf_wcs.append(face_info['grid_points'])
+                else:
+                    # Fallback: create zero grid
+                    surf_wcs.append([[[0,0,0] for _ in range(grid_size)] for _ in range(grid_size)])
+
+                if grid_mode == 'trimmed':
+                    if face_info and face_info['grid_mask'] is not None:
+                        surf_mask.append(face_info['grid_mask'])
+                    else:
+                        # Classification failed, the grid still lies on the face surface
+                        surf_mask.append([[True] * grid_size for _ in range(grid_size)])
+
+            # 2. edge_wcs: Array of edge points [num_edges, edge_samples, 3]
+            edge_wcs = []
+            for edge_info in edges_info:
+                if edge_info and edge_info['points']:
+                    edge_wcs.append(edge_info['points'])
+                else:
+                    # Fallback: create zero points
+                    edge_wcs.append([[0,0,0] for _ in range(edge_samples)])
+
+            # 3. FaceEdgeAdj: List of edge indices for each face
+            FaceEdgeAdj = [face_info['edge_indices'] if face_info else [] for face_info in faces_info]
+
+            # 4. EdgeVertexAdj: List of vertex indices for each edge
+            EdgeVertexAdj = [edge_info['vertex_indices'] if edge_info else [] for edge_info in edges_info]
+
+            # 5. Vertices array
+            vertices = [vertex_data if vertex_data else [0, 0, 0] for vertex_data in vertices_info]
+
+    metadata = {
+        'num_faces': len(all_faces),
+        'num_edges': len(all_edges),
+        'num_vertices': len(all_vertices),
+        'grid_size': grid_size,
+        'grid_mode': grid_mode,
+        'edge_samples': edge_samples,
+        'mesh_settings': settings
+    }
+    if store:
+        result = {
+            'arrays': arrays,           # name -> .npy file manifest
+            'metadata': metadata
+        }
+    else:
+        result = {
+            'surf_wcs': surf_wcs,           # [num_faces, grid_size, grid_size, 3]
+            'edge_wcs': edge_wcs,           # [num_edges, edge_samples, 3]
+            'FaceEdgeAdj': FaceEdgeAdj,     # [num_faces] -> [edge_indices]
+            'EdgeVertexAdj': EdgeVertexAdj, # [num_edges] -> [vertex_indices]
+            'vertices': vertices,           # [num_vertices, 3]
+            'metadata': metadata
+        }
+        if grid_mode == 'trimmed':
+            result['surf_mask'] = surf_mask  # [num_faces, grid_size, grid_size]
+    if want_fingerprints:
+        result['fingerprints'] = fingerprints  # faces/edges/vertices -> [fingerprint]
+
+    return result
+
+
 @app.route('/parse-step-for-brep', methods=['POST'])
+@worker_role('parse')
+@progress_stream
 def parse_step_for_brep():
     """Parse STEP file and return data in format expected by BREP reconstruction"""
     file = request.files.get('file')
@@ -897,199 +3027,393 @@ def parse_step_for_brep():
     # Get options from request
     grid_size = int(request.form.get('grid_size', '32'))
     edge_samples = int(request.form.get('edge_samples', '32'))
+    grid_mode = request.form.get('grid_mode', 'full')  # 'full' or 'trimmed'
+    fingerprints = request.form.get('fingerprints', 'false').lower() == 'true'
+    incremental = request.form.get('incremental', 'false').lower() == 'true'
+    # 'store' writes the arrays to memory-mapped .npy files served from /results/<id>
+    output = request.form.get('output', 'json')
+    if grid_mode not in ('full', 'trimmed'):
+        return jsonify({'error': f"Unknown grid_mode '{grid_mode}', expected 'full' or 'trimmed'"}), 400
+    if output not in ('json', 'store'):
+        return jsonify({'error': f"Unknown output '{output}', expected 'json' or 'store'"}), 400
+    try:
+        lod = resolve_mesh_lod(request.form.get('lod'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     filepath = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(filepath)
+    with g.timer.stage('upload'):
+        file.save(filepath)
+
+    estimate, rejection = admit_step_upload(filepath, g.timer)
+    if rejection:
+        os.remove(filepath)
+        message, status = rejection
+        return jsonify({'error': message, 'estimate': estimate}), status
 
+    store = None
     try:
         # Read STEP file
-        reader = STEPControl_Reader()
-        status = reader.ReadFile(filepath)
+        shape = read_step_file(filepath, g.timer)
 
-        if status != IFSelect_RetDone:
+        if shape is None:
             return jsonify({'error': 'Failed to read STEP file'}), 500
 
-        reader.TransferRoot()
-        shape = reader.OneShape()
-
-        # Create topology explorer
-        topo = Topo(shape)
-
-        # Build unique topology elements with hash-based tracking
-        all_vertices = {}  # hash -> (index, data)
-        all_edges = {}     # hash -> (index, data)
-        all_faces = {}     # hash -> (index, data)
-        
-        vertex_counter = 0
-        edge_counter = 0
-        face_counter = 0
-
-        # Extract vertices
-        for vertex in topo.vertices():
-            vertex_hash = vertex.__hash__()
-            if vertex_hash not in all_vertices:
-                vertex_data = extract_vertex_data(vertex)
-                all_vertices[vertex_hash] = (vertex_counter, vertex_data)
-                vertex_counter += 1
-
-        # Extract edges with vertex connectivity
-        for edge in topo.edges():
-            edge_hash = edge.__hash__()
-            if edge_hash not in all_edges:
-                edge_data = extract_edge_data(edge)
-                if edge_data:
-                    # Get vertex indices for this edge
-                    edge_vertices = list(topo.vertices_from_edge(edge))
-                    vertex_indices = []
-                    for v in edge_vertices:
-                        v_hash = v.__hash__()
-                        if v_hash in all_vertices:
-                            vertex_indices.append(all_vertices[v_hash][0])
-                    
-                    # Ensure we have exactly edge_samples points
-                    points = edge_data['points']
-                    if len(points) != edge_samples:
-                        # Resample to get exactly edge_samples points
-                        if len(points) > 1:
-                            # Interpolate to get the right number of samples
-                            points = resample_curve_points(points, edge_samples)
-                        else:
-                            # Duplicate single point
-                            points = [points[0]] * edge_samples if points else [[0,0,0]] * edge_samples
-                    
-                    edge_info = {
-                        'points': points,  # This becomes edge_wcs
-                        'vertex_indices': vertex_indices
-                    }
-                    all_edges[edge_hash] = (edge_counter, edge_info)
-                    edge_counter += 1
-
-        # Extract faces with edge connectivity and grid points
-        for face in topo.faces():
-            face_hash = face.__hash__()
-            if face_hash not in all_faces:
-                face_data = extract_face_data(face)
-                if face_data:
-                    # Get edge indices for this face
-                    face_edges = list(topo.edges_from_face(face))
-                    edge_indices = []
-                    for e in face_edges:
-                        e_hash = e.__hash__()
-                        if e_hash in all_edges:
-                            edge_indices.append(all_edges[e_hash][0])
-                    
-                    # Generate grid points for surface reconstruction
-                    grid_points = generate_face_grid_points(face, grid_size, grid_size)
-                    if grid_points is None:
-                        # Fallback: create a flat grid from face bounds
-                        grid_points = create_fallback_face_grid(face, grid_size, grid_size)
-                    
-                    face_info = {
-                        'edge_indices': edge_indices,  # This becomes FaceEdgeAdj
-                        'grid_points': grid_points     # This becomes surf_wcs
-                    }
-                    all_faces[face_hash] = (face_counter, face_info)
-                    face_counter += 1
-
-        # Convert to the arrays expected by construct_brep function
-        
-        # 1. surf_wcs: Array of face grid points [num_faces, grid_size, grid_size, 3]
-        surf_wcs = []
-        for i in range(len(all_faces)):
-            face_info = None
-            for face_hash, (index, data) in all_faces.items():
-                if index == i:
-                    face_info = data
-                    break
-            
-            if face_info and face_info['grid_points']:
-                surf_wcs.append(face_info['grid_points'])
-            else:
-                # Fallback: create zero grid
-                surf_wcs.append([[[0,0,0] for _ in range(grid_size)] for _ in range(grid_size)])
-
-        # 2. edge_wcs: Array of edge points [num_edges, edge_samples, 3]
-        edge_wcs = []
-        for i in range(len(all_edges)):
-            edge_info = None
-            for edge_hash, (index, data) in all_edges.items():
-                if index == i:
-                    edge_info = data
-                    break
-            
-            if edge_info and edge_info['points']:
-                edge_wcs.append(edge_info['points'])
-            else:
-                # Fallback: create zero points
-                edge_wcs.append([[0,0,0] for _ in range(edge_samples)])
-
-        # 3. FaceEdgeAdj: List of edge indices for each face
-        FaceEdgeAdj = []
-        for i in range(len(all_faces)):
-            face_info = None
-            for face_hash, (index, data) in all_faces.items():
-                if index == i:
-                    face_info = data
-                    break
-            
-            if face_info:
-                FaceEdgeAdj.append(face_info['edge_indices'])
-            else:
-                FaceEdgeAdj.append([])
-
-        # 4. EdgeVertexAdj: List of vertex indices for each edge
-        EdgeVertexAdj = []
-        for i in range(len(all_edges)):
-            edge_info = None
-            for edge_hash, (index, data) in all_edges.items():
-                if index == i:
-                    edge_info = data
-                    break
-            
-            if edge_info:
-                EdgeVertexAdj.append(edge_info['vertex_indices'])
-            else:
-                EdgeVertexAdj.append([])
-
-        # 5. Vertices array
-        vertices = []
-        for i in range(len(all_vertices)):
-            vertex_data = None
-            for vertex_hash, (index, data) in all_vertices.items():
-                if index == i:
-                    vertex_data = data
-                    break
-            
-            if vertex_data:
-                vertices.append(vertex_data)
-            else:
-                vertices.append([0, 0, 0])
+        model = ShapeModel(shape, FACE_CACHE if incremental else None)
+        if output == 'store':
+            result_id = RESULT_STORE.new_id('brep_')
+            staging_dir = RESULT_STORE.staging_dir(result_id)
+            store = BrepArrayWriter(staging_dir, len(model.faces), len(model.edges), len(model.vertices),
+                                    grid_size, edge_samples, grid_mode)
+        result = build_brep_result(model, grid_size, edge_samples, grid_mode, lod, g.timer, fingerprints, store)
+        if incremental:
+            result['incremental'] = model.reuse_report()
+        if store:
+            for name, entry in result['arrays'].items():
+                entry['url'] = f"/results/{result_id}/{entry['file']}"
+            RESULT_STORE.commit(result_id, staging_dir, None, None, **result)
+            store = None
+            result['result_id'] = result_id
+            result['url'] = f"/results/{result_id}"
 
         # Cleanup uploaded file
         os.remove(filepath)
 
-        return jsonify({
-            'surf_wcs': surf_wcs,           # [num_faces, grid_size, grid_size, 3]
-            'edge_wcs': edge_wcs,           # [num_edges, edge_samples, 3]
-            'FaceEdgeAdj': FaceEdgeAdj,     # [num_faces] -> [edge_indices]
-            'EdgeVertexAdj': EdgeVertexAdj, # [num_edges] -> [vertex_indices]
-            'vertices': vertices,           # [num_vertices, 3]
-            'metadata': {
-                'num_faces': len(all_faces),
-                'num_edges': len(all_edges),
-                'num_vertices': len(all_vertices),
-                'grid_size': grid_size,
-                'edge_samples': edge_samples
-            }
-        })
+        with g.timer.stage('serialize'):
+            return jsonify(result)
 
     except Exception as e:
         # Cleanup uploaded file in case of error
         if os.path.exists(filepath):
             os.remove(filepath)
+        if store is not None:
+            RESULT_STORE.discard(store.directory)
+        if isinstance(e, DeadlineExceeded):
+            raise
         return jsonify({'error': f'Failed to parse STEP file for BREP: {str(e)}'}), 500
 
 
+# === Batch parsing === #
+PARSE_BATCH_WORKERS = int(os.environ.get('PARSE_BATCH_WORKERS', str(os.cpu_count() or 1)))
+PARSE_BATCH_MODES = ('topology', 'brep')
+PARSE_BATCH_FORMATS = ('ndjson', 'npz')
+STEP_EXTENSIONS = ('.step', '.stp')
+# Limits on one batch, checked against the sizes declared in ZIP archives before
+# anything is extracted
+PARSE_BATCH_MAX_FILES = int(os.environ.get('PARSE_BATCH_MAX_FILES', '1000'))
+PARSE_BATCH_MAX_BYTES = int(float(os.environ.get('PARSE_BATCH_MAX_MB', '4096')) * 2**20)
+# Per-file limit for requests without a deadline; a worker past it is killed and replaced
+PARSE_BATCH_FILE_TIMEOUT = float(os.environ.get('PARSE_BATCH_FILE_TIMEOUT', '600'))
+BREP_ARRAY_KEYS = ('surf_wcs', 'surf_mask', 'edge_wcs', 'vertices', 'FaceEdgeAdj', 'EdgeVertexAdj')
+
+
+def parse_step_file(filepath, mode, options, npz_path=None):
+    """
+    Parse one STEP file like /parse-step (mode 'topology') or /parse-step-for-brep
+    (mode 'brep'). Module-level so a process pool can run it; with npz_path the
+    brep arrays are written there instead of being returned.
+    """
+    timer = StageTimer(options['deadline_seconds'])
+    shape = read_step_file(filepath, timer)
+    if shape is None:
+        raise ValueError('Failed to read STEP file')
+
+    # Batch files already run one per process; sharding them too would fork pools of pools
+    model = ShapeModel(shape, FACE_CACHE if options['incremental'] else None, allow_shards=False)
+    if mode == 'topology':
+        result = build_parse_result(model, options['fields'], options['lod'], timer, options['graph_format'])
+    else:
+        result = build_brep_result(model, options['grid_size'], options['edge_samples'], options['grid_mode'],
+                                   options['lod'], timer, options['fingerprints'])
+    if options['incremental']:
+        result['incremental'] = model.reuse_report()
+
+    if npz_path:
+        with timer.stage('encode'):
+            write_brep_npz(result, npz_path)
+        result = None
+    return {'result': result, 'npz': npz_path, 'timings': timer.stages, 'counts': timer.counts}
+
+
+def parse_batch_task(task, mode, options):
+    """WorkerPool target for /parse-step-batch: task is (filepath, npz_path)"""
+    filepath, npz_path = task
+    try:
+        return parse_step_file(filepath, mode, options, npz_path)
+    except DeadlineExceeded as e:
+        return {'status': 'timeout', 'error': str(e)}
+
+
+def batch_file_timeout(options):
+    """
+    Seconds a batch worker may spend on one file before it is killed: the
+    request deadline (which applies per file) plus the grace period a worker
+    stuck inside OCC is given, or PARSE_BATCH_FILE_TIMEOUT without a deadline
+    """
+    if options['deadline_seconds']:
+        return options['deadline_seconds'] + DEADLINE_GRACE_SECONDS
+    return PARSE_BATCH_FILE_TIMEOUT
+
+
+def write_brep_npz(result, file):
+    """Save a /parse-step-for-brep result as NPZ, adjacency lists as int32 CSR pairs"""
+    arrays = {name: np.asarray(result[name], dtype=np.float64) for name in ('surf_wcs', 'edge_wcs', 'vertices')}
+    if 'surf_mask' in result:
+        arrays['surf_mask'] = np.asarray(result['surf_mask'], dtype=np.bool_)
+    for name in ('FaceEdgeAdj', 'EdgeVertexAdj'):
+        relation = CsrRelation.from_rows(result[name])
+        arrays[f"{name}_offsets"] = relation.offsets
+        arrays[f"{name}_indices"] = relation.indices
+    # Everything else (metadata, fingerprints, ...) goes in as one JSON string
+    extra = {key: value for key, value in result.items() if key not in BREP_ARRAY_KEYS}
+    arrays['metadata'] = np.array(json.dumps(extra))
+    np.savez(file, **arrays)
+
+
+class StreamBuffer(object):
+    """
+    Write-only, unseekable file object drained by a streaming response
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class BatchLimitExceeded(Exception):
+    """
+    Raised when a batch upload has more files or more (uncompressed) bytes than allowed
+    """
+
+
+def save_batch_uploads(files, directory, max_files=None, max_bytes=None):
+    """
+    Save uploaded STEP files, expanding ZIP archives; returns [(filename, path)].
+    Archive members are checked against max_files and max_bytes (defaults:
+    PARSE_BATCH_MAX_FILES, PARSE_BATCH_MAX_BYTES) before they are extracted.
+    """
+    max_files = PARSE_BATCH_MAX_FILES if max_files is None else max_files
+    max_bytes = PARSE_BATCH_MAX_BYTES if max_bytes is None else max_bytes
+    saved = []
+    total = 0
+
+    def target(name):
+        return os.path.join(directory, f"{len(saved):05d}_{os.path.basename(name)}")
+
+    def admit(size):
+        if len(saved) >= max_files:
+            raise BatchLimitExceeded(f"Batch has more than {max_files} STEP files")
+        if total + size > max_bytes:
+            raise BatchLimitExceeded(f"Batch exceeds {max_bytes // 2**20} MB of STEP data")
+        return total + size
+
+    for file in files:
+        if not file.filename:
+            continue
+        if file.filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(file.stream) as archive:
+                for member in archive.infolist():
+                    name = os.path.basename(member.filename)
+                    if member.is_dir() or not name.lower().endswith(STEP_EXTENSIONS):
+                        continue
+                    # The reader stops at the declared size, so it bounds what is written
+                    total = admit(member.file_size)
+                    path = target(name)
+                    with archive.open(member) as source, open(path, 'wb') as dest:
+                        shutil.copyfileobj(source, dest)
+                    saved.append((member.filename, path))
+        else:
+            path = target(file.filename)
+            file.save(path)
+            total = admit(os.path.getsize(path))
+            saved.append((file.filename, path))
+    return saved
+
+
+@app.route('/parse-step-batch', methods=['POST'])
+@worker_role('parse')
+def parse_step_batch():
+    """
+    Parse many STEP files (or ZIP archives of them) in parallel worker processes.
+    Per-file results stream back as they complete, as NDJSON records or as a
+    zip of NPZ files (format=npz, brep mode only). A worker still on a file
+    past batch_file_timeout is killed and replaced, and the file is recorded
+    as a timeout.
+    """
+    files = request.files.getlist('files')
+    if not files:
+        return jsonify({'error': 'No files uploaded'}), 400
+
+    mode = request.form.get('mode', 'brep')
+    output_format = request.form.get('format', 'ndjson')
+    if mode not in PARSE_BATCH_MODES:
+        return jsonify({'error': f"Unknown mode '{mode}', expected one of: {', '.join(PARSE_BATCH_MODES)}"}), 400
+    if output_format not in PARSE_BATCH_FORMATS:
+        return jsonify({'error': f"Unknown format '{output_format}', expected one of: "
+                                 f"{', '.join(PARSE_BATCH_FORMATS)}"}), 400
+    if output_format == 'npz' and mode != 'brep':
+        return jsonify({'error': 'format=npz is only available in brep mode'}), 400
+
+    grid_mode = request.form.get('grid_mode', 'full')
+    if grid_mode not in ('full', 'trimmed'):
+        return jsonify({'error': f"Unknown grid_mode '{grid_mode}', expected 'full' or 'trimmed'"}), 400
+    try:
+        options = {
+            'fields': resolve_parse_fields(request.form.get('fields') or request.form.get('include')),
+            'lod': resolve_mesh_lod(request.form.get('lod')),
+            'graph_format': resolve_graph_format(request.form.get('graph_format')),
+            'grid_size': int(request.form.get('grid_size', '32')),
+            'edge_samples': int(request.form.get('edge_samples', '32')),
+            'grid_mode': grid_mode,
+            'fingerprints': request.form.get('fingerprints', 'false').lower() == 'true',
+            'incremental': request.form.get('incremental', 'false').lower() == 'true',
+            # The request deadline applies to each file, not to the whole stream
+            'deadline_seconds': g.timer.deadline_seconds,
+        }
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    batch_dir = tempfile.mkdtemp(prefix='batch_', dir=UPLOAD_FOLDER)
+    try:
+        with g.timer.stage('upload'):
+            uploads = save_batch_uploads(files, batch_dir)
+    except zipfile.BadZipFile as e:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        return jsonify({'error': f'Invalid ZIP archive: {str(e)}'}), 400
+    except BatchLimitExceeded as e:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        return jsonify({'error': str(e)}), 413
+    if not uploads:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        return jsonify({'error': 'No STEP files found in the upload'}), 400
+
+    # Admission runs here so rejected files never reach the pool; heavy files
+    # take a slot each when they start, like single-file requests
+    jobs = []
+    rejected = []
+    for index, (filename, path) in enumerate(uploads):
+        estimate, rejection = admit_step_upload(path, g.timer, acquire_slot=False)
+        if rejection:
+            rejected.append({'index': index, 'filename': filename, 'status': 'rejected',
+                             'error': rejection[0], 'estimate': estimate})
+        else:
+            jobs.append((index, filename, path, estimate['heavy']))
+    g.timer.count('files', len(uploads))
+
+    def records():
+        """Yield per-file records as soon as each file is done"""
+        for record in rejected:
+            yield record, None
+        if not jobs:
+            return
+        pool = WorkerPool(max(1, min(PARSE_BATCH_WORKERS, len(jobs))), batch_file_timeout(options),
+                          parse_batch_task, (mode, options), context=FACE_SHARD_CONTEXT)
+        pending = [job for job in jobs if not job[3]]
+        waiting = [job for job in jobs if job[3]]
+        running = {}  # index -> (filename, heavy slot held while it runs)
+
+        def submit(job, slot=None):
+            index, filename, path, heavy = job
+            npz_path = f"{path}.npz" if output_format == 'npz' else None
+            pool.submit(index, (path, npz_path))
+            running[index] = (filename, slot)
+
+        try:
+            while pending or waiting or running:
+                # Start heavy files while slots are free; block for one only when nothing else can run
+                while waiting and pool.idle():
+                    slot = acquire_heavy_slot(0 if running or pending else HEAVY_JOB_QUEUE_TIMEOUT)
+                    if slot is None:
+                        break
+                    submit(waiting.pop(0), slot)
+                while pending and pool.idle():
+                    submit(pending.pop(0))
+                if not running:
+                    index, filename = waiting.pop(0)[:2]
+                    yield {'index': index, 'filename': filename, 'status': 'rejected',
+                           'error': 'Timed out waiting for a heavy job slot'}, None
+                    continue
+
+                for index, outcome in pool.wait(timeout=1.0):
+                    filename, slot = running.pop(index)
+                    if slot is not None:
+                        release_heavy_slot(slot)
+                    record = {'index': index, 'filename': filename}
+                    if outcome['status'] != 'success':
+                        # A worker that crashed was replaced; its file counts as an error
+                        status = 'timeout' if outcome['status'] == 'timeout' else 'error'
+                        record.update(status=status, error=outcome['error'])
+                        yield record, None
+                        continue
+                    record.update(status='success', timings=outcome['timings'], counts=outcome['counts'])
+                    if outcome['result'] is not None:
+                        record['result'] = outcome['result']
+                    yield record, outcome['npz']
+        finally:
+            # A client that hung up stops the batch: queued files never start and
+            # files still running are killed with their workers
+            pool.close()
+            for filename, slot in running.values():
+                if slot is not None:
+                    release_heavy_slot(slot)
+
+    def summary(counts):
+        return {'status': 'complete', 'total': len(uploads), **counts}
+
+    def generate_ndjson():
+        counts = {'success': 0, 'error': 0, 'rejected': 0, 'timeout': 0}
+        try:
+            for record, _ in records():
+                counts[record['status']] += 1
+                yield json.dumps(record) + '\n'
+            yield json.dumps(summary(counts)) + '\n'
+        finally:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+
+    def generate_npz():
+        counts = {'success': 0, 'error': 0, 'rejected': 0, 'timeout': 0}
+        index_records = []
+        buffer = StreamBuffer()
+        try:
+            with zipfile.ZipFile(buffer, 'w') as archive:
+                for record, npz_path in records():
+                    counts[record['status']] += 1
+                    stem = f"{record['index']:05d}_{os.path.splitext(os.path.basename(record['filename']))[0]}"
+                    if npz_path:
+                        record['file'] = f"{stem}.npz"
+                        archive.write(npz_path, record['file'])
+                        os.remove(npz_path)
+                    else:
+                        record['file'] = f"{stem}.error.json"
+                        archive.writestr(record['file'], json.dumps(record))
+                    index_records.append(record)
+                    yield buffer.drain()
+                archive.writestr('results.json', json.dumps({'files': index_records, **summary(counts)}))
+            yield buffer.drain()
+        finally:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+
+    g.timer.deadline = None
+    disarm_deadline_watchdog()
+    if output_format == 'npz':
+        response = Response(stream_with_context(generate_npz()), mimetype='application/zip')
+        response.headers['Content-Disposition'] = 'attachment; filename=parse_batch.zip'
+    else:
+        response = Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+    return response
+
+
 def resample_curve_points(points, target_samples):
     """Resample curve points to get exactly target_samples points"""
     if len(points) <= 1:
@@ -1134,9 +3458,7 @@ def create_fallback_face_grid(face, u_samples, v_samples):
     """Create a fallback grid when surface evaluation fails"""
     try:
         # Get face triangulation
-        BRepMesh_IncrementalMesh(face, 0.01)
-        loc = TopLoc_Location()
-        triangulation = BRep_Tool.Triangulation(face, loc)
+        triangulation, loc = face_triangulation(face)
         
         if triangulation:
             nodes = triangulation.Nodes()
@@ -1154,7 +3476,111 @@ def create_fallback_face_grid(face, u_samples, v_samples):
         return [[[0,0,0] for _ in range(v_samples)] for _ in range(u_samples)]
 
 
+# === Welded mesh / GLB export === #
+def build_welded_mesh(shape, lod=None, with_normals=True, timer=None):
+    """
+    Tessellate a shape into one indexed vertex buffer with per-triangle face
+    ids; the ids are the /parse-step face indices, and faces without a
+    triangulation are skipped without shifting the others
+    """
+    model = as_shape_model(shape)
+    settings = model.mesh(lod, timer)
+    model.triangulate(timer)
+
+    all_points = []
+    all_triangles = []
+    all_face_ids = []
+    offset = 0
+    for face_index, face in enumerate(model.faces):
+        points, triangles = triangulation_arrays(face)
+        if points is None:
+            continue
+        all_points.append(points)
+        all_triangles.append(triangles + offset)
+        all_face_ids.append(np.full(len(triangles), face_index, dtype=np.uint32))
+        offset += len(points)
+
+    if not all_points:
+        raise ValueError('Shape has no triangulated faces')
+
+    points = np.concatenate(all_points)
+    triangles = np.concatenate(all_triangles)
+    face_ids = np.concatenate(all_face_ids)
+
+    # Weld nodes that coincide on shared edges, using a tolerance well below the deflection
+    tolerance = max(settings['linear_deflection'] * 1e-3, 1e-9)
+    positions, indices, face_ids, normals = weld_mesh(points, triangles, face_ids, tolerance, with_normals)
+
+    return {
+        'positions': positions,
+        'indices': indices,
+        'face_ids': face_ids,
+        'normals': normals,
+        'face_count': len(model.faces),
+        'mesh_settings': settings
+    }
+
+
+@app.route('/export-glb', methods=['POST'])
+@worker_role('parse')
+def export_glb():
+    """Export a STEP file as a welded, indexed GLB mesh with per-triangle face ids"""
+    file = request.files.get('file')
+    if not file:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    with_normals = request.form.get('normals', 'true').lower() == 'true'
+    quantize = request.form.get('quantize', 'false').lower() == 'true'
+    try:
+        lod = resolve_mesh_lod(request.form.get('lod'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    filepath = os.path.join(UPLOAD_FOLDER, file.filename)
+    with g.timer.stage('upload'):
+        file.save(filepath)
+
+    estimate, rejection = admit_step_upload(filepath, g.timer)
+    if rejection:
+        os.remove(filepath)
+        message, status = rejection
+        return jsonify({'error': message, 'estimate': estimate}), status
+
+    try:
+        # Read STEP file
+        shape = read_step_file(filepath, g.timer)
+
+        if shape is None:
+            return jsonify({'error': 'Failed to read STEP file'}), 500
+
+        with g.timer.stage('mesh'):
+            mesh = build_welded_mesh(shape, lod, with_normals, g.timer)
+        g.timer.count('faces', mesh['face_count'])
+        g.timer.count('triangles', len(mesh['indices']))
+
+        with g.timer.stage('encode'):
+            glb = encode_glb(mesh['positions'], mesh['indices'], mesh['face_ids'],
+                             mesh['normals'], quantize)
+
+        # Cleanup uploaded file
+        os.remove(filepath)
+
+        model_name = os.path.splitext(file.filename)[0]
+        return send_file(BytesIO(glb), mimetype='model/gltf-binary',
+                         as_attachment=True, download_name=f"{model_name}.glb")
+
+    except Exception as e:
+        # Cleanup uploaded file in case of error
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        if isinstance(e, DeadlineExceeded):
+            raise
+        return jsonify({'error': f'Failed to export GLB: {str(e)}'}), 500
+
+
 @app.route('/render-step', methods=['POST'])
+@worker_role('render')
+@progress_stream
 def render_step():
     """Render STEP file to images with various viewing angles"""
     print("[render-step] Received request", flush=True)
@@ -1175,32 +3601,35 @@ def render_step():
 
     filepath = os.path.join(UPLOAD_FOLDER, file.filename)
     print(f"[render-step] Saving uploaded file to: {filepath}", flush=True)
-    file.save(filepath)
+    with g.timer.stage('upload'):
+        file.save(filepath)
+
+    estimate, rejection = admit_step_upload(filepath, g.timer)
+    if rejection:
+        os.remove(filepath)
+        message, status = rejection
+        return jsonify({'error': message, 'estimate': estimate}), status
 
     try:
         # Read STEP file
         print(f"[render-step] Reading STEP file: {filepath}", flush=True)
-        reader = STEPControl_Reader()
-        status = reader.ReadFile(filepath)
+        shape = read_step_file(filepath, g.timer)
 
-        if status != IFSelect_RetDone:
+        if shape is None:
             print(f"[render-step] Failed to read STEP file: {filepath}", flush=True)
             return jsonify({'error': 'Failed to read STEP file'}), 500
 
         print(f"[render-step] STEP file read successfully: {filepath}", flush=True)
-        reader.TransferRoot()
-        shape = reader.OneShape()
 
-        # Create unique output directory for this render
+        # Render into a staging directory of the artifact store
         model_name = os.path.splitext(file.filename)[0]
-        render_id = f"{model_name}_{int(os.urandom(4).hex(), 16)}"
-        output_dir = os.path.join(RENDERS_FOLDER, render_id)
-        print(f"[render-step] Creating output directory: {output_dir}", flush=True)
-        os.makedirs(output_dir, exist_ok=True)
+        render_id = RENDER_STORE.new_id()
+        output_dir = RENDER_STORE.staging_dir(render_id)
+        print(f"[render-step] Created staging directory: {output_dir}", flush=True)
 
         # Render the model
         print(f"[render-step] Starting rendering for model: {model_name}", flush=True)
-        rendered_files = render_step_model(shape, output_dir, model_name, render_options)
+        rendered_files = render_step_model(shape, output_dir, model_name, render_options, g.timer)
         print(f"[render-step] Rendering complete. Rendered files: {rendered_files}", flush=True)
 
         # Cleanup uploaded file
@@ -1210,36 +3639,45 @@ def render_step():
         # Return based on requested format
         if render_options['return_format'] == 'zip':
             # Create ZIP file with all rendered images
-            zip_path = os.path.join(output_dir, f"{model_name}_renders.zip")
+            zip_name = f"{model_name}_renders.zip"
+            zip_path = os.path.join(output_dir, zip_name)
             print(f"[render-step] Creating ZIP archive: {zip_path}", flush=True)
-            with zipfile.ZipFile(zip_path, 'w') as zipf:
+            with g.timer.stage('encode'), zipfile.ZipFile(zip_path, 'w') as zipf:
                 for rendered_file in rendered_files:
                     zipf.write(rendered_file, os.path.basename(rendered_file))
-            print(f"[render-step] Returning ZIP file: {zip_path}", flush=True)
-            return send_file(zip_path, as_attachment=True, download_name=f"{model_name}_renders.zip")
+
+            # Keep the render so it can be downloaded again from /renders/<render_id>
+            RENDER_STORE.commit(render_id, output_dir, zip_name, zip_name, kind='render',
+                                model_name=model_name, views=len(rendered_files))
+            print(f"[render-step] Returning ZIP file for render {render_id}", flush=True)
+            response = send_file(os.path.join(RENDERS_FOLDER, render_id, zip_name), as_attachment=True,
+                                 download_name=zip_name, conditional=True, etag=True)
+            response.headers['X-Render-Id'] = render_id
+            return response
 
         else:  # return_format == 'json'
             # Convert images to base64 and return in JSON
             images_data = []
-            for rendered_file in rendered_files:
-                with open(rendered_file, 'rb') as img_file:
-                    img_data = base64.b64encode(img_file.read()).decode('utf-8')
-                    images_data.append({
-                        'filename': os.path.basename(rendered_file),
-                        'data': img_data
-                    })
+            with g.timer.stage('encode'):
+                for rendered_file in rendered_files:
+                    with open(rendered_file, 'rb') as img_file:
+                        img_data = base64.b64encode(img_file.read()).decode('utf-8')
+                        images_data.append({
+                            'filename': os.path.basename(rendered_file),
+                            'data': img_data
+                        })
             print(f"[render-step] Returning {len(images_data)} images as JSON", flush=True)
             # Cleanup render directory
-            import shutil
             print(f"[render-step] Removing render directory: {output_dir}", flush=True)
-            shutil.rmtree(output_dir)
-
-            return jsonify({
-                'model_name': model_name,
-                'render_options': render_options,
-                'images': images_data,
-                'count': len(images_data)
-            })
+            RENDER_STORE.discard(output_dir)
+
+            with g.timer.stage('serialize'):
+                return jsonify({
+                    'model_name': model_name,
+                    'render_options': render_options,
+                    'images': images_data,
+                    'count': len(images_data)
+                })
 
     except Exception as e:
         # Cleanup uploaded file and render directory in case of error
@@ -1248,13 +3686,15 @@ def render_step():
             print(f"[render-step] Removing uploaded file due to error: {filepath}", flush=True)
             os.remove(filepath)
         if 'output_dir' in locals() and os.path.exists(output_dir):
-            import shutil
             print(f"[render-step] Removing output directory due to error: {output_dir}", flush=True)
-            shutil.rmtree(output_dir)
+            RENDER_STORE.discard(output_dir)
+        if isinstance(e, DeadlineExceeded):
+            raise
         return jsonify({'error': f'Failed to render STEP file: {str(e)}'}), 500
 
 
 @app.route('/render-step-batch', methods=['POST'])
+@worker_role('render')
 def render_step_batch():
     """Render multiple STEP files in batch"""
     files = request.files.getlist('files')
@@ -1269,9 +3709,8 @@ def render_step_batch():
         'num_orbit_views': int(request.form.get('num_orbit_views', '12'))
     }
 
-    batch_id = f"batch_{int(os.urandom(4).hex(), 16)}"
-    batch_output_dir = os.path.join(RENDERS_FOLDER, batch_id)
-    os.makedirs(batch_output_dir, exist_ok=True)
+    batch_id = RENDER_STORE.new_id('batch_')
+    batch_output_dir = RENDER_STORE.staging_dir(batch_id)
 
     results = []
     
@@ -1280,14 +3719,24 @@ def render_step_batch():
             continue
             
         filepath = os.path.join(UPLOAD_FOLDER, file.filename)
-        file.save(filepath)
+        with g.timer.stage('upload'):
+            file.save(filepath)
 
         try:
+            estimate, rejection = admit_step_upload(filepath, g.timer)
+            if rejection:
+                results.append({
+                    'filename': file.filename,
+                    'status': 'rejected',
+                    'error': rejection[0],
+                    'estimate': estimate
+                })
+                continue
+
             # Read STEP file
-            reader = STEPControl_Reader()
-            status = reader.ReadFile(filepath)
+            shape = read_step_file(filepath, g.timer)
 
-            if status != IFSelect_RetDone:
+            if shape is None:
                 results.append({
                     'filename': file.filename,
                     'status': 'error',
@@ -1295,16 +3744,13 @@ def render_step_batch():
                 })
                 continue
 
-            reader.TransferRoot()
-            shape = reader.OneShape()
-
             # Create output directory for this model
             model_name = os.path.splitext(file.filename)[0]
             model_output_dir = os.path.join(batch_output_dir, model_name)
             os.makedirs(model_output_dir, exist_ok=True)
 
             # Render the model
-            rendered_files = render_step_model(shape, model_output_dir, model_name, render_options)
+            rendered_files = render_step_model(shape, model_output_dir, model_name, render_options, g.timer)
 
             results.append({
                 'filename': file.filename,
@@ -1313,6 +3759,10 @@ def render_step_batch():
                 'model_dir': model_name
             })
 
+        except DeadlineExceeded:
+            # The deadline covers the whole batch
+            RENDER_STORE.discard(batch_output_dir)
+            raise
         except Exception as e:
             results.append({
                 'filename': file.filename,
@@ -1325,8 +3775,9 @@ def render_step_batch():
                 os.remove(filepath)
 
     # Create ZIP file with all batch results
-    zip_path = os.path.join(batch_output_dir, f"{batch_id}_renders.zip")
-    with zipfile.ZipFile(zip_path, 'w') as zipf:
+    zip_name = f"{batch_id}_renders.zip"
+    zip_path = os.path.join(batch_output_dir, zip_name)
+    with g.timer.stage('encode'), zipfile.ZipFile(zip_path, 'w') as zipf:
         for root, dirs, files in os.walk(batch_output_dir):
             for file in files:
                 if file.endswith('.png'):
@@ -1334,7 +3785,120 @@ def render_step_batch():
                     arcname = os.path.relpath(file_path, batch_output_dir)
                     zipf.write(file_path, arcname)
 
-    return send_file(zip_path, as_attachment=True, download_name=f"{batch_id}_renders.zip")
+    RENDER_STORE.commit(batch_id, batch_output_dir, zip_name, zip_name, kind='batch', results=results)
+    response = send_file(os.path.join(RENDERS_FOLDER, batch_id, zip_name), as_attachment=True,
+                         download_name=zip_name, conditional=True, etag=True)
+    response.headers['X-Render-Id'] = batch_id
+    return response
+
+
+# Output name -> worker role it needs
+ANALYZE_OUTPUTS = {'topology': 'parse', 'brep': 'parse', 'renders': 'render'}
+
+
+def analyze_outputs():
+    return [name.strip() for name in request.form.get('outputs', 'topology,brep').split(',') if name.strip()]
+
+
+def analyze_roles():
+    """Worker roles needed by the requested outputs; unknown outputs are left to the view"""
+    return sorted({ANALYZE_OUTPUTS[name] for name in analyze_outputs() if name in ANALYZE_OUTPUTS})
+
+
+@app.route('/analyze', methods=['POST'])
+@worker_role(analyze_roles)
+@progress_stream
+def analyze():
+    """
+    Run the selected outputs (topology, brep, renders) over one shared shape
+    model: the file is read, indexed and tessellated once for all of them
+    """
+    file = request.files.get('file')
+    if not file:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    outputs = analyze_outputs()
+    unknown = [name for name in outputs if name not in ANALYZE_OUTPUTS]
+    if unknown or not outputs:
+        return jsonify({'error': f"Unknown outputs {unknown}, expected any of: {', '.join(ANALYZE_OUTPUTS)}"}), 400
+
+    grid_mode = request.form.get('grid_mode', 'full')
+    fingerprints = request.form.get('fingerprints', 'false').lower() == 'true'
+    incremental = request.form.get('incremental', 'false').lower() == 'true'
+    if grid_mode not in ('full', 'trimmed'):
+        return jsonify({'error': f"Unknown grid_mode '{grid_mode}', expected 'full' or 'trimmed'"}), 400
+    try:
+        grid_size = int(request.form.get('grid_size', '32'))
+        edge_samples = int(request.form.get('edge_samples', '32'))
+        render_options = {
+            'face_coloring_mode': request.form.get('face_coloring_mode', 'uniform'),
+            'show_edges': request.form.get('show_edges', 'true').lower() == 'true',
+            'show_vertices': request.form.get('show_vertices', 'true').lower() == 'true',
+            'num_orbit_views': int(request.form.get('num_orbit_views', '12'))
+        }
+        fields = resolve_parse_fields(request.form.get('fields') or request.form.get('include'))
+        lod = resolve_mesh_lod(request.form.get('lod'))
+        graph_format = resolve_graph_format(request.form.get('graph_format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    filepath = os.path.join(UPLOAD_FOLDER, file.filename)
+    with g.timer.stage('upload'):
+        file.save(filepath)
+
+    estimate, rejection = admit_step_upload(filepath, g.timer)
+    if rejection:
+        os.remove(filepath)
+        message, status = rejection
+        return jsonify({'error': message, 'estimate': estimate}), status
+
+    output_dir = None
+    try:
+        shape = read_step_file(filepath, g.timer)
+        os.remove(filepath)
+
+        if shape is None:
+            return jsonify({'error': 'Failed to read STEP file'}), 500
+
+        model = ShapeModel(shape, FACE_CACHE if incremental else None)
+        model_name = os.path.splitext(file.filename)[0]
+        result = {'model_name': model_name, 'outputs': outputs}
+
+        if 'topology' in outputs:
+            result['topology'] = build_parse_result(model, fields, lod, g.timer, graph_format)
+        if 'brep' in outputs:
+            result['brep'] = build_brep_result(model, grid_size, edge_samples, grid_mode, lod, g.timer,
+                                               fingerprints)
+        if 'renders' in outputs:
+            render_id = RENDER_STORE.new_id()
+            output_dir = RENDER_STORE.staging_dir(render_id)
+            rendered_files = render_step_model(model, output_dir, model_name, render_options, g.timer)
+            zip_name = f"{model_name}_renders.zip"
+            with g.timer.stage('encode'), zipfile.ZipFile(os.path.join(output_dir, zip_name), 'w') as zipf:
+                for rendered_file in rendered_files:
+                    zipf.write(rendered_file, os.path.basename(rendered_file))
+            RENDER_STORE.commit(render_id, output_dir, zip_name, zip_name, kind='render',
+                                model_name=model_name, views=len(rendered_files))
+            result['renders'] = {
+                'render_id': render_id,
+                'url': f"/renders/{render_id}",
+                'files': [os.path.basename(path) for path in rendered_files],
+                'render_options': render_options
+            }
+        if incremental:
+            result['incremental'] = model.reuse_report()
+
+        with g.timer.stage('serialize'):
+            return jsonify(result)
+
+    except Exception as e:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        if output_dir is not None and os.path.exists(output_dir):
+            RENDER_STORE.discard(output_dir)
+        if isinstance(e, DeadlineExceeded):
+            raise
+        return jsonify({'error': f'Failed to analyze STEP file: {str(e)}'}), 500
 
 
 @app.route('/health', methods=['GET'])
@@ -1343,11 +3907,22 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'service': 'STEP Parser & Renderer',
+        'role': WORKER_ROLE,
+        'pid': os.getpid(),
+        'render_stack_loaded': render_stack_loaded(),
         'endpoints': {
             'parse': '/parse-step',
             'parse_for_brep': '/parse-step-for-brep',
+            'parse_compact': '/parse-step-compact',
+            'parse_batch': '/parse-step-batch',
             'render': '/render-step',
             'batch_render': '/render-step-batch',
+            'export_glb': '/export-glb',
+            'analyze': '/analyze',
+            'prescan': '/prescan-step',
+            'renders': '/renders/<render_id>',
+            'results': '/results/<result_id>',
+            'metrics': '/metrics',
             'test_rendering': '/test-rendering',
             'test_opencascade': '/test-opencascade'
         }
@@ -1355,6 +3930,7 @@ def health_check():
 
 
 @app.route('/test-rendering', methods=['GET'])
+@worker_role('render')
 def test_rendering():
     """Test the rendering capability with detailed diagnostics"""
     test_results = {
@@ -1583,5 +4159,28 @@ def test_opencascade():
         }), 500
 
 
+# === Service startup === #
+# Offline tools that import this module (convert_dataset.py) set
+# STEP_SERVICE_STARTUP=false before the import: no working directories in
+# their cwd and no sweeper threads in a process that forks workers. Shard and
+# batch worker processes (spawned, so they import this module again) never start it.
+STEP_SERVICE_STARTUP = (os.environ.get('STEP_SERVICE_STARTUP', 'true').lower() == 'true'
+                        and multiprocessing.parent_process() is None)
+
+
+def start_service():
+    """Create the working directories and start the artifact store sweepers"""
+    for folder in (UPLOAD_FOLDER, WORKER_STATE_DIR, RENDER_STORE.root, RESULT_STORE.root):
+        os.makedirs(folder, exist_ok=True)
+    if WORKER_ROLE != 'parse':
+        RENDER_STORE.start_sweeper(RENDERS_SWEEP_INTERVAL)
+    if WORKER_ROLE != 'render':
+        RESULT_STORE.start_sweeper(RESULTS_SWEEP_INTERVAL)
+
+
+if STEP_SERVICE_STARTUP:
+    start_service()
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', '5001')))
\ No newline at end of file
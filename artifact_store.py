@@ -0,0 +1,321 @@
+"""Directory-per-artifact store on disk with a size quota, an idle TTL and LRU eviction.
+
+Used by app.py for render outputs and memory-mapped parse results, which are
+written here as .npy files while they are computed, and for the per-face
+result cache of incremental re-parses. Nothing here imports OpenCASCADE, so
+the stores can be used and tested on their own.
+"""
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from topology_arrays import CsrRelation
+
+
+class ArtifactStore(object):
+    """
+    Artifacts (renders, stored results) on disk with a size quota, an idle TTL and LRU eviction.
+    Each artifact is a directory <root>/<id>/ with its files and a manifest; the
+    manifest's mtime is the last access time, so all workers share the LRU order.
+    Artifacts are built in a staging directory and renamed into place on commit.
+    """
+
+    MANIFEST = 'artifact.json'
+    STAGING_PREFIX = '.staging_'
+    ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+    def __init__(self, root, max_bytes, ttl_seconds):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._sweeper = None
+
+    def new_id(self, prefix=''):
+        return f"{prefix}{os.urandom(8).hex()}"
+
+    def staging_dir(self, artifact_id):
+        """Create the directory an artifact is built in before commit"""
+        path = os.path.join(self.root, f"{self.STAGING_PREFIX}{artifact_id}")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def discard(self, staging_dir):
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def commit(self, artifact_id, staging_dir, primary, download_name, **metadata):
+        """Publish a staged artifact; primary is the file served for its id"""
+        manifest = dict(metadata, id=artifact_id, primary=primary, download_name=download_name,
+                        created_at=time.time(), size_bytes=directory_size(staging_dir))
+        with open(os.path.join(staging_dir, self.MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+        os.rename(staging_dir, os.path.join(self.root, artifact_id))
+        self.sweep(keep=artifact_id)
+        return manifest
+
+    def get(self, artifact_id):
+        """Manifest of an artifact (marking it as used), or None"""
+        if not self.ID_PATTERN.match(artifact_id):
+            return None
+        manifest_path = os.path.join(self.root, artifact_id, self.MANIFEST)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            os.utime(manifest_path)
+        except (OSError, ValueError):
+            return None
+        return manifest
+
+    def file_path(self, artifact_id, filename):
+        """Path of a file inside an artifact, or None if it does not exist"""
+        if os.path.basename(filename) != filename or filename == self.MANIFEST:
+            return None
+        path = os.path.join(self.root, artifact_id, filename)
+        return path if os.path.isfile(path) else None
+
+    def entries(self):
+        """(id, path, last_access, size_bytes, staging) for every directory in the store"""
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                continue
+            manifest_path = os.path.join(path, self.MANIFEST)
+            try:
+                if os.path.exists(manifest_path):
+                    with open(manifest_path) as f:
+                        size = json.load(f).get('size_bytes', 0)
+                    last_access = os.path.getmtime(manifest_path)
+                else:
+                    # Staging directories and renders from before the store
+                    size = directory_size(path)
+                    last_access = os.path.getmtime(path)
+            except (OSError, ValueError):
+                continue
+            entries.append((name, path, last_access, size, name.startswith(self.STAGING_PREFIX)))
+        return entries
+
+    def usage(self):
+        entries = [entry for entry in self.entries() if not entry[4]]
+        return {
+            'artifacts': len(entries),
+            'size_bytes': sum(entry[3] for entry in entries),
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds
+        }
+
+    def sweep(self, keep=None):
+        """Remove idle artifacts past the TTL, then least recently used ones past the quota"""
+        now = time.time()
+        removed = []
+        live = []
+        for name, path, last_access, size, staging in self.entries():
+            if now - last_access > self.ttl_seconds and name != keep:
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(name)
+            elif not staging:
+                live.append((last_access, name, path, size))
+
+        total = sum(entry[3] for entry in live)
+        for last_access, name, path, size in sorted(live):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(name)
+            total -= size
+
+        if removed:
+            print(f"[artifacts] Swept {len(removed)} artifact(s) from {self.root}", flush=True)
+        return removed
+
+    def start_sweeper(self, interval):
+        """Sweep periodically in a daemon thread"""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"[artifacts] Sweep failed: {str(e)}", flush=True)
+
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=run, name='artifact-sweeper', daemon=True)
+            self._sweeper.start()
+
+
+def directory_size(path):
+    """Total size in bytes of the files below a directory"""
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+# === Per-face result cache === #
+class FaceResultCache(object):
+    """
+    Disk cache of per-face results, one JSON file per key. An entry's mtime
+    is its last use, so all workers share the LRU order; least recently used
+    entries are evicted past max_bytes every SWEEP_EVERY writes.
+    """
+
+    SWEEP_EVERY = 500  # writes between quota sweeps
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def key(self, fingerprint, product, params):
+        signature = json.dumps([fingerprint, product, params], separators=(',', ':'))
+        return hashlib.sha1(signature.encode()).hexdigest()[:20]
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def contains(self, key):
+        return os.path.exists(self.path(key))
+
+    def get(self, key):
+        """Cached entry {'value': ...} (marking it as used), or None on a miss"""
+        path = self.path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def put(self, key, value):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write through a temp file so other workers never read a partial entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'value': value}, f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._writes += 1
+            sweep = self._writes % self.SWEEP_EVERY == 0
+        if sweep:
+            self.sweep()
+
+    def sweep(self):
+        """Evict least recently used entries until the cache is under its quota"""
+        entries = []
+        for path in glob.glob(os.path.join(self.root, '*', '*.json')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+# === Memory-mapped result arrays === #
+def trim_npy(path, rows):
+    """Shrink the first dimension of an .npy file in place, keeping its first rows"""
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        data_offset = f.tell()
+        header_start = 10 if version == (1, 0) else 12
+        header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': fortran_order,
+                       'shape': (rows,) + tuple(shape[1:])}).encode('latin1')
+        # Same header length (fewer digits only shrink it), so the data offset does not move
+        f.seek(header_start)
+        f.write(header.ljust(data_offset - header_start - 1) + b'\n')
+        row_bytes = int(np.prod(shape[1:], dtype=np.int64)) * dtype.itemsize
+        f.truncate(data_offset + rows * row_bytes)
+    return data_offset, row_bytes
+
+
+class BrepArrayWriter(object):
+    """
+    Writes the /parse-step-for-brep arrays into memory-mapped .npy files while
+    they are computed, so no array is ever held in memory as a whole. Arrays are
+    sized for every unique sub-shape up front and trimmed on finish().
+    """
+
+    def __init__(self, directory, num_faces, num_edges, num_vertices, grid_size, edge_samples, grid_mode):
+        self.directory = directory
+        self.arrays = {}
+        self._open('surf_wcs', (num_faces, grid_size, grid_size, 3), np.float64)
+        if grid_mode == 'trimmed':
+            self._open('surf_mask', (num_faces, grid_size, grid_size), np.bool_)
+        self._open('edge_wcs', (num_edges, edge_samples, 3), np.float64)
+        self._open('vertices', (num_vertices, 3), np.float64)
+
+    def _open(self, name, shape, dtype):
+        self.arrays[name] = np.lib.format.open_memmap(
+            os.path.join(self.directory, f"{name}.npy"), mode='w+', dtype=dtype, shape=shape)
+
+    def write(self, name, row, value):
+        if name in self.arrays:
+            self.arrays[name][row] = value
+
+    def finish(self, rows, relations):
+        """
+        Trim each array to its written rows and store the relations as CSR
+        offsets/indices; returns the array manifest
+        """
+        manifest = {}
+        for name in list(self.arrays):
+            # Unmap before truncating the file
+            array = self.arrays.pop(name)
+            dtype = array.dtype
+            shape = (rows[name],) + array.shape[1:]
+            array.flush()
+            del array
+            data_offset, row_bytes = trim_npy(os.path.join(self.directory, f"{name}.npy"), shape[0])
+            manifest[name] = self._entry(name, dtype, shape, data_offset, row_bytes)
+
+        for relation_name, lists in relations.items():
+            relation = CsrRelation.from_rows(lists)
+            for part in ('offsets', 'indices'):
+                name = f"{relation_name}_{part}"
+                array = getattr(relation, part)
+                np.save(os.path.join(self.directory, f"{name}.npy"), array)
+                data_offset = os.path.getsize(os.path.join(self.directory, f"{name}.npy")) - array.nbytes
+                manifest[name] = self._entry(name, array.dtype, array.shape, data_offset, array.dtype.itemsize)
+        return manifest
+
+    def _entry(self, name, dtype, shape, data_offset, row_bytes):
+        # Row r of an array is bytes [data_offset + r * row_bytes, data_offset + (r + 1) * row_bytes)
+        return {
+            'file': f"{name}.npy",
+            'dtype': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+            'shape': list(shape),
+            'data_offset': data_offset,
+            'row_bytes': row_bytes,
+            'size_bytes': os.path.getsize(os.path.join(self.directory, f"{name}.npy"))
+        }
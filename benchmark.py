@@ -0,0 +1,264 @@
+"""Benchmark suite for the STEP parser.
+
+Generates a synthetic STEP corpus (planes, cylinders and B-spline faces built
+from OCC primitives and booleans), times the internal pipeline stages and the
+HTTP endpoints through the Flask test client, writes the results as JSON and
+fails when a measurement regresses past a threshold against a stored baseline.
+
+    python benchmark.py                          # run and compare against the baseline
+    python benchmark.py --update-baseline        # record a new baseline
+    python benchmark.py --sizes 10 100 --render  # subset of models, include rendering
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from math import ceil, sin, sqrt
+
+from OCC.Core.BRep import BRep_Builder
+from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Cut
+from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_MakeFace
+from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox, BRepPrimAPI_MakeCylinder
+from OCC.Core.GeomAPI import GeomAPI_PointsToBSplineSurface
+from OCC.Core.IFSelect import IFSelect_RetDone
+from OCC.Core.STEPControl import STEPControl_Writer, STEPControl_AsIs
+from OCC.Core.TColgp import TColgp_Array2OfPnt
+from OCC.Core.TopoDS import TopoDS_Compound
+from OCC.Core.gp import gp_Pnt, gp_Ax2, gp_Dir
+
+import app as step_app
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+DEFAULT_CORPUS_DIR = './benchmark_corpus'
+DEFAULT_OUTPUT = './benchmark_results.json'
+DEFAULT_BASELINE = './benchmark_baseline.json'
+
+# A measurement regresses when it is slower than the baseline by more than the
+# relative threshold and by more than the absolute floor (to ignore timer noise)
+DEFAULT_THRESHOLD = 0.25
+ABSOLUTE_FLOOR_SECONDS = 0.005
+
+
+# === Synthetic corpus === #
+def make_bspline_face(x, y, z, size=8.0, phase=0.0):
+    """Build a wavy B-spline patch with its corner at (x, y, z)"""
+    poles = TColgp_Array2OfPnt(1, 4, 1, 4)
+    for i in range(1, 5):
+        for j in range(1, 5):
+            u = (i - 1) / 3.0
+            v = (j - 1) / 3.0
+            height = sin(3.0 * u + phase) * sin(3.0 * v - phase)
+            poles.SetValue(i, j, gp_Pnt(x + u * size, y + v * size, z + height))
+    surface = GeomAPI_PointsToBSplineSurface(poles).Surface()
+    return BRepBuilderAPI_MakeFace(surface, 1e-6).Face()
+
+
+def make_synthetic_model(target_faces):
+    """Build a compound with roughly target_faces faces of mixed surface types"""
+    # A quarter of the faces are cylindrical holes, a quarter B-spline patches,
+    # the rest planar boxes
+    n_holes = max(1, target_faces // 4)
+    n_bsplines = max(1, target_faces // 4)
+    n_boxes = max(0, (target_faces - 6 - n_holes - n_bsplines) // 6)
+
+    builder = BRep_Builder()
+    compound = TopoDS_Compound()
+    builder.MakeCompound(compound)
+
+    # Plate with a grid of through holes, cut in one boolean
+    side = int(ceil(sqrt(n_holes)))
+    plate = BRepPrimAPI_MakeBox(side * 10.0, side * 10.0, 5.0).Shape()
+    holes = TopoDS_Compound()
+    builder.MakeCompound(holes)
+    for k in range(n_holes):
+        i, j = divmod(k, side)
+        axis = gp_Ax2(gp_Pnt(i * 10.0 + 5.0, j * 10.0 + 5.0, -1.0), gp_Dir(0, 0, 1))
+        builder.Add(holes, BRepPrimAPI_MakeCylinder(axis, 2.0, 7.0).Shape())
+    builder.Add(compound, BRepAlgoAPI_Cut(plate, holes).Shape())
+
+    # B-spline patches floating above the plate
+    side = int(ceil(sqrt(n_bsplines)))
+    for k in range(n_bsplines):
+        i, j = divmod(k, side)
+        builder.Add(compound, make_bspline_face(i * 10.0, j * 10.0, 20.0, phase=0.1 * k))
+
+    # Boxes below the plate
+    side = max(1, int(ceil(sqrt(n_boxes))))
+    for k in range(n_boxes):
+        i, j = divmod(k, side)
+        builder.Add(compound, BRepPrimAPI_MakeBox(gp_Pnt(i * 10.0, j * 10.0, -20.0), 4.0, 4.0, 4.0).Shape())
+
+    return compound
+
+
+def generate_corpus(corpus_dir, sizes):
+    """Write one synthetic STEP model per size, reusing models already on disk"""
+    os.makedirs(corpus_dir, exist_ok=True)
+    paths = {}
+    for size in sizes:
+        path = os.path.join(corpus_dir, f"synthetic_{size}.step")
+        if not os.path.exists(path):
+            print(f"Generating {path} ...", flush=True)
+            writer = STEPControl_Writer()
+            writer.Transfer(make_synthetic_model(size), STEPControl_AsIs)
+            if writer.Write(path) != IFSelect_RetDone:
+                raise RuntimeError(f"Failed to write {path}")
+        paths[size] = path
+    return paths
+
+
+# === Measurements === #
+def timed(fn, repeat):
+    """Run fn repeat times and return the median wall-clock time in seconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def benchmark_stages(path, repeat, render=False):
+    """Time the internal pipeline stages on one model"""
+    results = {}
+    shape = step_app.read_step_file(path)
+    if shape is None:
+        raise RuntimeError(f"Failed to read {path}")
+
+    results['read_step_file'] = timed(lambda: step_app.read_step_file(path), repeat)
+
+    def traverse():
+        topo = step_app.Topo(shape)
+        list(topo.faces())
+        list(topo.edges())
+        list(topo.vertices())
+    results['Topo'] = timed(traverse, repeat)
+
+    faces = list(step_app.Topo(shape).faces())
+    edges = list(step_app.Topo(shape).edges())
+    step_app.mesh_shape(shape)
+
+    results['extract_face_data'] = timed(lambda: [step_app.extract_face_data(f) for f in faces], repeat)
+    results['generate_face_grid_points'] = timed(
+        lambda: [step_app.generate_face_grid_points(f, 32, 32) for f in faces], repeat)
+
+    edge_points = [data['points'] for data in map(step_app.extract_edge_data, edges) if data]
+    results['resample_curve_points'] = timed(
+        lambda: [step_app.resample_curve_points(points, 32) for points in edge_points], repeat)
+
+    if render:
+        def render_once():
+            with tempfile.TemporaryDirectory() as output_dir:
+                step_app.render_step_model(shape, output_dir, 'bench', {'num_orbit_views': 4})
+        results['render_step_model'] = timed(render_once, repeat)
+
+    return results
+
+
+def benchmark_endpoints(path, repeat, render=False):
+    """Time each HTTP endpoint on one model through the Flask test client"""
+    client = step_app.app.test_client()
+    endpoints = {
+        '/parse-step': {},
+        '/parse-step?fields=summary,adjacency': {},
+        '/parse-step-for-brep': {},
+        '/analyze': {'outputs': 'topology,brep'},
+        '/export-glb': {},
+    }
+    if render:
+        endpoints['/render-step'] = {'num_orbit_views': '4', 'return_format': 'zip'}
+
+    results = {}
+    for endpoint, form in endpoints.items():
+        def post():
+            with open(path, 'rb') as f:
+                data = dict(form, file=(f, os.path.basename(path)))
+                response = client.post(endpoint, data=data, content_type='multipart/form-data')
+            if response.status_code != 200:
+                raise RuntimeError(f"{endpoint} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        results[f"POST {endpoint}"] = timed(post, repeat)
+    return results
+
+
+def run_benchmarks(paths, repeat, render=False):
+    """Run all benchmarks and return {'<model>/<measurement>': seconds}"""
+    results = {}
+    for size, path in sorted(paths.items()):
+        model = f"synthetic_{size}"
+        print(f"Benchmarking {model} ...", flush=True)
+        for name, seconds in benchmark_stages(path, repeat, render).items():
+            results[f"{model}/{name}"] = seconds
+        for name, seconds in benchmark_endpoints(path, repeat, render).items():
+            results[f"{model}/{name}"] = seconds
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """Return the measurements that regressed past the threshold"""
+    regressions = []
+    for key, seconds in sorted(results.items()):
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        if seconds > reference * (1 + threshold) and seconds - reference > ABSOLUTE_FLOOR_SECONDS:
+            regressions.append((key, reference, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the STEP parser on a synthetic corpus')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='approximate face counts of the synthetic models')
+    parser.add_argument('--corpus-dir', default=DEFAULT_CORPUS_DIR)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement (median is kept)')
+    parser.add_argument('--render', action='store_true', help='also benchmark rendering (needs a display)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed relative slowdown against the baseline')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.corpus_dir, args.sizes)
+    results = run_benchmarks(paths, args.repeat, args.render)
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Wrote {len(results)} measurements to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Updated baseline {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline, args.threshold)
+    for key, reference, seconds in regressions:
+        print(f"REGRESSION {key}: {reference:.4f}s -> {seconds:.4f}s ({seconds / reference - 1:+.0%})")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Offline bulk conversion of a STEP corpus to BREP arrays and renders.
+
+Walks a directory of STEP files and, for each one, writes the
+/parse-step-for-brep arrays as NPZ (adjacency as int32 CSR pairs) and the
+/render-step images into <output>/<relative path of the file>/, reusing the
+pipeline in app.py without going through Flask. Files are converted by a pool
+of worker processes with a per-file timeout: a worker stuck inside OCC is
+killed and replaced. Every finished file is appended to
+<output>/manifest.jsonl, so an interrupted run resumes where it left off.
+
+    # 16 workers, 5 minute limit per file, arrays and renders
+    python convert_dataset.py ./corpus ./dataset --workers 16 --timeout 300
+
+    # arrays only, retry the files that failed or timed out last time
+    python convert_dataset.py ./corpus ./dataset --no-renders --retry-failed
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+from tqdm import tqdm
+
+from worker_pool import WorkerPool
+
+# Only the pipeline is needed: no service directories or sweeper threads
+os.environ['STEP_SERVICE_STARTUP'] = 'false'
+import app as step_app  # noqa: E402
+
+MANIFEST_NAME = 'manifest.jsonl'
+STEP_EXTENSIONS = ('.step', '.stp')
+
+
+# === Corpus and manifest === #
+def find_step_files(input_dir):
+    """Relative paths of all STEP files below a directory, sorted"""
+    paths = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in files:
+            if name.lower().endswith(STEP_EXTENSIONS):
+                paths.append(os.path.relpath(os.path.join(root, name), input_dir))
+    paths.sort()
+    return paths
+
+
+def load_manifest(path):
+    """Latest manifest record per relative path"""
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A run killed mid-write leaves a truncated last line
+                continue
+            records[record['path']] = record
+    return records
+
+
+def pending_files(paths, manifest, retry_failed):
+    """Files that still need converting"""
+    done = {'success'} if retry_failed else {'success', 'error', 'timeout', 'crashed'}
+    return [path for path in paths if manifest.get(path, {}).get('status') not in done]
+
+
+# === Conversion === #
+def convert_file(relpath, input_dir, output_dir, options):
+    """Convert one STEP file into <output_dir>/<relpath>/ (a.step and a.stp stay apart); a WorkerPool target"""
+    timer = step_app.StageTimer()
+    shape = step_app.read_step_file(os.path.join(input_dir, relpath), timer)
+    if shape is None:
+        raise ValueError('Failed to read STEP file')
+    # Workers are daemonic processes and cannot start shard pools of their own
+    model = step_app.ShapeModel(shape, allow_shards=False)
+
+    # Build in a staging directory so a killed worker never leaves a half-written output
+    target = os.path.join(output_dir, relpath)
+    staging = f"{target}.partial"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    result = step_app.build_brep_result(model, options['grid_size'], options['edge_samples'],
+                                        options['grid_mode'], options['lod'], timer)
+    with timer.stage('encode'):
+        step_app.write_brep_npz(result, os.path.join(staging, 'brep.npz'))
+    metadata = result['metadata']
+    del result
+
+    rendered = 0
+    if options['renders']:
+        model_name = os.path.splitext(os.path.basename(relpath))[0]
+        rendered = len(step_app.render_step_model(model, os.path.join(staging, 'renders'), model_name,
+                                                  options['render_options'], timer))
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.rename(staging, target)
+    return {
+        'faces': metadata['num_faces'],
+        'edges': metadata['num_edges'],
+        'vertices': metadata['num_vertices'],
+        'renders': rendered,
+        'timings': timer.stages,
+    }
+
+
+# === Main === #
+def main():
+    parser = argparse.ArgumentParser(description='Convert a STEP corpus to BREP NPZ arrays and renders')
+    parser.add_argument('input_dir')
+    parser.add_argument('output_dir')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--timeout', type=float, default=300, help='seconds allowed per file')
+    parser.add_argument('--max-tasks-per-worker', type=int, default=200,
+                        help='files a worker converts before it is replaced')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='convert files that failed, timed out or crashed in earlier runs again')
+    parser.add_argument('--grid-size', type=int, default=32)
+    parser.add_argument('--edge-samples', type=int, default=32)
+    parser.add_argument('--grid-mode', choices=('full', 'trimmed'), default='full')
+    parser.add_argument('--lod', default=None, help=f"one of: {', '.join(step_app.MESH_LODS)}")
+    parser.add_argument('--no-renders', action='store_true', help='only write the BREP arrays')
+    parser.add_argument('--num-orbit-views', type=int, default=12)
+    parser.add_argument('--face-coloring-mode', default='uniform')
+    args = parser.parse_args()
+
+    options = {
+        'grid_size': args.grid_size,
+        'edge_samples': args.edge_samples,
+        'grid_mode': args.grid_mode,
+        'lod': step_app.resolve_mesh_lod(args.lod),
+        'renders': not args.no_renders,
+        'render_options': {
+            'face_coloring_mode': args.face_coloring_mode,
+            'show_edges': True,
+            'show_vertices': True,
+            'num_orbit_views': args.num_orbit_views,
+        },
+    }
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = os.path.join(args.output_dir, MANIFEST_NAME)
+    paths = find_step_files(args.input_dir)
+    todo = pending_files(paths, load_manifest(manifest_path), args.retry_failed)
+    print(f"{len(paths)} STEP files, {len(paths) - len(todo)} already done, {len(todo)} to convert", flush=True)
+    if not todo:
+        return 0
+
+    counts = {}
+    progress = tqdm(total=len(todo), unit='file', smoothing=0.05)
+    with open(manifest_path, 'a') as manifest:
+        def on_done(relpath, record):
+            record = dict(record, path=relpath, finished_at=time.time())
+            manifest.write(json.dumps(record) + '\n')
+            manifest.flush()
+            counts[record['status']] = counts.get(record['status'], 0) + 1
+            progress.set_postfix(counts, refresh=False)
+            progress.update(1)
+
+        pool = WorkerPool(args.workers, args.timeout, convert_file, (args.input_dir, args.output_dir, options),
+                          max_tasks=args.max_tasks_per_worker)
+        try:
+            pool.run(todo, on_done)
+        except KeyboardInterrupt:
+            print('\nInterrupted, rerun to resume', flush=True)
+            return 130
+        finally:
+            progress.close()
+
+    print(', '.join(f"{status}: {count}" for status, count in sorted(counts.items())), flush=True)
+    return 0 if counts.get('success', 0) == len(todo) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Gunicorn settings for the STEP parser & renderer.
+
+Workers are recycled gracefully when they pass an RSS watermark or a request
+count: the post_request hook marks the worker as not alive, gunicorn lets it
+finish its in-flight request and the arbiter forks a fresh replacement.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+WORKER_ROLE=parse runs a pool that only serves the parsing endpoints and never
+imports the display stack (no X server needed); WORKER_ROLE=render runs a pool
+for the rendering endpoints. Route requests to each pool by path.
+"""
+import json
+import os
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+# One request at a time per worker, so a recycle never cuts off other requests. The
+# request runs in a gthread worker thread while the main thread keeps heartbeating
+# the arbiter, so streamed responses (/parse-step-batch) may outlive the timeout
+# below instead of being SIGKILLed mid-stream the way a sync worker would be
+worker_class = 'gthread'
+threads = 1
+proc_name = f"step-{os.environ.get('WORKER_ROLE', 'all')}"
+# Only catches a worker whose main loop is wedged: app.py ends requests at
+# REQUEST_DEADLINE_SECONDS and exits a worker stuck in OCC DEADLINE_GRACE_SECONDS
+# later, and batch files run in child processes killed after the same limits
+# (PARSE_BATCH_FILE_TIMEOUT without a deadline). Keep REQUEST_DEADLINE_SECONDS
+# set: with it disabled nothing ends a request stuck inside OCC
+timeout = int(os.environ.get('WORKER_TIMEOUT', '900'))
+graceful_timeout = int(os.environ.get('WORKER_GRACEFUL_TIMEOUT', '300'))
+
+WORKER_STATE_DIR = os.environ.get('WORKER_STATE_DIR', './worker_state')
+
+
+def post_request(worker, req, environ, resp):
+    from app import worker_stats, record_recycle_event
+
+    stats = worker_stats()
+    reason = stats.recycle_reason()
+    if reason and worker.alive:
+        record_recycle_event(reason, stats)
+        worker.alive = False
+
+
+def merge_metric_snapshots(total, snapshot):
+    """Add the series of one MetricsRegistry.snapshot() into another, in place"""
+    def label_key(key):
+        return tuple(tuple(item) for item in key)
+
+    for name, series in snapshot.items():
+        merged = {label_key(entry[0]): entry for entry in total.get(name, [])}
+        for key, counts, hist_sum, count in series:
+            entry = merged.get(label_key(key))
+            if entry is None:
+                merged[label_key(key)] = [key, list(counts), hist_sum, count]
+            else:
+                entry[1] = [a + b for a, b in zip(entry[1], counts)]
+                entry[2] += hist_sum
+                entry[3] += count
+        total[name] = list(merged.values())
+    return total
+
+
+def retire_worker_metrics(pid):
+    """Fold an exited worker's metrics snapshot into metrics_retired.json so counters never go back"""
+    path = os.path.join(WORKER_STATE_DIR, f"metrics_{pid}.json")
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        snapshot = {}
+    retired_path = os.path.join(WORKER_STATE_DIR, 'metrics_retired.json')
+    retired = {}
+    if os.path.exists(retired_path):
+        try:
+            with open(retired_path) as f:
+                retired = json.load(f)
+        except (OSError, ValueError):
+            pass
+    tmp_path = f"{retired_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(merge_metric_snapshots(retired, snapshot), f)
+    os.replace(tmp_path, retired_path)
+    os.remove(path)
+
+
+def child_exit(server, worker):
+    # Keep the exited worker's metrics in the retired totals before its PID can be reused
+    retire_worker_metrics(worker.pid)
+
+    # Workers that die without recycling themselves (crash, OOM kill, timeout) are logged too
+    path = os.path.join(WORKER_STATE_DIR, f"worker_{worker.pid}.json")
+    recycled = False
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                recycled = bool(json.load(f).get('recycling'))
+        except (OSError, ValueError):
+            pass
+        os.remove(path)
+    if not recycled:
+        os.makedirs(WORKER_STATE_DIR, exist_ok=True)
+        event = {'timestamp': time.time(), 'pid': worker.pid, 'reason': 'exited'}
+        with open(os.path.join(WORKER_STATE_DIR, 'recycle_events.jsonl'), 'a') as log:
+            log.write(json.dumps(event) + '\n')
@@ -0,0 +1,187 @@
+"""Per-request stage timings, cooperative deadlines and Prometheus histograms.
+
+StageTimer times the pipeline stages of one request (and raises
+DeadlineExceeded at a stage boundary past its deadline); MetricsRegistry
+aggregates them per process for /metrics. Nothing here imports OpenCASCADE.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised at a stage boundary once a request has run past its deadline
+    """
+
+    def __init__(self, stage, deadline_seconds):
+        super().__init__(stage, deadline_seconds)
+        self.stage = stage
+        self.deadline_seconds = deadline_seconds
+
+    def __str__(self):
+        return f"Deadline of {self.deadline_seconds:g}s exceeded before stage '{self.stage}'"
+
+
+class StageTimer(object):
+    """
+    Per-request stage timings and entity counts. With a deadline, entering a
+    stage past it raises DeadlineExceeded, which cancels the work cooperatively.
+    Listeners receive (event, data) tuples for stage starts and progress.
+    """
+
+    # Minimum seconds between progress events for the same item
+    PROGRESS_INTERVAL = 0.5
+
+    def __init__(self, deadline_seconds=None):
+        self.stages = {}  # stage name -> seconds, in first-seen order
+        self.counts = {}  # entity name -> count
+        self._stack = []  # open stages as [name, resumed_at]
+        self.deadline_seconds = deadline_seconds or None
+        self.deadline = time.perf_counter() + deadline_seconds if deadline_seconds else None
+        self.started = time.perf_counter()
+        self.listeners = []
+        self._announced = set()
+        self._last_progress = {}  # item -> perf_counter of its last event
+
+    def emit(self, event, **data):
+        for listener in self.listeners:
+            listener((event, data))
+
+    def progress(self, item, done, total):
+        """Report done out of total items, throttled except for the last one"""
+        if not self.listeners:
+            return
+        now = time.perf_counter()
+        if done < total and now - self._last_progress.get(item, 0.0) < self.PROGRESS_INTERVAL:
+            return
+        self._last_progress[item] = now
+        self.emit('progress', item=item, done=done, total=total, elapsed=round(now - self.started, 3))
+
+    def remaining(self):
+        """Seconds left before the deadline (never negative), or None without one"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.perf_counter())
+
+    def check_deadline(self, stage=None):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise DeadlineExceeded(stage or (self._stack[-1][0] if self._stack else 'request'),
+                                   self.deadline_seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage; nested stages pause their parent so timings stay exclusive"""
+        self.check_deadline(name)
+        now = time.perf_counter()
+        if self.listeners and name not in self._announced:
+            # Per-face stages alternate, so only the first entry of each is a transition
+            self._announced.add(name)
+            self.emit('stage', stage=name, elapsed=round(now - self.started, 3))
+        if self._stack:
+            parent = self._stack[-1]
+            self._add(parent[0], now - parent[1])
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            entry = self._stack.pop()
+            self._add(entry[0], now - entry[1])
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def _add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, value):
+        """Record an entity count for this request"""
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def server_timing(self, total=None):
+        """Format the stage timings as a Server-Timing header value"""
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        if total is not None:
+            parts.append(f"total;dur={total * 1000:.1f}")
+        return ', '.join(parts)
+
+
+class Histogram(object):
+    """
+    Cumulative Prometheus-style histogram
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry(object):
+    """
+    Process-wide histograms rendered in the Prometheus text format
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}  # name -> (help, buckets, {label tuple: Histogram})
+
+    def histogram(self, name, help_text, buckets):
+        with self._lock:
+            self._metrics.setdefault(name, (help_text, tuple(buckets), {}))
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            help_text, buckets, series = self._metrics[name]
+            key = tuple(sorted(labels.items()))
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def snapshot(self):
+        """Serializable copy of all series, for merging across worker processes"""
+        with self._lock:
+            return {
+                name: [[list(key), hist.bucket_counts, hist.sum, hist.count] for key, hist in series.items()]
+                for name, (help_text, buckets, series) in self._metrics.items()
+            }
+
+    def render(self, snapshots=()):
+        """Render all histograms in the Prometheus text exposition format, merged with snapshots"""
+        lines = []
+        with self._lock:
+            for name, (help_text, buckets, series) in self._metrics.items():
+                merged = {}
+                for key, hist in series.items():
+                    total = Histogram(buckets)
+                    total.bucket_counts = list(hist.bucket_counts)
+                    total.sum, total.count = hist.sum, hist.count
+                    merged[key] = total
+                for snapshot in snapshots:
+                    for key, bucket_counts, hist_sum, hist_count in snapshot.get(name, []):
+                        key = tuple(tuple(item) for item in key)
+                        total = merged.setdefault(key, Histogram(buckets))
+                        total.bucket_counts = [a + b for a, b in zip(total.bucket_counts, bucket_counts)]
+                        total.sum += hist_sum
+                        total.count += hist_count
+
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in merged.items():
+                    labels = ','.join(f'{k}="{v}"' for k, v in key)
+                    sep = ',' if labels else ''
+                    for bound, count in zip(hist.buckets, hist.bucket_counts):
+                        lines.append(f'{name}_bucket{{{labels}{sep}le="{bound:g}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {hist.count}')
+                    plain = f'{{{labels}}}' if labels else ''
+                    lines.append(f'{name}_sum{plain} {hist.sum:.6f}')
+                    lines.append(f'{name}_count{plain} {hist.count}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,334 @@
+"""Concurrent load-test client and replay harness for the STEP service.
+
+Drives the endpoints at a configurable concurrency and request mix, or replays
+a recorded request log (JSON lines as written by the server when REQUEST_LOG is
+set), and reports throughput, p50/p95/p99 latency, error rates and the server's
+RSS over time.
+
+    # 8 concurrent clients for 60s, 3:1 parse/brep mix, against a local instance
+    python loadtest.py --start-server --files part.step --concurrency 8 --duration 60 \\
+        --mix parse-step=3,parse-step-for-brep=1
+
+    # replay a recorded log, looking up uploaded files in ./corpus
+    python loadtest.py --url http://127.0.0.1:5001 --server-pid 1234 \\
+        --replay requests.jsonl --files-dir ./corpus --concurrency 4
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from math import ceil
+
+import requests
+
+DEFAULT_URL = 'http://127.0.0.1:5001'
+DEFAULT_MIX = 'parse-step=1'
+
+# Form fields sent with each endpoint when running a synthetic mix
+ENDPOINT_FORMS = {
+    'parse-step': {},
+    'parse-step-for-brep': {'grid_size': '32', 'edge_samples': '32'},
+    'render-step': {'num_orbit_views': '12', 'return_format': 'zip'},
+    'render-step-batch': {'num_orbit_views': '12'},
+    'parse-step-batch': {'mode': 'brep'},
+    'export-glb': {},
+}
+
+
+# === Server process === #
+def start_server(port):
+    """Start a local app.py instance and wait until /health answers"""
+    env = dict(os.environ, PORT=str(port))
+    process = subprocess.Popen([sys.executable, 'app.py'], env=env,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if requests.get(f"{url}/health", timeout=2).status_code == 200:
+                return process, url
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    process.kill()
+    raise RuntimeError('Server did not become healthy within 120s')
+
+
+def process_tree_rss(pid):
+    """Resident set size in bytes of a process and all of its children (Linux /proc)"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return total
+
+
+class RssSampler(threading.Thread):
+    """
+    Samples the server's RSS at a fixed interval in the background
+    """
+
+    def __init__(self, pid, interval=1.0):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []  # (seconds since start, bytes)
+        self._stop_event = threading.Event()
+        self._start = time.perf_counter()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.samples.append((time.perf_counter() - self._start, process_tree_rss(self.pid)))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# === Request plans === #
+def parse_mix(value):
+    """Parse 'endpoint=weight,...' into a weighted endpoint cycle"""
+    weighted = []
+    for item in value.split(','):
+        name, _, weight = item.strip().partition('=')
+        name = name.strip('/')
+        if name not in ENDPOINT_FORMS:
+            raise ValueError(f"Unknown endpoint '{name}', expected one of: {', '.join(ENDPOINT_FORMS)}")
+        weighted.extend([name] * int(weight or 1))
+    return weighted
+
+
+def synthetic_plan(mix, files):
+    """Endless stream of requests following the mix, cycling through the files"""
+    endpoints = itertools.cycle(mix)
+    paths = itertools.cycle(files)
+    for endpoint in endpoints:
+        yield {'endpoint': '/' + endpoint, 'files': [next(paths)], 'form': ENDPOINT_FORMS[endpoint]}
+
+
+def replay_plan(log_path, files_dir):
+    """Requests from a recorded log, in order, with offsets relative to the first one"""
+    first_timestamp = None
+    with open(log_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            offset = None
+            if 'timestamp' in record:
+                if first_timestamp is None:
+                    first_timestamp = record['timestamp']
+                offset = record['timestamp'] - first_timestamp
+            yield {
+                'endpoint': record['endpoint'],
+                'files': [os.path.join(files_dir, name) for name in record.get('files', [])],
+                'form': record.get('form', {}),
+                'offset': offset,
+            }
+
+
+# === Load driver === #
+def send(session, url, plan_item, timeout):
+    """Send one request and return (endpoint, status, seconds, error)"""
+    endpoint = plan_item['endpoint']
+    field = 'files' if endpoint.rstrip('/').endswith('batch') else 'file'
+    handles = [open(path, 'rb') for path in plan_item['files']]
+    start = time.perf_counter()
+    try:
+        upload = [(field, (os.path.basename(h.name), h, 'application/octet-stream')) for h in handles]
+        response = session.post(url + endpoint, data=plan_item['form'], files=upload, timeout=timeout)
+        # Drain the body so large downloads count towards latency
+        response.content
+        return endpoint, response.status_code, time.perf_counter() - start, None
+    except requests.RequestException as e:
+        return endpoint, None, time.perf_counter() - start, str(e)
+    finally:
+        for h in handles:
+            h.close()
+
+
+def run_load(url, plan, concurrency, duration=None, max_requests=None, timeout=600, speed=None):
+    """Drive the plan at the given concurrency and collect per-request results"""
+    results = []
+    lock = threading.Lock()
+    plan_lock = threading.Lock()
+    plan = iter(plan)
+    started = time.perf_counter()
+    issued = [0]
+
+    def next_item():
+        with plan_lock:
+            if max_requests is not None and issued[0] >= max_requests:
+                return None
+            if duration is not None and time.perf_counter() - started >= duration:
+                return None
+            item = next(plan, None)
+            if item is not None:
+                issued[0] += 1
+            return item
+
+    def worker():
+        session = requests.Session()
+        while True:
+            item = next_item()
+            if item is None:
+                return
+            # Replays keep their recorded pacing, scaled by speed
+            if speed and item.get('offset') is not None:
+                wait = item['offset'] / speed - (time.perf_counter() - started)
+                if wait > 0:
+                    time.sleep(wait)
+            result = send(session, url, item, timeout)
+            with lock:
+                results.append(result + (time.perf_counter() - started,))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+
+    return results, time.perf_counter() - started
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(ceil(q / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(results, elapsed, rss_samples):
+    """Aggregate raw results into a report"""
+    by_endpoint = {}
+    for endpoint, status, seconds, error, finished_at in results:
+        by_endpoint.setdefault(endpoint, []).append((status, seconds, error))
+
+    def stats(rows):
+        latencies = [seconds for status, seconds, error in rows if status is not None and status < 400]
+        errors = sum(1 for status, seconds, error in rows if status is None or status >= 400)
+        return {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate': errors / len(rows) if rows else 0.0,
+            'throughput_rps': len(rows) / elapsed if elapsed else 0.0,
+            'p50_s': percentile(latencies, 50),
+            'p95_s': percentile(latencies, 95),
+            'p99_s': percentile(latencies, 99),
+            'max_s': max(latencies) if latencies else None,
+        }
+
+    all_rows = [row for rows in by_endpoint.values() for row in rows]
+    report = {
+        'elapsed_s': elapsed,
+        'overall': stats(all_rows),
+        'endpoints': {endpoint: stats(rows) for endpoint, rows in sorted(by_endpoint.items())},
+    }
+    if rss_samples:
+        values = [rss for _, rss in rss_samples]
+        report['server_rss'] = {
+            'start_bytes': values[0],
+            'end_bytes': values[-1],
+            'peak_bytes': max(values),
+            'samples': rss_samples,
+        }
+    return report
+
+
+def print_report(report):
+    def fmt(value):
+        return '-' if value is None else f"{value * 1000:.0f}ms"
+
+    print(f"\nElapsed {report['elapsed_s']:.1f}s")
+    print(f"{'endpoint':<28}{'reqs':>7}{'err%':>7}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}")
+    rows = list(report['endpoints'].items()) + [('overall', report['overall'])]
+    for endpoint, s in rows:
+        print(f"{endpoint:<28}{s['requests']:>7}{s['error_rate'] * 100:>6.1f}%{s['throughput_rps']:>8.2f}"
+              f"{fmt(s['p50_s']):>9}{fmt(s['p95_s']):>9}{fmt(s['p99_s']):>9}")
+    if 'server_rss' in report:
+        rss = report['server_rss']
+        print(f"Server RSS: start {rss['start_bytes'] / 2**20:.0f} MiB, end {rss['end_bytes'] / 2**20:.0f} MiB, "
+              f"peak {rss['peak_bytes'] / 2**20:.0f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the STEP parser/renderer service')
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--start-server', action='store_true', help='start a local app.py instance')
+    parser.add_argument('--port', type=int, default=5001, help='port for --start-server')
+    parser.add_argument('--server-pid', type=int, help='server PID to sample RSS from')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--duration', type=float, help='stop issuing requests after N seconds')
+    parser.add_argument('--requests', type=int, help='stop after N requests')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='endpoint=weight,... for synthetic load')
+    parser.add_argument('--files', nargs='+', help='STEP files to upload in synthetic load')
+    parser.add_argument('--replay', help='recorded request log (JSON lines) to replay')
+    parser.add_argument('--files-dir', default='.', help='directory holding the files of a replay')
+    parser.add_argument('--speed', type=float,
+                        help='replay with recorded pacing, sped up by this factor (default: as fast as possible)')
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--rss-interval', type=float, default=1.0)
+    parser.add_argument('--output', help='write the JSON report here')
+    args = parser.parse_args()
+
+    if args.replay:
+        plan = replay_plan(args.replay, args.files_dir)
+    else:
+        if not args.files:
+            parser.error('--files is required unless --replay is given')
+        if args.duration is None and args.requests is None:
+            parser.error('synthetic load needs --duration or --requests')
+        plan = synthetic_plan(parse_mix(args.mix), args.files)
+
+    server = None
+    url = args.url
+    server_pid = args.server_pid
+    if args.start_server:
+        server, url = start_server(args.port)
+        server_pid = server.pid
+
+    sampler = None
+    if server_pid:
+        sampler = RssSampler(server_pid, args.rss_interval)
+        sampler.start()
+
+    try:
+        results, elapsed = run_load(url, plan, args.concurrency, args.duration, args.requests,
+                                    args.timeout, args.speed)
+    finally:
+        if sampler:
+            sampler.stop()
+        if server:
+            server.terminate()
+            server.wait()
+
+    report = summarize(results, elapsed, sampler.samples if sampler else [])
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if report['overall']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""NumPy helpers for face grids and triangle meshes.
+
+Sampling grid parameters, projecting points onto a triangulation in bulk,
+welding per-face triangulations into one indexed mesh and encoding it as
+binary glTF (GLB). Nothing here imports OpenCASCADE: app.py extracts the
+arrays from the shape and these functions only work on them.
+"""
+import json
+import struct
+from math import radians
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+GLTF_FLOAT = 5126
+GLTF_BYTE = 5120
+GLTF_UNSIGNED_SHORT = 5123
+GLTF_UNSIGNED_INT = 5125
+GLTF_ARRAY_BUFFER = 34962
+GLTF_ELEMENT_ARRAY_BUFFER = 34963
+
+# Faces meeting at a sharper angle keep separate vertices (and normals) along their edge
+CREASE_ANGLE = radians(30.0)
+
+
+# === Sampling grids === #
+def grid_parameters(u_min, u_max, v_min, v_max, u_samples, v_samples):
+    """
+    Parameter values of a u_samples x v_samples grid over [u_min, u_max] x
+    [v_min, v_max] as (u, v) vectors; a single sample sits in the middle
+    """
+    u = np.linspace(u_min, u_max, u_samples) if u_samples > 1 else np.array([(u_min + u_max) / 2])
+    v = np.linspace(v_min, v_max, v_samples) if v_samples > 1 else np.array([(v_min + v_max) / 2])
+    return u, v
+
+
+# === Projection === #
+def closest_points_on_mesh_2d(queries, points_2d, points_3d, triangles, k_nearest=3):
+    """Project 2D queries onto a triangle mesh in bulk and lift the hits to 3D
+
+    Candidate triangles are the ones incident to the k nearest mesh nodes of each
+    query (one batched KD-tree lookup over the nodes that have triangles). Each
+    query takes the closest point over its candidates, interpolated with
+    barycentric weights on the 3D nodes. Without any triangle every row is NaN.
+    """
+    corner_nodes = np.asarray(triangles).reshape(-1)
+    counts = np.bincount(corner_nodes, minlength=len(points_2d))
+    connected = np.flatnonzero(counts)
+    if len(connected) == 0:
+        return np.full((len(queries), points_3d.shape[1]), np.nan)
+
+    # Only nodes with incident triangles are searched, so every query has candidates
+    k_nearest = min(k_nearest, len(connected))
+    _, nearest = cKDTree(points_2d[connected]).query(queries, k=k_nearest)
+    nearest = connected[nearest.reshape(len(queries), -1)]
+
+    # Node -> incident triangles as a padded table (-1 marks empty slots)
+    order = np.argsort(corner_nodes, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    slot = np.arange(len(order)) - offsets[corner_nodes[order]]
+    incident = np.full((len(points_2d), max(counts.max(), 1)), -1, dtype=np.int64)
+    incident[corner_nodes[order], slot] = order // 3
+
+    candidates = incident[nearest].reshape(len(queries), -1)  # (Q, C)
+    valid = candidates >= 0
+    tri = triangles[np.where(valid, candidates, 0)]  # (Q, C, 3)
+    a, b, c = points_2d[tri[..., 0]], points_2d[tri[..., 1]], points_2d[tri[..., 2]]
+    p = queries[:, None, :]
+
+    # Barycentric coordinates of the query in each candidate triangle
+    v0, v1, v2 = b - a, c - a, p - a
+    denom = v0[..., 0] * v1[..., 1] - v1[..., 0] * v0[..., 1]
+    safe = np.where(np.abs(denom) > 1e-300, denom, 1.0)
+    w1 = (v2[..., 0] * v1[..., 1] - v1[..., 0] * v2[..., 1]) / safe
+    w2 = (v0[..., 0] * v2[..., 1] - v2[..., 0] * v0[..., 1]) / safe
+    w0 = 1.0 - w1 - w2
+    inside = (np.abs(denom) > 1e-300) & (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+
+    best_dist = np.where(inside, 0.0, np.inf)
+    weights = np.stack([w0, w1, w2], axis=-1)
+
+    # Outside (or degenerate) triangles: clamp to the closest point on each edge
+    for i, j in ((0, 1), (1, 2), (2, 0)):
+        start, end = (a, b, c)[i], (a, b, c)[j]
+        edge = end - start
+        length_sq = np.einsum('...k,...k->...', edge, edge)
+        t = np.einsum('...k,...k->...', p - start, edge) / np.where(length_sq > 0, length_sq, 1.0)
+        t = np.clip(t, 0.0, 1.0)
+        offset = p - (start + t[..., None] * edge)
+        dist = np.einsum('...k,...k->...', offset, offset)
+        better = ~inside & (dist < best_dist)
+        best_dist = np.where(better, dist, best_dist)
+        edge_weights = np.zeros_like(weights)
+        edge_weights[..., i] = 1.0 - t
+        edge_weights[..., j] = t
+        weights = np.where(better[..., None], edge_weights, weights)
+
+    best_dist = np.where(valid, best_dist, np.inf)
+    best = np.argmin(best_dist, axis=1)
+    rows = np.arange(len(queries))
+    best_tri = tri[rows, best]  # (Q, 3)
+    best_weights = weights[rows, best]  # (Q, 3)
+    return np.einsum('qk,qkd->qd', best_weights, points_3d[best_tri])
+
+
+# === Welding === #
+def weld_points(points, tolerance):
+    """
+    Merge points that lie within tolerance of each other, transitively, so
+    coincident nodes are merged wherever they fall relative to a grid.
+    Returns (positions, inverse): points[i] became positions[inverse[i]],
+    and every merged point keeps the position of its first member.
+    """
+    pairs = cKDTree(points).query_pairs(tolerance, output_type='ndarray')
+    graph = coo_matrix((np.ones(len(pairs), dtype=np.int8), (pairs[:, 0], pairs[:, 1])),
+                       shape=(len(points), len(points)))
+    # Connected components of the pair graph are the union-find sets of the pairs
+    _, labels = connected_components(graph, directed=False)
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    return points[first], inverse.reshape(-1)
+
+
+def weld_mesh(points, triangles, face_ids, tolerance, with_normals=True, crease_angle=CREASE_ANGLE):
+    """
+    Weld concatenated per-face triangulations into one indexed mesh.
+    Returns (positions, indices, face_ids, normals); triangles that collapse
+    in the weld are dropped with their face ids, normals are area-weighted
+    unit vertex normals (None without with_normals). With normals, vertices
+    on edges sharper than crease_angle are split per side (see split_creases).
+    """
+    positions, inverse = weld_points(points, tolerance)
+    indices = inverse[triangles]
+
+    # Drop triangles that collapsed during welding
+    valid = ((indices[:, 0] != indices[:, 1]) & (indices[:, 1] != indices[:, 2])
+             & (indices[:, 0] != indices[:, 2]))
+    indices = indices[valid]
+    face_ids = face_ids[valid]
+
+    normals = None
+    if with_normals:
+        positions, indices, normals = split_creases(positions, indices, face_ids, crease_angle)
+
+    return positions, indices, face_ids, normals
+
+
+def split_creases(positions, indices, face_ids, crease_angle=CREASE_ANGLE):
+    """
+    Area-weighted vertex normals that keep sharp CAD edges sharp. The corners
+    of every welded vertex are grouped per face, and groups of one vertex
+    share a vertex (and are smoothed together) only where their normals are
+    within crease_angle; elsewhere the vertex is split into one copy per side.
+    Returns (positions, indices, normals).
+    """
+    v0, v1, v2 = positions[indices[:, 0]], positions[indices[:, 1]], positions[indices[:, 2]]
+    tri_normals = np.cross(v1 - v0, v2 - v0)
+
+    # One group per (vertex, face), sorted by vertex, with the summed normal of its corners
+    corner_keys = np.stack([indices.reshape(-1), np.repeat(face_ids.astype(np.int64), 3)], axis=1)
+    keys, corner_groups = np.unique(corner_keys.reshape(-1, 2), axis=0, return_inverse=True)
+    corner_groups = corner_groups.reshape(-1)
+    group_normals = np.zeros((len(keys), 3))
+    np.add.at(group_normals, corner_groups, np.repeat(tri_normals, 3, axis=0))
+    lengths = np.linalg.norm(group_normals, axis=1)
+    unit = group_normals / np.where(lengths > 0, lengths, 1.0)[:, None]
+
+    # Link the groups of a vertex whose normals agree; degenerate groups agree with any
+    threshold = np.cos(crease_angle)
+    rows, cols = [], []
+    for step in range(1, np.bincount(keys[:, 0]).max(initial=1)):
+        first = np.arange(len(keys) - step)
+        second = first + step
+        agree = (keys[first, 0] == keys[second, 0]) & (
+            (np.einsum('ij,ij->i', unit[first], unit[second]) >= threshold)
+            | (lengths[first] == 0) | (lengths[second] == 0))
+        rows.append(first[agree])
+        cols.append(second[agree])
+    rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+    graph = coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(len(keys), len(keys)))
+    _, labels = connected_components(graph, directed=False)
+
+    _, first_groups = np.unique(labels, return_index=True)
+    normals = np.zeros((len(first_groups), 3))
+    np.add.at(normals, labels, group_normals)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = normals / np.where(lengths > 0, lengths, 1.0)
+    return positions[keys[first_groups, 0]], labels[corner_groups].reshape(-1, 3), normals
+
+
+# === GLB encoding === #
+def encode_glb(positions, indices, face_ids, normals=None, quantize=False):
+    """Encode a welded mesh as a binary glTF (GLB) file"""
+    chunks = []
+    buffer_views = []
+    accessors = []
+    byte_length = 0
+
+    def add_view(data, target=None, byte_stride=None):
+        nonlocal byte_length
+        raw = data.tobytes()
+        view = {'buffer': 0, 'byteOffset': byte_length, 'byteLength': len(raw)}
+        if target is not None:
+            view['target'] = target
+        if byte_stride is not None:
+            view['byteStride'] = byte_stride
+        padding = (-len(raw)) % 4
+        chunks.append(raw + b'\x00' * padding)
+        byte_length += len(raw) + padding
+        buffer_views.append(view)
+        return len(buffer_views) - 1
+
+    def add_accessor(view, component_type, count, accessor_type, **extra):
+        accessor = {
+            'bufferView': view,
+            'componentType': component_type,
+            'count': int(count),
+            'type': accessor_type
+        }
+        accessor.update(extra)
+        accessors.append(accessor)
+        return len(accessors) - 1
+
+    node = {'mesh': 0}
+    extensions_used = []
+    vertex_count = len(positions)
+
+    if quantize:
+        # KHR_mesh_quantization: 16-bit positions, dequantized by the node transform
+        lower = positions.min(axis=0)
+        extent = positions.max(axis=0) - lower
+        extent = np.where(extent > 0, extent, 1.0)
+        quantized = np.round((positions - lower) / extent * 65535).astype(np.uint16)
+        # Vertex attributes must be 4-byte aligned, pad each position to 4 shorts
+        padded = np.zeros((vertex_count, 4), dtype=np.uint16)
+        padded[:, :3] = quantized
+        view = add_view(padded, GLTF_ARRAY_BUFFER, byte_stride=8)
+        position_accessor = add_accessor(
+            view, GLTF_UNSIGNED_SHORT, vertex_count, 'VEC3',
+            min=quantized.min(axis=0).tolist(), max=quantized.max(axis=0).tolist())
+        node['translation'] = lower.tolist()
+        node['scale'] = (extent / 65535).tolist()
+        extensions_used.append('KHR_mesh_quantization')
+    else:
+        view = add_view(positions.astype(np.float32), GLTF_ARRAY_BUFFER)
+        position_accessor = add_accessor(
+            view, GLTF_FLOAT, vertex_count, 'VEC3',
+            min=positions.min(axis=0).tolist(), max=positions.max(axis=0).tolist())
+
+    attributes = {'POSITION': position_accessor}
+
+    if normals is not None:
+        if quantize:
+            packed = np.zeros((vertex_count, 4), dtype=np.int8)
+            packed[:, :3] = np.round(normals * 127)
+            view = add_view(packed, GLTF_ARRAY_BUFFER, byte_stride=4)
+            attributes['NORMAL'] = add_accessor(view, GLTF_BYTE, vertex_count, 'VEC3', normalized=True)
+        else:
+            view = add_view(normals.astype(np.float32), GLTF_ARRAY_BUFFER)
+            attributes['NORMAL'] = add_accessor(view, GLTF_FLOAT, vertex_count, 'VEC3')
+
+    if vertex_count <= 0xFFFF:
+        view = add_view(indices.astype(np.uint16).reshape(-1), GLTF_ELEMENT_ARRAY_BUFFER)
+        index_accessor = add_accessor(view, GLTF_UNSIGNED_SHORT, indices.size, 'SCALAR')
+    else:
+        view = add_view(indices.astype(np.uint32).reshape(-1), GLTF_ELEMENT_ARRAY_BUFFER)
+        index_accessor = add_accessor(view, GLTF_UNSIGNED_INT, indices.size, 'SCALAR')
+
+    # glTF has no per-triangle attributes, so face ids are a plain accessor referenced from extras
+    view = add_view(face_ids.astype(np.uint32))
+    face_id_accessor = add_accessor(view, GLTF_UNSIGNED_INT, len(face_ids), 'SCALAR')
+
+    gltf = {
+        'asset': {'version': '2.0', 'generator': 'step-parser'},
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [node],
+        'meshes': [{
+            'primitives': [{
+                'attributes': attributes,
+                'indices': index_accessor,
+                'mode': 4
+            }],
+            'extras': {'faceIdAccessor': face_id_accessor}
+        }],
+        'accessors': accessors,
+        'bufferViews': buffer_views,
+        'buffers': [{'byteLength': byte_length}]
+    }
+    if extensions_used:
+        gltf['extensionsUsed'] = extensions_used
+        gltf['extensionsRequired'] = extensions_used
+
+    json_chunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    json_chunk += b' ' * ((-len(json_chunk)) % 4)
+    bin_chunk = b''.join(chunks)
+
+    total_length = 12 + 8 + len(json_chunk) + 8 + len(bin_chunk)
+    return b''.join([
+        struct.pack('<III', 0x46546C67, 2, total_length),
+        struct.pack('<II', len(json_chunk), 0x4E4F534A),
+        json_chunk,
+        struct.pack('<II', len(bin_chunk), 0x004E4942),
+        bin_chunk
+    ])
@@ -0,0 +1,210 @@
+"""Streaming pre-scanner for STEP Part 21 files.
+
+Reads a STEP file once, in chunks, without OpenCASCADE: extracts the header
+(FILE_DESCRIPTION, FILE_NAME, FILE_SCHEMA), the length units, counts entity
+instances by type and counts root instances (instances no other instance
+references). The result feeds a cost estimate used for admission control
+before the file ever reaches STEPControl_Reader.
+"""
+import re
+
+CHUNK_SIZE = 1 << 20
+
+# Strings (with '' escapes), comments and statement terminators. A lone quote or
+# comment opener means the token continues in the next chunk.
+_TOKEN = re.compile(rb"'(?:[^']|'')*'|'|/\*.*?\*/|/\*|;", re.S)
+_INSTANCE = re.compile(rb"\s*#(\d+)\s*=\s*(?:([A-Za-z_][A-Za-z0-9_]*)|(\())")
+_KEYWORD = re.compile(rb"\s*([A-Za-z_][A-Za-z0-9_-]*)")
+_REFERENCE = re.compile(rb"#(\d+)")
+_STRING = re.compile(rb"'((?:[^']|'')*)'")
+_SI_UNIT = re.compile(rb"SI_UNIT\s*\(\s*(\*|\$|\.([A-Z]+)\.)\s*,\s*\.([A-Z_]+)\.\s*\)")
+
+# Relative cost of the entities that dominate transfer, meshing and grid sampling
+COST_WEIGHTS = {
+    'ADVANCED_FACE': 1.0,
+    'FACE_SURFACE': 1.0,
+    'B_SPLINE_SURFACE_WITH_KNOTS': 4.0,
+    'RATIONAL_B_SPLINE_SURFACE': 4.0,
+    'B_SPLINE_CURVE_WITH_KNOTS': 0.5,
+    'RATIONAL_B_SPLINE_CURVE': 0.5,
+    'EDGE_CURVE': 0.2,
+    'CARTESIAN_POINT': 0.002,
+}
+
+_SI_PREFIXES = {b'MILLI': 'mm', b'CENTI': 'cm', b'KILO': 'km', b'MICRO': 'um', b'NANO': 'nm'}
+
+
+def _unescape(value):
+    return value.replace(b"''", b"'").decode('latin-1')
+
+
+def _complex_types(body):
+    """Type names at the top level of a complex instance body '( A(...) B(...) )'"""
+    types = []
+    depth = 0
+    i = 0
+    length = len(body)
+    while i < length:
+        char = body[i:i + 1]
+        if char == b"'":
+            match = _STRING.match(body, i)
+            i = match.end() if match else length
+            continue
+        if char == b'(':
+            depth += 1
+        elif char == b')':
+            depth -= 1
+        elif depth == 1:
+            match = _KEYWORD.match(body, i)
+            if match and match.group(1):
+                types.append(match.group(1).decode('ascii').upper())
+                i = match.end()
+                continue
+        i += 1
+    return types
+
+
+class StepScanner(object):
+    """
+    Incremental Part 21 scanner; feed() chunks, then finish()
+    """
+
+    def __init__(self):
+        self.buffer = b''
+        self.section = None
+        self.header = {}
+        self.entity_counts = {}
+        self.length_units = []
+        self.instance_count = 0
+        self.defined = set()
+        self.referenced = set()
+        self.bytes_scanned = 0
+        self.is_part21 = False
+
+    def feed(self, chunk, final=False):
+        self.bytes_scanned += len(chunk)
+        self.buffer += chunk
+        buf = self.buffer
+        start = 0
+        for match in _TOKEN.finditer(buf):
+            token = match.group(0)
+            if token in (b"'", b'/*') or (token[:1] == b"'" and match.end() == len(buf)):
+                # Unterminated string/comment, or a string that may continue with ''
+                if not final:
+                    break
+                continue
+            if token != b';':
+                continue
+            self._statement(buf[start:match.start()])
+            start = match.end()
+        self.buffer = buf[start:]
+        if final and self.buffer.strip():
+            self._statement(self.buffer)
+            self.buffer = b''
+
+    def _statement(self, statement):
+        # Comments never carry information we need
+        if b'/*' in statement:
+            statement = re.sub(rb"/\*.*?\*/", b'', statement, flags=re.S)
+        if not statement.lstrip().startswith(b'#'):
+            keyword = _KEYWORD.match(statement)
+            if not keyword:
+                return
+            name = keyword.group(1).upper()
+            if name == b'ISO-10303-21':
+                self.is_part21 = True
+            elif name in (b'HEADER', b'DATA'):
+                self.section = name.decode('ascii')
+            elif name == b'ENDSEC':
+                self.section = None
+            elif self.section == 'HEADER' and name in (b'FILE_DESCRIPTION', b'FILE_NAME', b'FILE_SCHEMA'):
+                self.header[name.decode('ascii').lower()] = [_unescape(s) for s in _STRING.findall(statement)]
+            return
+        if self.section != 'DATA':
+            return
+
+        match = _INSTANCE.match(statement)
+        if not match:
+            return
+        self.instance_count += 1
+        self.defined.add(int(match.group(1)))
+        body = statement[match.end():]
+
+        if match.group(2):
+            types = [match.group(2).decode('ascii').upper()]
+        else:
+            types = _complex_types(b'(' + body)
+        for type_name in types:
+            self.entity_counts[type_name] = self.entity_counts.get(type_name, 0) + 1
+
+        for ref in _REFERENCE.findall(body):
+            self.referenced.add(int(ref))
+
+        if 'LENGTH_UNIT' in types:
+            self._length_unit(types, body)
+
+    def _length_unit(self, types, body):
+        si = _SI_UNIT.search(body)
+        if 'CONVERSION_BASED_UNIT' in types:
+            names = _STRING.findall(body)
+            unit = _unescape(names[0]).lower() if names else 'conversion_based'
+        elif si:
+            prefix = si.group(2)
+            unit = _SI_PREFIXES.get(prefix, 'm') if prefix else 'm'
+        else:
+            unit = 'unknown'
+        if unit not in self.length_units:
+            self.length_units.append(unit)
+
+    def finish(self):
+        """Flush any trailing statement and return the scan summary"""
+        self.feed(b'', final=True)
+        schema = self.header.get('file_schema', [])
+        return {
+            'is_part21': self.is_part21,
+            'bytes': self.bytes_scanned,
+            'schema': schema[0] if schema else None,
+            'header': self.header,
+            'length_units': self.length_units,
+            'instance_count': self.instance_count,
+            'entity_counts': dict(sorted(self.entity_counts.items(), key=lambda item: -item[1])),
+            'root_count': len(self.defined - self.referenced),
+        }
+
+
+def prescan_step_file(path, chunk_size=CHUNK_SIZE):
+    """Scan a STEP file in one linear pass and summarize its header and entities"""
+    scanner = StepScanner()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            scanner.feed(chunk)
+    return scanner.finish()
+
+
+def estimate_step_cost(scan):
+    """Estimate the processing cost of a scanned STEP file in face-equivalent units"""
+    counts = scan['entity_counts']
+    cost = sum(counts.get(name, 0) * weight for name, weight in COST_WEIGHTS.items())
+    faces = counts.get('ADVANCED_FACE', 0) + counts.get('FACE_SURFACE', 0)
+    bspline_surfaces = counts.get('B_SPLINE_SURFACE_WITH_KNOTS', 0) + counts.get('RATIONAL_B_SPLINE_SURFACE', 0)
+    return {
+        'cost': round(cost, 1),
+        'faces': faces,
+        'edges': counts.get('EDGE_CURVE', 0),
+        'bspline_surfaces': bspline_surfaces,
+        'instances': scan['instance_count'],
+        'roots': scan['root_count'],
+    }
+
+
+if __name__ == '__main__':
+    import json
+    import sys
+
+    for path in sys.argv[1:]:
+        scan = prescan_step_file(path)
+        scan['estimate'] = estimate_step_cost(scan)
+        print(json.dumps(scan, indent=2))
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Import the modules from the repository root, and keep app.py from creating
+# its service directories or starting sweeper threads in the test process
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('STEP_SERVICE_STARTUP', 'false')
@@ -0,0 +1,799 @@
+"""Behaviour tests for the service in app.py (skipped where pythonocc-core is missing)."""
+import io
+import os
+import zipfile
+
+import numpy as np
+import pytest
+
+pytest.importorskip('OCC.Core')
+import app  # noqa: E402
+
+SAMPLE_STEP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'cad_95MoBC6uuohp06RV2nar_0_1750947399121 (1).step')
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client with its uploads and worker state in a temporary directory"""
+    for name in ('UPLOAD_FOLDER', 'WORKER_STATE_DIR'):
+        folder = tmp_path / name.lower()
+        folder.mkdir()
+        monkeypatch.setattr(app, name, str(folder))
+    return app.app.test_client()
+
+
+def post_file(client, url, path=SAMPLE_STEP, filename='part.step', **form):
+    with open(path, 'rb') as f:
+        form['file'] = (io.BytesIO(f.read()), filename)
+    return client.post(url, data=form, content_type='multipart/form-data')
+
+
+# === Request deadlines === #
+def test_resolve_deadline(monkeypatch):
+    monkeypatch.setattr(app, 'REQUEST_DEADLINE_SECONDS', 600.0)
+    assert app.resolve_deadline(None) == 600.0
+    assert app.resolve_deadline('30') == 30.0
+    assert app.resolve_deadline('9000') == 600.0
+    monkeypatch.setattr(app, 'REQUEST_DEADLINE_SECONDS', 0.0)
+    assert app.resolve_deadline('') is None
+    assert app.resolve_deadline('9000') == 9000.0
+
+
+@pytest.mark.parametrize('value', ['nan', 'NaN', 'inf', '-inf', '0', '-5', 'soon'])
+def test_invalid_deadlines_are_rejected(client, value):
+    with pytest.raises(ValueError):
+        app.resolve_deadline(value)
+    response = client.post(f"/parse-step?deadline={value}")
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Invalid deadline')
+
+
+# === Progress streams === #
+def read_sse(response):
+    """(event, data) pairs of a Server-Sent Events body"""
+    import json
+
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'event' in lines:
+            events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_parse_step_progress_stream(client):
+    response = post_file(client, '/parse-step?progress=sse', fields='summary')
+    assert response.mimetype == 'text/event-stream'
+    events = read_sse(response)
+    names = [event for event, _ in events]
+    assert names[0] == 'stage' and names[-1] == 'result'
+    assert 'estimate' in names
+    stages = [data['stage'] for event, data in events if event == 'stage']
+    assert len(stages) == len(set(stages)) and 'read' in stages
+    result = events[-1][1]
+    assert result['status'] == 200
+    assert set(result['body']) == {'summary'}
+    assert 'read' in result['timings']
+
+
+def test_rejections_arrive_as_the_result_event(client, tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_bytes(b'not a step file\n')
+    response = post_file(client, '/parse-step', path=str(path), progress='sse')
+    assert response.status_code == 200
+    event, data = read_sse(response)[-1]
+    assert event == 'result' and data['status'] == 400
+
+
+def test_progress_streams_release_their_heavy_slot(client, monkeypatch):
+    monkeypatch.setattr(app, 'HEAVY_JOB_SLOTS', 1)
+    monkeypatch.setattr(app, 'STEP_HEAVY_COST', 1)
+    response = post_file(client, '/parse-step', fields='summary', progress='sse')
+    assert read_sse(response)[-1][1]['status'] == 200
+    response.close()
+    slot = app.acquire_heavy_slot(0)
+    assert slot is not None
+    app.release_heavy_slot(slot)
+
+
+# === Admission control === #
+def test_non_step_uploads_are_rejected(client, tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_bytes(b'just some text\n' * 100)
+    response = post_file(client, '/parse-step', path=str(path), filename='notes.step')
+    assert response.status_code == 400
+    assert 'STEP' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('limit', ['STEP_MAX_COST', 'STEP_MAX_FACES'])
+def test_uploads_past_the_limits_get_413(client, monkeypatch, limit):
+    monkeypatch.setattr(app, limit, 1)
+    response = post_file(client, '/parse-step')
+    assert response.status_code == 413
+    body = response.get_json()
+    assert body['estimate']['faces'] == 18
+    # The rejected upload is not left behind
+    assert os.listdir(app.UPLOAD_FOLDER) == []
+
+
+def test_heavy_slots_are_shared(client, monkeypatch):
+    monkeypatch.setattr(app, 'HEAVY_JOB_SLOTS', 1)
+    first = app.acquire_heavy_slot(0)
+    assert first is not None
+    assert app.acquire_heavy_slot(0) is None
+    app.release_heavy_slot(first)
+    second = app.acquire_heavy_slot(0)
+    assert second is not None
+    app.release_heavy_slot(second)
+
+
+def test_heavy_uploads_wait_for_a_slot(client, monkeypatch):
+    monkeypatch.setattr(app, 'HEAVY_JOB_SLOTS', 1)
+    monkeypatch.setattr(app, 'STEP_HEAVY_COST', 1)
+    monkeypatch.setattr(app, 'HEAVY_JOB_QUEUE_TIMEOUT', 0)
+    held = app.acquire_heavy_slot(0)
+    try:
+        assert post_file(client, '/parse-step', fields='summary').status_code == 503
+    finally:
+        app.release_heavy_slot(held)
+    # An admitted request releases its slot when it ends
+    assert post_file(client, '/parse-step', fields='summary').status_code == 200
+    free = app.acquire_heavy_slot(0)
+    assert free is not None
+    app.release_heavy_slot(free)
+
+
+def test_heavy_uploads_wait_no_longer_than_their_deadline(client, monkeypatch):
+    import time
+
+    monkeypatch.setattr(app, 'HEAVY_JOB_SLOTS', 1)
+    monkeypatch.setattr(app, 'STEP_HEAVY_COST', 1)
+    monkeypatch.setattr(app, 'HEAVY_JOB_QUEUE_TIMEOUT', 300)
+    held = app.acquire_heavy_slot(0)
+    start = time.time()
+    try:
+        response = post_file(client, '/parse-step', fields='summary', deadline='0.5')
+    finally:
+        app.release_heavy_slot(held)
+    assert response.status_code == 504
+    assert "stage 'queue'" in response.get_json()['error']
+    assert time.time() - start < 5
+    assert os.listdir(app.UPLOAD_FOLDER) == []
+
+
+def test_prescan_step(client):
+    response = post_file(client, '/prescan-step')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['is_part21']
+    assert body['estimate']['faces'] == 18
+    assert body['estimate']['heavy'] is False
+
+
+# === Worker recycling === #
+@pytest.fixture
+def stats(client, monkeypatch):
+    """Fresh worker stats with the recycle log in the test's worker state directory"""
+    monkeypatch.setattr(app, 'RECYCLE_LOG', os.path.join(app.WORKER_STATE_DIR, 'recycle_events.jsonl'))
+    monkeypatch.setattr(app, 'RSS_FROM_PROC', True)
+    monkeypatch.setattr(app, 'WORKER_RSS_WATERMARK_MB', 100.0)
+    monkeypatch.setattr(app, 'WORKER_MAX_REQUESTS', 3)
+    monkeypatch.setattr(app, '_worker_stats', None)
+    return app.worker_stats()
+
+
+def test_recycle_reasons(stats, monkeypatch):
+    stats.record_request(0, 50 * 2**20)
+    assert stats.recycle_reason() is None
+    stats.record_request(0, 150 * 2**20)
+    assert stats.recycle_reason() == 'rss_watermark'
+    assert stats.peak_rss == 150 * 2**20
+
+    # Memory handed back drops the watermark; the request count still recycles
+    stats.record_request(0, 50 * 2**20)
+    assert stats.requests == 3 and stats.recycle_reason() == 'max_requests'
+    monkeypatch.setattr(app, 'WORKER_MAX_REQUESTS', 0)
+    assert stats.recycle_reason() is None
+
+
+def test_peak_rss_alone_never_recycles(stats, monkeypatch):
+    monkeypatch.setattr(app, 'RSS_FROM_PROC', False)
+    stats.record_request(0, 150 * 2**20)
+    assert stats.recycle_reason() is None
+
+
+def test_worker_state_is_written_on_status_changes_and_intervals(stats, monkeypatch):
+    writes = []
+    monkeypatch.setattr(app, 'write_json_atomic', lambda path, data: writes.append(os.path.basename(path)))
+    monkeypatch.setattr(app, 'WORKER_STATE_INTERVAL', 3600.0)
+
+    stats.record_request(0, 50 * 2**20)
+    assert stats.publish_state() is True
+    assert writes == [f"worker_{stats.pid}.json", f"metrics_{stats.pid}.json"]
+    stats.record_request(0, 60 * 2**20)
+    assert stats.publish_state() is False
+    stats.record_request(0, 150 * 2**20)
+    assert stats.publish_state() is True
+
+    monkeypatch.setattr(app, 'WORKER_STATE_INTERVAL', 0.0)
+    assert stats.publish_state() is True
+    assert len(writes) == 6
+
+
+def test_post_request_recycles_and_reports_the_event(client, stats):
+    import runpy
+
+    hooks = runpy.run_path(os.path.join(os.path.dirname(SAMPLE_STEP), 'gunicorn.conf.py'))
+    worker = type('Worker', (), {'alive': True})()
+    stats.record_request(0, 50 * 2**20)
+    hooks['post_request'](worker, None, {}, None)
+    assert worker.alive
+
+    stats.record_request(0, 150 * 2**20)
+    hooks['post_request'](worker, None, {}, None)
+    assert not worker.alive
+    assert stats.recycling == 'rss_watermark'
+
+    body = client.get('/workers').get_json()
+    assert [event['reason'] for event in body['recycle_events']] == ['rss_watermark']
+    assert body['workers'][0]['recycling'] == 'rss_watermark'
+    assert 'step_worker_recycles_total{reason="rss_watermark"} 1' in client.get('/metrics').get_data(as_text=True)
+
+
+# === /parse-step field selection === #
+def test_resolve_parse_fields():
+    assert app.resolve_parse_fields(None) == set(app.PARSE_STEP_FIELDS)
+    assert app.resolve_parse_fields('summary') == {'summary'}
+    # Any faces.* field implies the face records
+    assert app.resolve_parse_fields('faces.grid, vertices') == {'faces', 'faces.grid', 'vertices'}
+    assert app.resolve_parse_fields('faces') == set(app.PARSE_STEP_FIELD_GROUPS['faces'])
+    # Optional fields are only computed when named
+    assert not app.resolve_parse_fields('all') & set(app.PARSE_STEP_OPTIONAL_FIELDS)
+    assert 'graphs' in app.resolve_parse_fields('summary,graphs')
+    with pytest.raises(ValueError):
+        app.resolve_parse_fields('faces,bogus')
+
+
+def test_parse_step_summary_only(client):
+    full = post_file(client, '/parse-step').get_json()
+    response = post_file(client, '/parse-step', fields='summary')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert set(body) == {'summary'}
+    assert body['summary']['faces_count'] == len(full['topology']['faces'])
+
+
+def test_parse_step_skips_unrequested_face_products(client):
+    full = post_file(client, '/parse-step').get_json()
+    wires_only = post_file(client, '/parse-step', fields='faces.wires').get_json()
+
+    assert set(wires_only['topology']) == {'faces'}
+    assert 'mesh_settings' not in wires_only and 'mesh_settings' in full
+    for face in wires_only['topology']['faces']:
+        assert set(face) == {'edge_indices', 'wires'}
+    for face in full['topology']['faces']:
+        assert {'vertices', 'indices', 'grid_points', 'wires'} <= set(face)
+
+
+def test_parse_step_indices_do_not_depend_on_fields(client):
+    full = post_file(client, '/parse-step').get_json()
+    faces = post_file(client, '/parse-step', fields='faces.mesh').get_json()
+
+    assert len(faces['topology']['faces']) == len(full['topology']['faces'])
+    assert ([face['edge_indices'] for face in faces['topology']['faces']]
+            == [face['edge_indices'] for face in full['topology']['faces']])
+
+
+def test_parse_step_rejects_unknown_fields(client):
+    response = post_file(client, '/parse-step', fields='bogus')
+    assert response.status_code == 400
+    assert 'bogus' in response.get_json()['error']
+
+
+# === Tessellation levels of detail === #
+def test_resolve_mesh_lod():
+    assert app.resolve_mesh_lod(None) == app.DEFAULT_MESH_LOD
+    assert app.resolve_mesh_lod(' Fine ') == 'fine'
+    with pytest.raises(ValueError):
+        app.resolve_mesh_lod('ultra')
+
+
+def test_mesh_settings_scale_with_the_model():
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+
+    small = BRepPrimAPI_MakeBox(1.0, 2.0, 2.0).Shape()  # diagonal 3
+    large = BRepPrimAPI_MakeBox(100.0, 200.0, 200.0).Shape()  # diagonal 300
+    for lod, preset in app.MESH_LODS.items():
+        for shape, diagonal in ((small, 3.0), (large, 300.0)):
+            settings = app.mesh_settings(shape, lod)
+            assert settings['lod'] == lod
+            assert settings['linear_deflection'] == pytest.approx(diagonal * preset['relative_deflection'], rel=1e-3)
+            assert settings['angular_deflection'] == preset['angular_deflection']
+
+
+def test_finer_lods_give_denser_meshes():
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeCylinder
+
+    def triangle_count(lod):
+        shape = BRepPrimAPI_MakeCylinder(10.0, 20.0).Shape()
+        app.mesh_shape(shape, lod)
+        return sum(len(app.triangulation_arrays(face)[1]) for face in app.Topo(shape).faces())
+
+    assert triangle_count('coarse') < triangle_count('medium') < triangle_count('fine')
+
+
+def test_parse_step_lod(client):
+    body = post_file(client, '/parse-step', fields='faces.mesh', lod='coarse').get_json()
+    assert body['mesh_settings']['lod'] == 'coarse'
+    assert post_file(client, '/parse-step', lod='ultra').status_code == 400
+
+
+# === Mesh fallback grids === #
+def test_grid_from_mesh_lies_on_the_face():
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+
+    shape = BRepPrimAPI_MakeBox(10.0, 20.0, 30.0).Shape()
+    app.mesh_shape(shape)
+    for face in app.Topo(shape).faces():
+        grid = np.array(app.generate_face_grid_from_mesh(face, 8, 8))
+        assert grid.shape == (8, 8, 3)
+        # Box faces are axis-aligned, so one coordinate is constant over each grid
+        assert (np.ptp(grid.reshape(-1, 3), axis=0) < 1e-9).sum() == 1
+        assert (grid >= -1e-9).all() and (grid <= np.array([10.0, 20.0, 30.0]) + 1e-9).all()
+
+
+def test_face_mask_marks_holes_as_outside():
+    from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Cut
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox, BRepPrimAPI_MakeCylinder
+    from OCC.Core.gp import gp_Ax2, gp_Dir, gp_Pnt
+
+    plate = BRepPrimAPI_MakeBox(10.0, 10.0, 2.0).Shape()
+    hole = BRepPrimAPI_MakeCylinder(gp_Ax2(gp_Pnt(5.0, 5.0, -1.0), gp_Dir(0.0, 0.0, 1.0)), 2.0, 4.0).Shape()
+    shape = BRepAlgoAPI_Cut(plate, hole).Shape()
+
+    holed = 0
+    for face in app.Topo(shape).faces():
+        mask = np.array(app.classify_face_grid(face, 9, 9))
+        assert mask.shape == (9, 9)
+        if not mask.all():
+            holed += 1
+            # The hole is in the middle of the plate, its corners are on the face
+            assert not mask[4, 4]
+            assert mask[0, 0] and mask[0, 8] and mask[8, 0] and mask[8, 8]
+    assert holed == 2
+
+
+# === Edge convexity === #
+def notched_box():
+    """A 10mm cube with a quarter cut out along z: an L-shaped prism with one concave edge"""
+    from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Cut
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+    from OCC.Core.gp import gp_Pnt
+
+    notch = BRepPrimAPI_MakeBox(gp_Pnt(5.0, 5.0, -1.0), 10.0, 10.0, 12.0).Shape()
+    return BRepAlgoAPI_Cut(BRepPrimAPI_MakeBox(10.0, 10.0, 10.0).Shape(), notch).Shape()
+
+
+def test_edge_convexity_of_a_notched_box():
+    model = app.ShapeModel(notched_box())
+    adaptors = {}
+    convexity = []
+    for edge in model.edges:
+        faces = model.ancestors(edge, app.TopAbs_EDGE, app.TopAbs_FACE)
+        name, angle = app.edge_convexity(edge, faces, adaptors)
+        assert angle == pytest.approx(np.pi / 2)
+        convexity.append(name)
+    assert len(convexity) == 18
+    assert convexity.count('concave') == 1
+    assert convexity.count('convex') == 17
+
+
+# === Coedge table === #
+def test_box_coedges_pair_up_across_faces():
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+
+    table = app.ShapeModel(BRepPrimAPI_MakeBox(10.0, 20.0, 30.0).Shape()).coedges
+    assert len(table) == 24
+    coedges = np.arange(24)
+    # Every face is one closed loop of four coedges
+    np.testing.assert_array_equal(table.next[table.next[table.next[table.next]]], coedges)
+    np.testing.assert_array_equal(table.prev[table.next], coedges)
+    assert (table.next != coedges).all()
+    # Every edge is used once from each side
+    np.testing.assert_array_equal(table.mate[table.mate], coedges)
+    np.testing.assert_array_equal(table.edge[table.mate], table.edge)
+    assert (table.face[table.mate] != table.face).all()
+    assert (table.reversed[table.mate] != table.reversed).all()
+    assert all(len(table.ordered_edges(wire)) == 4 for wire in range(6))
+
+
+def test_cylinder_seam_coedges_are_mates_on_one_face():
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeCylinder
+
+    model = app.ShapeModel(BRepPrimAPI_MakeCylinder(5.0, 10.0).Shape())
+    table = model.coedges
+    seams = [coedge for coedge in range(len(table))
+             if table.mate[coedge] >= 0 and table.face[table.mate[coedge]] == table.face[coedge]]
+    assert len(seams) == 2
+    assert table.mate[seams[0]] == seams[1]
+    assert table.reversed[seams[0]] != table.reversed[seams[1]]
+    lateral_wire = table.wire[seams[0]]
+    assert len(table.ordered_edges(lateral_wire)) == 3
+
+
+# === Dual graphs === #
+def test_box_dual_graphs():
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+
+    result = app.build_parse_result(BRepPrimAPI_MakeBox(10.0, 20.0, 30.0).Shape(), {'graphs'}, graph_format='csr')
+    face_face = result['graphs']['face_face']
+    # Every face meets four others, each across one edge, and every corner joins three edges
+    assert np.diff(face_face['offsets']).tolist() == [4] * 6
+    assert sorted(face_face['edge']) == sorted(list(range(12)) * 2)
+    assert set(face_face['convexity']) == {app.EDGE_CONVEXITY_CODES['convex']}
+    assert np.diff(result['graphs']['edge_edge']['offsets']).tolist() == [4] * 12
+
+
+def test_notched_box_graphs_match_the_attribute_tables():
+    model = app.ShapeModel(notched_box())
+    graphs = app.build_parse_result(model, {'graphs'})['graphs']
+    with_attributes = app.build_parse_result(model, {'graphs', 'attributes'})['graphs']
+    assert graphs == with_attributes
+    assert graphs['format'] == 'coo'
+    assert graphs['face_face']['convexity'].count(app.EDGE_CONVEXITY_CODES['concave']) == 2
+
+
+@pytest.mark.parametrize('url', ['/parse-step', '/analyze'])
+def test_graph_format_option(client, url):
+    response = post_file(client, url, fields='graphs', graph_format='csr')
+    assert response.status_code == 200
+    body = response.get_json()
+    graphs = (body['topology'] if url == '/analyze' else body)['graphs']
+    assert graphs['format'] == 'csr' and 'offsets' in graphs['face_face']
+
+    response = post_file(client, url, fields='graphs', graph_format='dense')
+    assert response.status_code == 400
+    assert 'dense' in response.get_json()['error']
+
+
+# === Face sharding === #
+def slow_face_shard(*args):
+    import time
+
+    time.sleep(30)
+
+
+@pytest.fixture
+def sharded(monkeypatch):
+    """Shard every model and record the products each shard_face_products call computes"""
+    monkeypatch.setattr(app, 'FACE_SHARD_WORKERS', 2)
+    monkeypatch.setattr(app, 'FACE_SHARD_MIN_FACES', 1)
+    calls = []
+    shard_face_products = app.shard_face_products
+
+    def recording(shape, num_faces, settings, grid_size, mask_size, timer):
+        calls.append((settings is not None, grid_size, mask_size))
+        return shard_face_products(shape, num_faces, settings, grid_size, mask_size, timer)
+
+    monkeypatch.setattr(app, 'shard_face_products', recording)
+    return calls
+
+
+def test_shard_faces_computes_each_product_once(sharded):
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeCylinder
+
+    model = app.ShapeModel(BRepPrimAPI_MakeCylinder(10.0, 20.0).Shape())
+    settings = model.shard_faces('coarse', True, 8, False)
+    assert settings['lod'] == 'coarse'
+    assert sharded == [(True, 8, None)]
+
+    # Covered by the first call, like brep after topology in /analyze
+    assert model.shard_faces('coarse', True, 8, False) == settings
+    assert model.shard_faces('coarse', False, 8, False) is None
+    assert len(sharded) == 1
+
+    # Only the missing products are sharded
+    assert model.shard_faces('coarse', True, 8, True) == settings
+    assert model.shard_faces('coarse', True, 16, False) == settings
+    assert sharded[1:] == [(False, None, 8), (False, 16, None)]
+
+    face = model.faces[0]
+    assert np.array(model.grid_points(face, 16)).shape == (16, 16, 3)
+    assert np.array(model.grid_mask(face, 8)).shape == (8, 8)
+    assert model.face_data(face)['vertices']
+
+
+def test_shards_stop_at_the_request_deadline(monkeypatch):
+    import time
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+
+    monkeypatch.setattr(app, 'FACE_SHARD_WORKERS', 2)
+    monkeypatch.setattr(app, 'face_shard_products', slow_face_shard)
+    timer = app.StageTimer(deadline_seconds=1.0)
+    start = time.time()
+    with pytest.raises(app.DeadlineExceeded) as raised:
+        app.shard_face_products(BRepPrimAPI_MakeBox(1.0, 1.0, 1.0).Shape(), 6, None, 4, None, timer)
+    assert raised.value.stage == 'shard'
+    assert time.time() - start < 10
+
+
+def test_stored_brep_results_are_not_sharded(client, sharded, monkeypatch, tmp_path):
+    monkeypatch.setattr(app, 'RESULT_STORE', app.ArtifactStore(str(tmp_path / 'results'), 2**30, 3600))
+    # Track how many faces have their grid memoized at once
+    peak = [0]
+    grid_points = app.ShapeModel.grid_points
+
+    def recording(model, face, size):
+        points = grid_points(model, face, size)
+        peak[0] = max(peak[0], len(model._grids))
+        return points
+
+    monkeypatch.setattr(app.ShapeModel, 'grid_points', recording)
+
+    response = post_file(client, '/parse-step-for-brep', output='store', grid_size='8')
+    assert response.status_code == 200
+    assert sharded == []
+    assert peak[0] == 1
+
+    # Without a store the same model is sharded and every grid is memoized up front
+    peak[0] = 0
+    assert post_file(client, '/parse-step-for-brep', grid_size='8').status_code == 200
+    assert sharded == [(True, 8, None)]
+    assert peak[0] > 1
+
+
+# === Welded mesh / GLB export === #
+def test_welded_box_shares_its_corners():
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+
+    mesh = app.build_welded_mesh(BRepPrimAPI_MakeBox(10.0, 20.0, 30.0).Shape(), with_normals=False)
+    assert mesh['face_count'] == 6
+    assert len(mesh['positions']) == 8
+    assert len(mesh['indices']) == 12
+    assert sorted(set(mesh['face_ids'].tolist())) == list(range(6))
+
+
+def test_welded_box_keeps_its_edges_sharp():
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+
+    mesh = app.build_welded_mesh(BRepPrimAPI_MakeBox(10.0, 20.0, 30.0).Shape())
+    # Every corner is split into one vertex per face, each with its face's normal
+    assert len(mesh['positions']) == 24
+    np.testing.assert_allclose(np.abs(mesh['normals']).max(axis=1), 1.0)
+
+
+def test_welded_face_ids_are_the_parse_step_face_indices(monkeypatch):
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+
+    model = app.ShapeModel(BRepPrimAPI_MakeBox(10.0, 20.0, 30.0).Shape())
+    unmeshed = model.faces[2]
+    triangulation_arrays = app.triangulation_arrays
+    monkeypatch.setattr(app, 'triangulation_arrays',
+                        lambda face: (None, None) if face.IsSame(unmeshed) else triangulation_arrays(face))
+    mesh = app.build_welded_mesh(model)
+    assert sorted(set(mesh['face_ids'].tolist())) == [0, 1, 3, 4, 5]
+    assert mesh['face_count'] == 6
+
+
+def test_export_glb(client):
+    response = post_file(client, '/export-glb', quantize='true')
+    assert response.status_code == 200
+    assert response.mimetype == 'model/gltf-binary'
+    assert response.data[:4] == b'glTF'
+
+
+# === /analyze === #
+def test_analyze_needs_the_roles_of_its_outputs(client, monkeypatch):
+    monkeypatch.setattr(app, 'WORKER_ROLE', 'parse')
+    response = post_file(client, '/analyze', outputs='topology,renders')
+    assert response.status_code == 503
+    assert response.get_json() == {'error': 'This worker does not serve render requests', 'role': 'parse'}
+    assert os.listdir(app.UPLOAD_FOLDER) == []
+
+    monkeypatch.setattr(app, 'WORKER_ROLE', 'render')
+    # Past the role check, the unknown output is rejected by the view
+    assert post_file(client, '/analyze', outputs='renders,bogus').status_code == 400
+    assert post_file(client, '/analyze').status_code == 503
+
+
+def test_analyze_rejects_unknown_outputs(client):
+    response = post_file(client, '/analyze', outputs='topology,bogus')
+    assert response.status_code == 400
+    assert 'bogus' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('option', ['grid_size', 'edge_samples', 'num_orbit_views'])
+def test_analyze_rejects_non_integer_options(client, option):
+    response = post_file(client, '/analyze', **{option: 'many'})
+    assert response.status_code == 400
+    assert 'many' in response.get_json()['error']
+    assert os.listdir(app.UPLOAD_FOLDER) == []
+
+
+def test_analyze_reads_its_options_from_the_form(client):
+    # Only form fields select outputs; a query string does not
+    with open(SAMPLE_STEP, 'rb') as f:
+        response = client.post('/analyze?outputs=bogus', data={'file': (f, 'part.step'), 'fields': 'summary'},
+                               content_type='multipart/form-data')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['outputs'] == ['topology', 'brep']
+    assert set(body['topology']) == {'summary'}
+
+
+# === Geometric fingerprints === #
+def compound(*shapes):
+    from OCC.Core.BRep import BRep_Builder
+    from OCC.Core.TopoDS import TopoDS_Compound
+
+    builder = BRep_Builder()
+    result = TopoDS_Compound()
+    builder.MakeCompound(result)
+    for shape in shapes:
+        builder.Add(result, shape)
+    return result
+
+
+def two_boxes(height=10.0, reorder=False):
+    """A box of the given height at the origin next to a fixed 10mm cube"""
+    from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+    from OCC.Core.gp import gp_Pnt
+
+    boxes = [BRepPrimAPI_MakeBox(10.0, 10.0, height).Shape(),
+             BRepPrimAPI_MakeBox(gp_Pnt(50.0, 0.0, 0.0), 10.0, 10.0, 10.0).Shape()]
+    return compound(*(boxes[::-1] if reorder else boxes))
+
+
+def all_fingerprints(shape):
+    model = app.ShapeModel(shape)
+    return [model.fingerprints(kind) for kind in (app.TopAbs_FACE, app.TopAbs_EDGE, app.TopAbs_VERTEX)]
+
+
+def test_fingerprints_survive_a_re_read():
+    first = all_fingerprints(app.read_step_file(SAMPLE_STEP))
+    assert first == all_fingerprints(app.read_step_file(SAMPLE_STEP))
+    assert len(set(first[0])) == len(first[0])
+
+
+def test_fingerprints_do_not_depend_on_the_order():
+    ordered, reordered = all_fingerprints(two_boxes()), all_fingerprints(two_boxes(reorder=True))
+    assert ordered != reordered
+    assert [sorted(keys) for keys in ordered] == [sorted(keys) for keys in reordered]
+
+
+def test_reversed_edges_share_a_fingerprint():
+    for edge in app.ShapeModel(two_boxes()).edges:
+        assert app.edge_fingerprint(edge) == app.edge_fingerprint(app.topods.Edge(edge.Reversed()))
+
+
+def test_moving_a_face_changes_only_it_and_its_neighbours():
+    # Raising the top face of the first box changes it and its four side faces;
+    # its bottom face and the second box keep their keys
+    before, after = all_fingerprints(two_boxes(10.0)), all_fingerprints(two_boxes(11.0))
+    faces, edges, vertices = (set(old) & set(new) for old, new in zip(before, after))
+    assert len(faces) == 7
+    assert len(edges) == 12 + 4
+    assert len(vertices) == 8 + 4
+
+
+def test_re_parameterized_faces_keep_their_fingerprint():
+    from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_MakeFace
+    from OCC.Core.gp import gp_Ax3, gp_Dir, gp_Pln, gp_Pnt
+
+    # The same 10mm square on z=0, parameterized along x and along y
+    along_x = BRepBuilderAPI_MakeFace(gp_Pln(gp_Ax3(gp_Pnt(0, 0, 0), gp_Dir(0, 0, 1), gp_Dir(1, 0, 0))),
+                                      0.0, 10.0, 0.0, 10.0).Face()
+    along_y = BRepBuilderAPI_MakeFace(gp_Pln(gp_Ax3(gp_Pnt(0, 0, 0), gp_Dir(0, 0, 1), gp_Dir(0, 1, 0))),
+                                      0.0, 10.0, -10.0, 0.0).Face()
+    assert all_fingerprints(along_x) == all_fingerprints(along_y)
+    # Grids are sampled over the UV bounds, so their cache keys still tell them apart
+    assert app.parameterization_params(along_x) != app.parameterization_params(along_y)
+
+
+# === Incremental re-parse === #
+@pytest.fixture
+def face_cache(tmp_path, monkeypatch):
+    cache = app.FaceResultCache(str(tmp_path / 'face_cache'), 2**30)
+    monkeypatch.setattr(app, 'FACE_CACHE', cache)
+    return cache
+
+
+def incremental_parse(shape, cache):
+    model = app.ShapeModel(shape, cache)
+    result = app.build_parse_result(model, {'faces', 'faces.mesh', 'faces.grid'})
+    return result, model.reuse_report()
+
+
+def test_incremental_parse_recomputes_only_edited_faces(face_cache):
+    first, report = incremental_parse(two_boxes(), face_cache)
+    assert (report['recomputed_faces'], report['reused_faces']) == (12, 0)
+
+    second, report = incremental_parse(two_boxes(), face_cache)
+    assert (report['recomputed_faces'], report['reused_faces']) == (0, 12)
+    assert report['products'] == {'mesh': {'reused': 12, 'computed': 0}, 'grid': {'reused': 12, 'computed': 0}}
+    assert second['topology']['faces'] == first['topology']['faces']
+
+    # The taller box resizes the bounding box (and the absolute deflection), yet only
+    # the raised top face and its four side faces are meshed and sampled again
+    _, report = incremental_parse(two_boxes(11.0), face_cache)
+    assert (report['recomputed_faces'], report['reused_faces']) == (5, 7)
+    assert report['products']['mesh'] == {'reused': 7, 'computed': 5}
+
+
+def test_meshes_loaded_by_mesh_survive_an_eviction(face_cache):
+    import shutil
+
+    incremental_parse(two_boxes(), face_cache)
+    model = app.ShapeModel(two_boxes(), face_cache)
+    model.mesh()
+    shutil.rmtree(face_cache.root)
+    assert all(model.face_data(face)['indices'] for face in model.faces)
+    assert model.reuse_report()['products']['mesh'] == {'reused': 12, 'computed': 0}
+
+
+def test_faces_with_cached_meshes_are_tessellated_on_demand(face_cache):
+    incremental_parse(two_boxes(), face_cache)
+    model = app.ShapeModel(two_boxes(), face_cache)
+    model.mesh()
+    location = app.TopLoc_Location()
+    assert not any(app.BRep_Tool.Triangulation(face, location) for face in model.faces)
+
+    assert app.BRep_Tool.Triangulation(model.meshed_face(model.faces[0]), location)
+    model.triangulate()
+    assert all(app.BRep_Tool.Triangulation(face, location) for face in model.faces)
+
+
+def test_parse_step_incremental(client, face_cache):
+    first = post_file(client, '/parse-step', fields='faces', incremental='true').get_json()
+    second = post_file(client, '/parse-step', fields='faces', incremental='true').get_json()
+    faces = first['incremental']['faces']
+    assert first['incremental']['recomputed_faces'] == faces
+    assert second['incremental']['recomputed_faces'] == 0
+    assert second['incremental']['reused_faces'] == faces
+    assert second['topology']['faces'] == first['topology']['faces']
+
+
+# === /parse-step-batch === #
+def zip_upload(members):
+    """An uploaded ZIP archive of name -> bytes members"""
+    from werkzeug.datastructures import FileStorage
+
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    data.seek(0)
+    return FileStorage(data, filename='batch.zip')
+
+
+def test_batch_uploads_expand_zip_archives(tmp_path):
+    upload = zip_upload({'a.step': b'a', 'dir/b.STP': b'bb', 'readme.txt': b'skip'})
+    saved = app.save_batch_uploads([upload], str(tmp_path))
+    assert [filename for filename, _ in saved] == ['a.step', 'dir/b.STP']
+    assert [os.path.getsize(path) for _, path in saved] == [1, 2]
+
+
+def test_zip_bombs_are_rejected_before_extraction(tmp_path):
+    # 64 MB of zeros deflates to well under 100 kB
+    upload = zip_upload({'bomb.step': bytes(64 * 2**20)})
+    with pytest.raises(app.BatchLimitExceeded):
+        app.save_batch_uploads([upload], str(tmp_path), max_bytes=2**20)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_batch_uploads_are_limited_in_count(tmp_path):
+    upload = zip_upload({f"{index}.step": b'x' for index in range(3)})
+    with pytest.raises(app.BatchLimitExceeded):
+        app.save_batch_uploads([upload], str(tmp_path), max_files=2)
+    assert len(os.listdir(str(tmp_path))) == 2
+
+
+def test_parse_step_batch_rejects_oversized_batches(client, monkeypatch):
+    monkeypatch.setattr(app, 'PARSE_BATCH_MAX_FILES', 1)
+    with open(SAMPLE_STEP, 'rb') as f:
+        data = f.read()
+    response = client.post('/parse-step-batch', content_type='multipart/form-data',
+                           data={'files': [(io.BytesIO(data), 'a.step'), (io.BytesIO(data), 'b.step')]})
+    assert response.status_code == 413
+    assert os.listdir(app.UPLOAD_FOLDER) == []
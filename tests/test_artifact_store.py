@@ -0,0 +1,218 @@
+"""Tests for the on-disk artifact store (no OCC needed)."""
+import os
+import time
+
+import numpy as np
+import pytest
+
+from artifact_store import ArtifactStore, BrepArrayWriter, FaceResultCache, directory_size, trim_npy
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path), max_bytes=10000, ttl_seconds=3600)
+
+
+def add_artifact(store, artifact_id, size):
+    """Commit an artifact with one file of size bytes"""
+    staging = store.staging_dir(artifact_id)
+    with open(os.path.join(staging, 'data.bin'), 'wb') as f:
+        f.write(b'\0' * size)
+    return store.commit(artifact_id, staging, 'data.bin', f"{artifact_id}.bin", kind='test')
+
+
+def set_last_access(store, artifact_id, age):
+    used = time.time() - age
+    os.utime(os.path.join(store.root, artifact_id, store.MANIFEST), (used, used))
+
+
+def live_ids(store):
+    return sorted(name for name, _, _, _, staging in store.entries() if not staging)
+
+
+def test_commit_and_get(store):
+    manifest = add_artifact(store, 'a1', 100)
+    assert manifest['size_bytes'] == 100 and manifest['kind'] == 'test'
+    assert store.get('a1')['download_name'] == 'a1.bin'
+    assert store.file_path('a1', 'data.bin') == os.path.join(store.root, 'a1', 'data.bin')
+    assert store.usage()['artifacts'] == 1 and store.usage()['size_bytes'] == 100
+    assert not any(name.startswith(store.STAGING_PREFIX) for name in os.listdir(store.root))
+
+
+def test_get_marks_artifacts_as_used(store):
+    add_artifact(store, 'a1', 10)
+    set_last_access(store, 'a1', 600)
+    before = os.path.getmtime(os.path.join(store.root, 'a1', store.MANIFEST))
+    store.get('a1')
+    assert os.path.getmtime(os.path.join(store.root, 'a1', store.MANIFEST)) > before
+
+
+def test_unknown_and_malformed_ids(store):
+    assert store.get('missing') is None
+    assert store.get('../etc') is None
+    assert store.get('a' * 65) is None
+
+
+def test_file_path_stays_inside_the_artifact(store):
+    add_artifact(store, 'a1', 10)
+    assert store.file_path('a1', '../a1/data.bin') is None
+    assert store.file_path('a1', store.MANIFEST) is None
+    assert store.file_path('a1', 'other.bin') is None
+
+
+def test_sweep_removes_idle_artifacts_past_the_ttl(store):
+    add_artifact(store, 'old', 10)
+    add_artifact(store, 'new', 10)
+    set_last_access(store, 'old', 7200)
+    assert store.sweep() == ['old']
+    assert live_ids(store) == ['new']
+
+
+def test_sweep_evicts_least_recently_used_past_the_quota(store):
+    store.max_bytes = 20000
+    for artifact_id, age in (('a', 300), ('b', 100), ('c', 200)):
+        add_artifact(store, artifact_id, 4000)
+        set_last_access(store, artifact_id, age)
+    store.max_bytes = 10000
+    # 12000 bytes against a 10000 byte quota: the oldest artifact goes
+    assert store.sweep() == ['a']
+    assert live_ids(store) == ['b', 'c']
+
+
+def test_commit_keeps_the_new_artifact(store):
+    add_artifact(store, 'small', 100)
+    set_last_access(store, 'small', 60)
+    add_artifact(store, 'huge', 20000)
+    # The new artifact alone is over the quota; everything else is evicted instead
+    assert live_ids(store) == ['huge']
+
+
+def test_sweep_removes_stale_staging_directories(store):
+    staging = store.staging_dir('abandoned')
+    old = time.time() - 7200
+    os.utime(staging, (old, old))
+    store.staging_dir('building')
+    store.sweep()
+    assert os.listdir(store.root) == [store.STAGING_PREFIX + 'building']
+    assert store.usage()['artifacts'] == 0
+
+
+def test_discard(store):
+    staging = store.staging_dir('a1')
+    store.discard(staging)
+    assert not os.path.exists(staging)
+
+
+def test_directory_size(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'one').write_bytes(b'x' * 3)
+    (tmp_path / 'sub' / 'two').write_bytes(b'x' * 5)
+    assert directory_size(str(tmp_path)) == 8
+
+
+# === Per-face result cache === #
+@pytest.fixture
+def face_cache(tmp_path):
+    return FaceResultCache(str(tmp_path / 'face_cache'), max_bytes=10000)
+
+
+def set_entry_last_use(cache, key, age):
+    used = time.time() - age
+    os.utime(cache.path(key), (used, used))
+
+
+def test_face_cache_get_and_put(face_cache):
+    key = face_cache.key('f1', 'mesh', ['medium', 0.001, 0.5])
+    assert key == face_cache.key('f1', 'mesh', ['medium', 0.001, 0.5])
+    assert key != face_cache.key('f1', 'grid', [32])
+    assert face_cache.get(key) is None and not face_cache.contains(key)
+
+    face_cache.put(key, {'vertices': [[0.0, 1.5, 2.0]], 'indices': []})
+    assert face_cache.contains(key)
+    assert face_cache.get(key) == {'value': {'vertices': [[0.0, 1.5, 2.0]], 'indices': []}}
+    assert not [name for name in os.listdir(os.path.dirname(face_cache.path(key))) if name.endswith('.tmp')]
+
+
+def test_face_cache_get_marks_entries_as_used(face_cache):
+    face_cache.put('abc', [1, 2, 3])
+    set_entry_last_use(face_cache, 'abc', 3600)
+    face_cache.get('abc')
+    assert time.time() - os.path.getmtime(face_cache.path('abc')) < 60
+
+
+def test_face_cache_ignores_unreadable_entries(face_cache):
+    face_cache.put('abc', [1, 2, 3])
+    with open(face_cache.path('abc'), 'w') as f:
+        f.write('{"value": [1, 2')
+    assert face_cache.get('abc') is None
+
+
+def test_face_cache_sweep_evicts_least_recently_used(face_cache):
+    for age, key in [(300, 'k1'), (200, 'k2'), (100, 'k3')]:
+        face_cache.put(key, 'x' * 4000)
+        set_entry_last_use(face_cache, key, age)
+    face_cache.get('k1')  # the oldest entry becomes the most recently used
+
+    assert face_cache.sweep() == 1
+    assert [face_cache.contains(key) for key in ('k1', 'k2', 'k3')] == [True, False, True]
+    assert face_cache.sweep() == 0
+
+
+def test_face_cache_sweeps_every_few_writes(face_cache, monkeypatch):
+    monkeypatch.setattr(FaceResultCache, 'SWEEP_EVERY', 3)
+    for index in range(5):
+        face_cache.put(f"k{index}", 'x' * 4000)
+        set_entry_last_use(face_cache, f"k{index}", 100 - index)
+    # The third write swept k0 out; k3 and k4 came after the sweep
+    assert [face_cache.contains(f"k{index}") for index in range(5)] == [False, True, True, True, True]
+
+
+# === Memory-mapped result arrays === #
+def test_trim_npy_round_trips_through_np_load(tmp_path):
+    path = str(tmp_path / 'rows.npy')
+    array = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(1000, 4, 3))
+    expected = np.arange(7 * 4 * 3, dtype=np.float32).reshape(7, 4, 3)
+    array[:7] = expected
+    array.flush()
+    del array
+
+    data_offset, row_bytes = trim_npy(path, 7)
+    loaded = np.load(path)
+    assert loaded.shape == (7, 4, 3)
+    np.testing.assert_array_equal(loaded, expected)
+    assert row_bytes == 4 * 3 * 4
+    with open(path, 'rb') as f:
+        assert len(f.read()) == data_offset + 7 * row_bytes
+
+
+def test_trim_npy_to_zero_rows(tmp_path):
+    path = str(tmp_path / 'empty.npy')
+    np.save(path, np.ones((12, 2), dtype=np.int32))
+    trim_npy(path, 0)
+    assert np.load(path).shape == (0, 2)
+
+
+def test_brep_array_writer_trims_and_describes_its_arrays(tmp_path):
+    directory = str(tmp_path)
+    writer = BrepArrayWriter(directory, num_faces=5, num_edges=4, num_vertices=6, grid_size=2, edge_samples=3,
+                             grid_mode='trimmed')
+    for row in range(2):
+        writer.write('surf_wcs', row, np.full((2, 2, 3), row))
+        writer.write('surf_mask', row, [[True, False], [False, True]])
+    writer.write('edge_wcs', 0, np.ones((3, 3)))
+    writer.write('unknown', 0, 1.0)  # arrays that were not opened are ignored
+
+    manifest = writer.finish({'surf_wcs': 2, 'surf_mask': 2, 'edge_wcs': 1, 'vertices': 0},
+                             {'face_edges': [[0, 1], [2]]})
+    assert manifest['surf_wcs']['shape'] == [2, 2, 2, 3]
+    np.testing.assert_array_equal(np.load(os.path.join(directory, 'surf_wcs.npy'))[1], np.ones((2, 2, 3)))
+    assert np.load(os.path.join(directory, 'vertices.npy')).shape == (0, 3)
+    assert np.load(os.path.join(directory, 'face_edges_offsets.npy')).tolist() == [0, 2, 3]
+
+    # Rows can be read straight from the file with the manifest offsets
+    entry = manifest['edge_wcs']
+    with open(os.path.join(directory, entry['file']), 'rb') as f:
+        f.seek(entry['data_offset'])
+        row = np.frombuffer(f.read(entry['row_bytes']), dtype=np.dtype(entry['dtype']))
+    np.testing.assert_array_equal(row, np.ones(9))
+    assert entry['size_bytes'] == entry['data_offset'] + entry['row_bytes']
@@ -0,0 +1,101 @@
+"""Tests for request instrumentation (no OCC needed)."""
+import time
+
+import pytest
+
+from instrumentation import DeadlineExceeded, MetricsRegistry, StageTimer
+
+
+# === Stage timer === #
+def test_deadline_raises_at_the_next_stage_boundary():
+    timer = StageTimer(deadline_seconds=0.05)
+    with timer.stage('read'):
+        time.sleep(0.1)  # the running stage is never interrupted
+    with pytest.raises(DeadlineExceeded) as raised:
+        with timer.stage('mesh'):
+            pass
+    assert raised.value.stage == 'mesh'
+    assert 'read' in timer.stages and 'mesh' not in timer.stages
+
+
+def test_no_deadline_never_raises():
+    timer = StageTimer()
+    with timer.stage('read'):
+        pass
+    timer.check_deadline('mesh')
+    assert timer.deadline is None
+    assert timer.remaining() is None
+
+
+def test_remaining_counts_down_to_zero():
+    timer = StageTimer(deadline_seconds=0.05)
+    assert 0.0 < timer.remaining() <= 0.05
+    time.sleep(0.1)
+    assert timer.remaining() == 0.0
+
+
+def test_stage_timings_are_exclusive(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(time, 'perf_counter', lambda: clock[0])
+    timer = StageTimer()
+    with timer.stage('parse'):
+        clock[0] += 1.0
+        with timer.stage('mesh'):
+            clock[0] += 2.0
+        clock[0] += 0.5
+    assert timer.stages == {'parse': 1.5, 'mesh': 2.0}
+    assert timer.server_timing(4.0) == 'parse;dur=1500.0, mesh;dur=2000.0, total;dur=4000.0'
+
+
+# === Progress events === #
+def test_progress_is_throttled_except_for_the_last_item(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(time, 'perf_counter', lambda: clock[0])
+    timer = StageTimer()
+    events = []
+    timer.listeners.append(events.append)
+
+    for done in range(1, 11):
+        timer.progress('faces', done, 10)
+        clock[0] += 0.125
+    timer.progress('views', 1, 4)
+
+    progress = [(data['item'], data['done']) for event, data in events if event == 'progress']
+    # One event per PROGRESS_INTERVAL (0.5s) per item, plus the final one
+    assert progress == [('faces', 1), ('faces', 5), ('faces', 9), ('faces', 10), ('views', 1)]
+
+
+def test_progress_without_listeners_is_a_no_op():
+    timer = StageTimer()
+    timer.progress('faces', 1, 10)
+    assert timer._last_progress == {}
+
+
+def test_stage_events_are_announced_once():
+    timer = StageTimer()
+    events = []
+    timer.listeners.append(events.append)
+    for _ in range(3):
+        with timer.stage('grid'):
+            pass
+    assert [data['stage'] for event, data in events if event == 'stage'] == ['grid']
+
+
+# === Metrics === #
+def test_histograms_render_merged_with_snapshots():
+    registry = MetricsRegistry()
+    registry.histogram('latency', 'Request latency', (1, 10))
+    registry.observe('latency', 0.5, endpoint='parse')
+    registry.observe('latency', 5, endpoint='parse')
+
+    other = MetricsRegistry()
+    other.histogram('latency', 'Request latency', (1, 10))
+    other.observe('latency', 20, endpoint='parse')
+
+    lines = registry.render([other.snapshot()]).splitlines()
+    assert lines[:2] == ['# HELP latency Request latency', '# TYPE latency histogram']
+    assert lines[2:] == ['latency_bucket{endpoint="parse",le="1"} 1',
+                         'latency_bucket{endpoint="parse",le="10"} 2',
+                         'latency_bucket{endpoint="parse",le="+Inf"} 3',
+                         'latency_sum{endpoint="parse"} 25.500000',
+                         'latency_count{endpoint="parse"} 3']
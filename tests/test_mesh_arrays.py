@@ -0,0 +1,196 @@
+"""Tests for the NumPy mesh helpers (no OCC needed)."""
+import json
+import struct
+
+import numpy as np
+
+from mesh_arrays import (GLTF_UNSIGNED_INT, GLTF_UNSIGNED_SHORT, closest_points_on_mesh_2d, encode_glb,
+                         grid_parameters, split_creases, weld_mesh, weld_points)
+
+
+# === Sampling grids === #
+def test_grid_parameters_span_the_bounds():
+    u, v = grid_parameters(-1.0, 1.0, 2.0, 4.0, 5, 3)
+    assert u.tolist() == [-1.0, -0.5, 0.0, 0.5, 1.0]
+    assert v.tolist() == [2.0, 3.0, 4.0]
+
+
+def test_single_sample_grid_parameters_sit_in_the_middle():
+    u, v = grid_parameters(0.0, 2.0, -3.0, 1.0, 1, 1)
+    assert u.tolist() == [1.0] and v.tolist() == [-1.0]
+
+
+# === Projection === #
+def test_closest_points_skip_nodes_without_triangles():
+    points_2d = np.array([[0, 0], [1, 0], [0, 1], [5, 5], [5.1, 5.1], [4.9, 5.0]], dtype=float)
+    points_3d = np.column_stack([points_2d, np.ones(len(points_2d))])
+    triangles = np.array([[0, 1, 2]])
+    queries = np.array([[0.2, 0.2], [5.0, 5.0], [-1.0, 0.0]])
+
+    result = closest_points_on_mesh_2d(queries, points_2d, points_3d, triangles)
+    # Nodes 3-5 are nearest to the second query but have no triangles
+    np.testing.assert_allclose(result, [[0.2, 0.2, 1.0], [0.5, 0.5, 1.0], [0.0, 0.0, 1.0]])
+
+
+def test_closest_points_without_triangles_are_nan():
+    points = np.zeros((3, 2))
+    result = closest_points_on_mesh_2d(np.zeros((2, 2)), points, np.zeros((3, 3)),
+                                       np.zeros((0, 3), dtype=np.int64))
+    assert result.shape == (2, 3) and np.isnan(result).all()
+
+
+# === Welding === #
+def test_weld_points_across_grid_cell_boundaries():
+    # Each pair straddles x = 1.5 * tolerance, where rounding to a tolerance grid splits it
+    tolerance = 1e-3
+    points = np.array([[0.0015 - 1e-7, 0.0, 0.0], [0.0015 + 1e-7, 0.0, 0.0],
+                       [2.0, 0.0015 - 1e-7, 0.0], [2.0, 0.0015 + 1e-7, 0.0],
+                       [5.0, 5.0, 5.0]])
+    positions, inverse = weld_points(points, tolerance)
+    assert len(positions) == 3
+    assert inverse[0] == inverse[1] and inverse[2] == inverse[3]
+    assert len({inverse[0], inverse[2], inverse[4]}) == 3
+    np.testing.assert_array_equal(positions[inverse], points[[0, 0, 2, 2, 4]])
+
+
+def test_weld_points_merges_chains():
+    points = np.array([[0.0, 0.0, 0.0], [0.8, 0.0, 0.0], [1.6, 0.0, 0.0], [3.0, 0.0, 0.0]])
+    positions, inverse = weld_points(points, 1.0)
+    assert inverse.tolist()[:3] == [inverse[0]] * 3
+    assert len(positions) == 2
+
+
+def shared_edge_mesh(gap):
+    """Two faces with one triangle each, sharing the edge b-c up to gap"""
+    a, b, c, d = [0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [1.0, 1.0, 0.0]
+    offset = np.array([gap, -gap, 0.0])
+    points = np.array([a, b, c, np.add(b, offset), np.add(c, offset), d])
+    triangles = np.array([[0, 1, 2], [3, 5, 4]])
+    return points, triangles, np.array([0, 1], dtype=np.uint32)
+
+
+def test_weld_mesh_joins_faces_along_a_shared_edge():
+    points, triangles, face_ids = shared_edge_mesh(1e-9)
+    positions, indices, welded_ids, normals = weld_mesh(points, triangles, face_ids, 1e-6)
+    assert len(positions) == 4
+    assert len(set(indices[0]) & set(indices[1])) == 2
+    assert welded_ids.tolist() == [0, 1]
+    np.testing.assert_allclose(normals, np.tile([0.0, 0.0, 1.0], (4, 1)))
+
+
+def test_weld_mesh_keeps_separate_nodes_apart():
+    points, triangles, face_ids = shared_edge_mesh(1e-3)
+    positions, indices, _, normals = weld_mesh(points, triangles, face_ids, 1e-6, with_normals=False)
+    assert len(positions) == 6
+    assert normals is None
+
+
+def test_weld_mesh_drops_collapsed_triangles():
+    points = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0],
+                       [5.0, 5.0, 5.0], [5.0, 5.0, 5.0 + 1e-9], [6.0, 5.0, 5.0]])
+    triangles = np.array([[0, 1, 2], [3, 4, 5]])
+    _, indices, face_ids, _ = weld_mesh(points, triangles, np.array([7, 8], dtype=np.uint32), 1e-6)
+    assert len(indices) == 1
+    assert face_ids.tolist() == [7]
+
+
+def test_weld_mesh_splits_sharp_edges_when_normals_are_requested():
+    # Two faces folded 90 degrees along the edge b-c
+    a, b, c, d = [0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [1.0, 1.0, 1.0]
+    points = np.array([a, b, c, b, d, c])
+    triangles = np.array([[0, 1, 2], [3, 4, 5]])
+    face_ids = np.array([0, 1], dtype=np.uint32)
+
+    positions, indices, _, normals = weld_mesh(points, triangles, face_ids, 1e-6)
+    assert len(positions) == 6
+    assert not set(indices[0]) & set(indices[1])
+    np.testing.assert_allclose(normals[indices[0]], np.tile([0.0, 0.0, 1.0], (3, 1)))
+
+    positions, indices, _, _ = weld_mesh(points, triangles, face_ids, 1e-6, with_normals=False)
+    assert len(positions) == 4
+    assert len(set(indices[0]) & set(indices[1])) == 2
+
+
+def test_split_creases_keeps_shallow_edges_smooth():
+    # Two faces meeting at 10 degrees share the edge and its normals
+    tilt = np.tan(np.radians(10.0))
+    positions = np.array([[0.0, -1.0, 0.0], [0.0, 1.0, 0.0], [-1.0, 0.0, 0.0], [1.0, 0.0, tilt]])
+    indices = np.array([[0, 1, 2], [1, 0, 3]])
+    split_positions, split_indices, normals = split_creases(positions, indices, np.array([0, 1]))
+    assert len(split_positions) == 4
+    np.testing.assert_allclose(np.linalg.norm(normals, axis=1), 1.0)
+    shared = sorted(set(split_indices[0]) & set(split_indices[1]))
+    assert len(shared) == 2
+    assert normals[shared[0]][0] < 0 and normals[shared[0]][2] > 0
+
+
+# === GLB encoding === #
+def read_glb(data):
+    magic, version, length = struct.unpack_from('<III', data, 0)
+    assert (magic, version, length) == (0x46546C67, 2, len(data))
+    json_length, json_type = struct.unpack_from('<II', data, 12)
+    assert json_type == 0x4E4F534A and json_length % 4 == 0
+    gltf = json.loads(data[20:20 + json_length])
+    bin_length, bin_type = struct.unpack_from('<II', data, 20 + json_length)
+    assert bin_type == 0x004E4942 and bin_length % 4 == 0
+    binary = data[28 + json_length:28 + json_length + bin_length]
+    assert len(binary) == bin_length == gltf['buffers'][0]['byteLength']
+    return gltf, binary
+
+
+def accessor_array(gltf, binary, index, dtype, width):
+    accessor = gltf['accessors'][index]
+    view = gltf['bufferViews'][accessor['bufferView']]
+    assert view['byteOffset'] % 4 == 0
+    array = np.frombuffer(binary[view['byteOffset']:view['byteOffset'] + view['byteLength']], dtype=dtype)
+    stride = view.get('byteStride', np.dtype(dtype).itemsize * width) // np.dtype(dtype).itemsize
+    array = array.reshape(-1, stride)[:, :width]
+    assert len(array) == accessor['count']
+    return array
+
+
+def quad():
+    positions = np.array([[0.0, 0.0, 0.0], [2.0, 0.0, 0.0], [0.0, 1.0, 0.5], [2.0, 1.0, 0.5]])
+    indices = np.array([[0, 1, 2], [1, 3, 2]])
+    normals = np.tile([0.0, -0.447214, 0.894427], (4, 1))
+    return positions, indices, np.array([3, 4], dtype=np.uint32), normals
+
+
+def test_encode_glb_round_trip():
+    positions, indices, face_ids, normals = quad()
+    gltf, binary = read_glb(encode_glb(positions, indices, face_ids, normals))
+    primitive = gltf['meshes'][0]['primitives'][0]
+
+    np.testing.assert_allclose(accessor_array(gltf, binary, primitive['attributes']['POSITION'], np.float32, 3),
+                               positions)
+    np.testing.assert_allclose(accessor_array(gltf, binary, primitive['attributes']['NORMAL'], np.float32, 3),
+                               normals, rtol=1e-6)
+    assert gltf['accessors'][primitive['indices']]['componentType'] == GLTF_UNSIGNED_SHORT
+    assert accessor_array(gltf, binary, primitive['indices'], np.uint16, 1).ravel().tolist() == indices.ravel().tolist()
+    face_id_accessor = gltf['meshes'][0]['extras']['faceIdAccessor']
+    assert accessor_array(gltf, binary, face_id_accessor, np.uint32, 1).ravel().tolist() == [3, 4]
+    assert gltf['accessors'][primitive['attributes']['POSITION']]['max'] == [2.0, 1.0, 0.5]
+    assert 'extensionsUsed' not in gltf
+
+
+def test_encode_glb_quantized():
+    positions, indices, face_ids, normals = quad()
+    gltf, binary = read_glb(encode_glb(positions, indices, face_ids, normals, quantize=True))
+    primitive = gltf['meshes'][0]['primitives'][0]
+    assert gltf['extensionsRequired'] == ['KHR_mesh_quantization']
+
+    node = gltf['nodes'][0]
+    quantized = accessor_array(gltf, binary, primitive['attributes']['POSITION'], np.uint16, 3)
+    dequantized = quantized * np.array(node['scale']) + np.array(node['translation'])
+    np.testing.assert_allclose(dequantized, positions, atol=2.0 / 65535)
+    packed = accessor_array(gltf, binary, primitive['attributes']['NORMAL'], np.int8, 3)
+    np.testing.assert_allclose(packed / 127.0, normals, atol=1.0 / 127)
+
+
+def test_encode_glb_uses_32_bit_indices_for_large_meshes():
+    positions = np.random.default_rng(0).random((70000, 3))
+    indices = np.array([[0, 69999, 1]])
+    gltf, binary = read_glb(encode_glb(positions, indices, np.zeros(1, dtype=np.uint32)))
+    index_accessor = gltf['meshes'][0]['primitives'][0]['indices']
+    assert gltf['accessors'][index_accessor]['componentType'] == GLTF_UNSIGNED_INT
+    assert accessor_array(gltf, binary, index_accessor, np.uint32, 1).ravel().tolist() == [0, 69999, 1]
@@ -0,0 +1,74 @@
+"""Tests for the streaming STEP pre-scanner (no OCC needed)."""
+import pytest
+
+from step_prescan import StepScanner, estimate_step_cost, prescan_step_file
+
+# Strings with ';', quotes and comment openers, comments with ';', a complex
+# instance and units, so statements and tokens straddle chunk boundaries
+STEP_TEXT = b"""ISO-10303-21;
+HEADER;
+/* header comment; with a semicolon */
+FILE_DESCRIPTION(('a; tricky ''quoted'' /* description'),'2;1');
+FILE_NAME('part.step','2024-01-01T00:00:00',('author'),(''),'','','');
+FILE_SCHEMA(('AUTOMOTIVE_DESIGN { 1 0 10303 214 1 1 1 1 }'));
+ENDSEC;
+DATA;
+#1=CARTESIAN_POINT('',(0.,0.,0.));
+#2=CARTESIAN_POINT('p;2',(1.,0.,0.));
+#3=VERTEX_POINT('',#1);
+#4=VERTEX_POINT('',#2);
+#5=EDGE_CURVE('',#3,#4,#6,.T.);
+#6=LINE('',#1,#7);
+#7=VECTOR('',#8,1.);
+#8=DIRECTION('',(1.,0.,0.));
+/* a comment between instances; #99=FAKE(); */
+#9=ADVANCED_FACE('',(),#10,.T.);
+#10=B_SPLINE_SURFACE_WITH_KNOTS('it''s',3,3,(),.UNSPECIFIED.,.F.,.F.,.F.,(),(),(),(),.UNSPECIFIED.);
+#11=( LENGTH_UNIT() NAMED_UNIT(*) SI_UNIT(.MILLI.,.METRE.) );
+#12=( GEOMETRIC_REPRESENTATION_CONTEXT(3) GLOBAL_UNIT_ASSIGNED_CONTEXT((#11)) REPRESENTATION_CONTEXT('ctx','3D') );
+#13=SHAPE_REPRESENTATION('',(#9,#5),#12);
+ENDSEC;
+END-ISO-10303-21;
+"""
+
+
+@pytest.fixture
+def step_path(tmp_path):
+    path = tmp_path / 'part.step'
+    path.write_bytes(STEP_TEXT)
+    return str(path)
+
+
+def test_scan_summary(step_path):
+    scan = prescan_step_file(step_path)
+    assert scan['is_part21']
+    assert scan['bytes'] == len(STEP_TEXT)
+    assert scan['schema'] == 'AUTOMOTIVE_DESIGN { 1 0 10303 214 1 1 1 1 }'
+    assert scan['header']['file_description'] == ["a; tricky 'quoted' /* description", '2;1']
+    assert scan['instance_count'] == 13
+    assert scan['entity_counts']['CARTESIAN_POINT'] == 2
+    assert scan['entity_counts']['LENGTH_UNIT'] == 1
+    assert 'FAKE' not in scan['entity_counts']
+    assert scan['length_units'] == ['mm']
+    # Only the shape representation is not referenced by another instance
+    assert scan['root_count'] == 1
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1000])
+def test_results_do_not_depend_on_chunk_size(step_path, chunk_size):
+    assert prescan_step_file(step_path, chunk_size=chunk_size) == prescan_step_file(step_path)
+
+
+def test_feed_and_finish_match_file_scan(step_path):
+    scanner = StepScanner()
+    for i in range(0, len(STEP_TEXT), 5):
+        scanner.feed(STEP_TEXT[i:i + 5])
+    assert scanner.finish() == prescan_step_file(step_path)
+
+
+def test_estimate_counts_weighted_entities(step_path):
+    estimate = estimate_step_cost(prescan_step_file(step_path))
+    assert estimate['faces'] == 1
+    assert estimate['edges'] == 1
+    assert estimate['bspline_surfaces'] == 1
+    assert estimate['cost'] == round(1.0 + 4.0 + 0.2 + 2 * 0.002, 1)
@@ -0,0 +1,204 @@
+"""Tests for the NumPy topology helpers (no OCC needed)."""
+import zipfile
+from math import pi, radians
+
+import numpy as np
+import pytest
+
+from topology_arrays import (EDGE_CONVEXITY_CODES, EDGE_SMOOTH_ANGLE, CoedgeTable, CompactTopology, CsrRelation,
+                             classify_convexity, dual_graphs, resolve_graph_format, sparse_links)
+
+
+# === Edge convexity === #
+# The +x edge of a unit cube's top face, running along that face's boundary
+TOP = np.array([0.0, 0.0, 1.0])
+SIDE = np.array([1.0, 0.0, 0.0])
+ALONG_TOP = np.array([0.0, 1.0, 0.0])
+
+
+def test_box_edge_is_convex():
+    name, angle = classify_convexity(TOP, SIDE, ALONG_TOP)
+    assert name == 'convex'
+    assert angle == pytest.approx(pi / 2)
+
+
+def test_pocket_edge_is_concave():
+    # Same faces, with the wall facing back over the top face
+    name, angle = classify_convexity(TOP, -SIDE, ALONG_TOP)
+    assert name == 'concave'
+    assert angle == pytest.approx(pi / 2)
+
+
+def test_edge_direction_follows_the_first_face():
+    # Seen from the side face the edge runs the other way round
+    assert classify_convexity(SIDE, TOP, -ALONG_TOP)[0] == 'convex'
+    assert classify_convexity(SIDE, TOP, ALONG_TOP)[0] == 'concave'
+
+
+def test_nearly_tangent_faces_are_smooth():
+    tilt = EDGE_SMOOTH_ANGLE / 2
+    tilted = np.array([np.sin(tilt), 0.0, np.cos(tilt)])
+    name, angle = classify_convexity(TOP, tilted, ALONG_TOP)
+    assert name == 'smooth'
+    assert angle == pytest.approx(tilt)
+    assert classify_convexity(TOP, TOP, ALONG_TOP) == ('smooth', 0.0)
+
+
+def test_shallow_fold_is_not_smooth():
+    tilt = radians(5.0)
+    tilted = np.array([np.sin(tilt), 0.0, np.cos(tilt)])
+    name, angle = classify_convexity(TOP, tilted, ALONG_TOP)
+    assert name == 'convex'
+    assert angle == pytest.approx(tilt)
+
+
+def test_rounding_past_unit_length_is_clipped():
+    name, angle = classify_convexity(TOP * (1 + 1e-12), TOP, ALONG_TOP)
+    assert name == 'smooth' and angle == 0.0
+
+
+# === Compact topology === #
+def test_csr_from_rows_round_trip():
+    rows = [[0, 1, 2], [], [5], [3, 3]]
+    relation = CsrRelation.from_rows(rows)
+    assert relation.offsets.dtype == np.int32 and relation.indices.dtype == np.int32
+    assert relation.offsets.tolist() == [0, 3, 3, 4, 6]
+    assert len(relation) == 4
+    assert relation.row(2).tolist() == [5]
+    assert relation.to_lists() == rows
+    assert relation.nbytes == 5 * 4 + 6 * 4
+
+
+def compact_topology():
+    relations = {name: CsrRelation.from_rows([[i, i + 1] for i in range(3)])
+                 for name in CompactTopology.RELATIONS}
+    coedges = CoedgeTable(edge=[0, 1, 1], face=[0, 0, 1], wire=[0, 0, 1], vertex=[0, 1, 1],
+                              next=[1, 0, 2], prev=[1, 0, 2], mate=[-1, 2, 1], reversed=[0, 0, 1],
+                              wire_coedges=CsrRelation.from_rows([[0, 1], [2]]))
+    return CompactTopology(np.arange(12).reshape(4, 3), [0, 1, 2], [3, 4, 5], relations, coedges)
+
+
+def test_compact_topology_npz_round_trip(tmp_path):
+    topology = compact_topology()
+    path = str(tmp_path / 'topology.npz')
+    topology.to_npz(path)
+    loaded = CompactTopology.from_npz(path)
+
+    assert loaded.counts() == topology.counts()
+    np.testing.assert_array_equal(loaded.vertices, topology.vertices)
+    for name, relation in topology.relations.items():
+        assert loaded.relations[name].to_lists() == relation.to_lists()
+    for name in CoedgeTable.COLUMNS:
+        np.testing.assert_array_equal(getattr(loaded.coedges, name), getattr(topology.coedges, name))
+    assert loaded.coedges.ordered_edges(0) == [0, 1]
+
+
+def test_compact_topology_to_dict():
+    topology = compact_topology()
+    data = topology.to_dict()
+    assert data['counts'] == {'vertices': 4, 'faces': 3, 'edges': 3, 'wires': 3, 'shells': 3, 'solids': 3,
+                              'coedges': 3}
+    assert data['relations']['face_edges'] == {'offsets': [0, 2, 4, 6], 'indices': [0, 1, 1, 2, 2, 3]}
+    assert data['codes']['surface_type'][data['face_surface_type'][1]] == 'cylinder'
+    assert data['coedges']['mate'] == [-1, 2, 1]
+
+
+def test_compact_topology_to_arrow(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'topology.zip')
+    compact_topology().to_arrow(path)
+    with zipfile.ZipFile(path) as archive:
+        assert set(archive.namelist()) == {f"{name}.arrow" for name in
+                                           ('vertices', 'faces', 'edges', 'wires', 'shells', 'solids', 'coedges')}
+        faces = pa.ipc.open_stream(archive.read('faces.arrow')).read_all()
+    assert faces.column('edges').to_pylist() == [[0, 1], [1, 2], [2, 3]]
+
+
+# === Coedge table === #
+def seam_wire_table():
+    """
+    One face bounded by a wire that runs edge 0, the seam edge 1 up, edge 2,
+    then the seam back down: the two seam coedges are each other's mate
+    """
+    return CoedgeTable(edge=[0, 1, 2, 1], face=[0, 0, 0, 0], wire=[0, 0, 0, 0], vertex=[0, 1, 1, 0],
+                       next=[1, 2, 3, 0], prev=[3, 0, 1, 2], mate=[-1, 3, -1, 1], reversed=[0, 0, 1, 1],
+                       wire_coedges=CsrRelation.from_rows([[0, 1, 2, 3]]))
+
+
+def test_coedge_columns_are_typed():
+    table = seam_wire_table()
+    assert len(table) == 4
+    for name in CoedgeTable.COLUMNS:
+        assert getattr(table, name).dtype == (np.int8 if name == 'reversed' else np.int32)
+    assert table.nbytes == 7 * 4 * 4 + 4 + table.wire_coedges.nbytes
+
+
+def test_ordered_edges_list_a_seam_once():
+    table = seam_wire_table()
+    assert table.ordered_edges(0) == [0, 1, 2]
+    assert table.ordered_vertices(0) == [0, 1]
+
+
+def test_coedge_links_are_consistent():
+    table = seam_wire_table()
+    coedges = np.arange(len(table))
+    np.testing.assert_array_equal(table.prev[table.next], coedges)
+    mated = table.mate >= 0
+    np.testing.assert_array_equal(table.mate[table.mate[mated]], coedges[mated])
+    np.testing.assert_array_equal(table.edge[table.mate[mated]], table.edge[mated])
+
+
+def test_coedge_table_round_trips_through_its_arrays():
+    table = seam_wire_table()
+    loaded = CoedgeTable.from_arrays(table.arrays())
+    assert loaded.to_dict() == table.to_dict()
+    assert loaded.to_dict()['wire_coedges'] == {'offsets': [0, 4], 'indices': [0, 1, 2, 3]}
+
+
+# === Dual graphs === #
+CONVEX, CONCAVE, UNDEFINED = (EDGE_CONVEXITY_CODES[name] for name in ('convex', 'concave', 'undefined'))
+
+
+def strip_graphs(graph_format='coo'):
+    """
+    Three faces in a row: edge 0 joins faces 0 and 1 (convex), edge 1 joins
+    faces 1 and 2 (concave) and edge 2 is a boundary edge of face 2. Vertex 0
+    is shared by edges 0 and 1, vertex 1 by edges 1 and 2.
+    """
+    return dual_graphs(3, [[0, 1], [1, 2], []], [[0, 1], [1, 2]], [CONVEX, CONCAVE, UNDEFINED],
+                       [1.5, 1.5, None], graph_format)
+
+
+def test_resolve_graph_format():
+    assert resolve_graph_format(None) == 'coo'
+    assert resolve_graph_format(' CSR ') == 'csr'
+    with pytest.raises(ValueError, match='dense'):
+        resolve_graph_format('dense')
+
+
+def test_sparse_links_as_coo_and_csr():
+    rows = [[(1, 'a'), (2, 'b')], [], [(0, 'c')]]
+    assert sparse_links(rows, ('label',), 'coo') == {'rows': [0, 0, 2], 'cols': [1, 2, 0],
+                                                     'label': ['a', 'b', 'c'], 'shape': [3, 3]}
+    assert sparse_links(rows, ('label',), 'csr') == {'offsets': [0, 2, 2, 3], 'indices': [1, 2, 0],
+                                                     'label': ['a', 'b', 'c'], 'shape': [3, 3]}
+
+
+def test_face_links_carry_the_shared_edge():
+    face_face = strip_graphs()['face_face']
+    assert list(zip(face_face['rows'], face_face['cols'])) == [(0, 1), (1, 0), (1, 2), (2, 1)]
+    assert face_face['edge'] == [0, 0, 1, 1]
+    assert face_face['convexity'] == [CONVEX, CONVEX, CONCAVE, CONCAVE]
+    assert face_face['shape'] == [3, 3]
+
+
+def test_edge_links_carry_the_shared_vertex():
+    graphs = strip_graphs('csr')
+    assert graphs['format'] == 'csr'
+    assert graphs['edge_edge'] == {'offsets': [0, 1, 3, 4], 'indices': [1, 0, 2, 1], 'vertex': [0, 0, 1, 1],
+                                   'shape': [3, 3]}
+    # Both formats list the same links in the same order
+    coo = strip_graphs('coo')['face_face']
+    csr = graphs['face_face']
+    assert np.diff(csr['offsets']).tolist() == np.bincount(coo['rows'], minlength=3).tolist()
+    assert csr['indices'] == coo['cols'] and csr['edge'] == coo['edge']
@@ -0,0 +1,128 @@
+"""Tests for the supervised worker pool (no OCC needed)."""
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from worker_pool import WorkerPool
+
+
+def task(value, scale=1):
+    """Pool target: value is a number to scale, or an action"""
+    if value == 'sleep':
+        time.sleep(30)
+    elif value == 'crash':
+        os._exit(3)
+    elif value == 'fail':
+        raise ValueError('bad task')
+    elif value == 'pid':
+        return {'pid': os.getpid()}
+    elif value == 'timeout':
+        return {'status': 'timeout', 'error': 'deadline'}
+    return {'value': value * scale}
+
+
+def wait_all(pool, timeout=10.0):
+    done = {}
+    stop = time.time() + timeout
+    while pool.busy and time.time() < stop:
+        done.update(pool.wait(timeout=0.5))
+    assert not pool.busy
+    return done
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(2, 5.0, task, (10,))
+    yield pool
+    pool.close()
+
+
+def test_records_of_finished_tasks(pool):
+    pool.submit('a', 1)
+    pool.submit('b', 'fail')
+    assert pool.idle() == 0
+    done = wait_all(pool)
+    assert done['a']['status'] == 'success' and done['a']['value'] == 10
+    assert done['a']['seconds'] >= 0
+    assert done['b'] == {'status': 'error', 'error': 'bad task', 'seconds': done['b']['seconds']}
+    assert pool.idle() == 2
+
+
+def test_targets_can_set_their_status(pool):
+    pool.submit('a', 'timeout')
+    assert wait_all(pool)['a']['status'] == 'timeout'
+
+
+def test_submit_needs_an_idle_worker(pool):
+    pool.submit('a', 'sleep')
+    pool.submit('b', 'sleep')
+    with pytest.raises(RuntimeError):
+        pool.submit('c', 1)
+
+
+def test_stuck_workers_are_killed_and_replaced(pool):
+    start = time.time()
+    pool.submit('stuck', 'sleep', timeout=0.5)
+    pool.submit('fine', 2)
+    done = wait_all(pool)
+    assert time.time() - start < 5
+    assert done['stuck']['status'] == 'timeout'
+    assert done['fine']['value'] == 20
+    assert len(pool.workers) == 1
+
+    pool.submit('next', 3)
+    assert wait_all(pool)['next']['value'] == 30
+
+
+def test_crashed_workers_are_replaced(pool):
+    pool.submit('a', 'crash')
+    done = wait_all(pool)
+    assert done['a']['status'] == 'crashed'
+    assert pool.workers == []
+    pool.submit('b', 4)
+    assert wait_all(pool)['b']['value'] == 40
+
+
+def test_workers_are_recycled_after_max_tasks():
+    pool = WorkerPool(1, 5.0, task, max_tasks=2)
+    try:
+        pids = []
+        for key in range(3):
+            pool.submit(key, 'pid')
+            pids.append(wait_all(pool)[key]['pid'])
+        assert pids[0] == pids[1] != pids[2]
+    finally:
+        pool.close()
+
+
+def test_close_kills_busy_workers():
+    pool = WorkerPool(1, None, task)
+    pool.submit('a', 'sleep')
+    process = pool.workers[0].process
+    start = time.time()
+    pool.close()
+    assert time.time() - start < 5
+    assert not process.is_alive()
+
+
+def test_run_calls_on_done_for_every_task():
+    pool = WorkerPool(2, 5.0, task, (2,))
+    done = {}
+    pool.run([1, 2, 3, 'fail', 5], lambda key, record: done.__setitem__(key, record['status']))
+    assert done == {1: 'success', 2: 'success', 3: 'success', 'fail': 'error', 5: 'success'}
+    assert pool.workers == []
+
+
+def test_workers_start_from_a_spawn_context():
+    pool = WorkerPool(2, 10.0, task, (10,), context=multiprocessing.get_context('spawn'))
+    try:
+        pool.submit('a', 2)
+        pool.submit('pid', 'pid')
+        assert [worker.process._start_method for worker in pool.workers] == ['spawn', 'spawn']
+        done = wait_all(pool, timeout=30.0)
+    finally:
+        pool.close()
+    assert done['a']['value'] == 20
+    assert done['pid']['pid'] != os.getpid()
@@ -0,0 +1,310 @@
+"""NumPy side of the topology outputs.
+
+Edge convexity from the normals of the two faces at an edge, the compact
+topology arrays (CSR relations and the coedge table) with their NPZ and Arrow
+serialization, and the face-face and edge-edge dual graphs. app.py samples the
+shapes with OpenCASCADE; nothing here imports it.
+"""
+import zipfile
+from math import radians
+
+import numpy as np
+
+
+# Type codes are indices into these names; app.py maps GeomAbs types to them
+SURFACE_TYPE_NAMES = ('plane', 'cylinder', 'cone', 'sphere', 'torus', 'revolution',
+                      'extrusion', 'bezier', 'bspline', 'offset', 'other')
+CURVE_TYPE_NAMES = ('line', 'circle', 'ellipse', 'hyperbola', 'parabola', 'bezier',
+                    'bspline', 'offset', 'other')
+
+
+# === Edge convexity === #
+EDGE_CONVEXITY_CODES = {'concave': -1, 'smooth': 0, 'convex': 1, 'undefined': 2}
+# Faces meeting at less than this angle (radians) are tangent-continuous
+EDGE_SMOOTH_ANGLE = radians(1.0)
+
+
+def classify_convexity(normal_a, normal_b, direction):
+    """
+    Classify an edge from the unit outward normals of its two faces and its
+    direction along the boundary of the first face; returns (name, angle)
+    """
+    angle = float(np.arccos(np.clip(np.dot(normal_a, normal_b), -1.0, 1.0)))
+    if angle < EDGE_SMOOTH_ANGLE:
+        return 'smooth', angle
+    side = np.dot(np.cross(normal_a, normal_b), direction)
+    return ('convex' if side > 0 else 'concave'), angle
+
+
+# === Compact topology === #
+class CsrRelation(object):
+    """
+    One-to-many relation in CSR form: the targets of row i are
+    indices[offsets[i]:offsets[i + 1]], both int32
+    """
+
+    __slots__ = ('offsets', 'indices')
+
+    def __init__(self, offsets, indices):
+        self.offsets = np.asarray(offsets, dtype=np.int32)
+        self.indices = np.asarray(indices, dtype=np.int32)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from an iterable of index lists"""
+        offsets = [0]
+        indices = []
+        for row in rows:
+            indices.extend(row)
+            offsets.append(len(indices))
+        return cls(offsets, indices)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def row(self, i):
+        return self.indices[self.offsets[i]:self.offsets[i + 1]]
+
+    def to_lists(self):
+        return [self.row(i).tolist() for i in range(len(self))]
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.indices.nbytes
+
+
+class CompactTopology(object):
+    """
+    Topology as typed arrays: vertex coordinates, per-entity type codes and
+    CSR relations indexed by the model's unique faces, edges, wires, shells
+    and solids, plus the coedge table when it was built. Serializes to NPZ
+    (or Arrow) straight from its buffers.
+    """
+
+    __slots__ = ('vertices', 'face_surface_type', 'edge_curve_type', 'relations', 'coedges')
+
+    # relation name -> (row entity, target entity)
+    RELATIONS = {
+        'face_edges': ('faces', 'edges'),
+        'face_wires': ('faces', 'wires'),
+        'edge_vertices': ('edges', 'vertices'),
+        'wire_edges': ('wires', 'edges'),  # in wire order
+        'shell_faces': ('shells', 'faces'),
+        'solid_faces': ('solids', 'faces'),
+    }
+
+    def __init__(self, vertices, face_surface_type, edge_curve_type, relations, coedges=None):
+        self.vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        self.face_surface_type = np.asarray(face_surface_type, dtype=np.int8)
+        self.edge_curve_type = np.asarray(edge_curve_type, dtype=np.int8)
+        self.relations = relations  # name -> CsrRelation
+        self.coedges = coedges      # CoedgeTable or None
+
+    def counts(self):
+        counts = {'vertices': len(self.vertices)}
+        for name, (entity, target) in self.RELATIONS.items():
+            counts[entity] = len(self.relations[name])
+        if self.coedges is not None:
+            counts['coedges'] = len(self.coedges)
+        return counts
+
+    @property
+    def nbytes(self):
+        return (self.vertices.nbytes + self.face_surface_type.nbytes + self.edge_curve_type.nbytes
+                + sum(relation.nbytes for relation in self.relations.values())
+                + (self.coedges.nbytes if self.coedges is not None else 0))
+
+    def arrays(self):
+        """Flat name -> ndarray mapping (views, no copies)"""
+        arrays = {
+            'vertices': self.vertices,
+            'face_surface_type': self.face_surface_type,
+            'edge_curve_type': self.edge_curve_type,
+        }
+        for name, relation in self.relations.items():
+            arrays[f"{name}_offsets"] = relation.offsets
+            arrays[f"{name}_indices"] = relation.indices
+        if self.coedges is not None:
+            arrays.update(self.coedges.arrays())
+        return arrays
+
+    def to_npz(self, file):
+        np.savez(file, **self.arrays())
+
+    @classmethod
+    def from_npz(cls, file):
+        with np.load(file) as data:
+            relations = {name: CsrRelation(data[f"{name}_offsets"], data[f"{name}_indices"])
+                         for name in cls.RELATIONS}
+            coedges = CoedgeTable.from_arrays(data) if 'coedge_edge' in data else None
+            return cls(data['vertices'], data['face_surface_type'], data['edge_curve_type'], relations, coedges)
+
+    def to_arrow(self, file):
+        """Write one Arrow IPC stream per entity table into a zip (requires pyarrow)"""
+        import pyarrow as pa
+
+        def list_column(relation):
+            return pa.ListArray.from_arrays(pa.array(relation.offsets), pa.array(relation.indices))
+
+        tables = {
+            'vertices': pa.table({'xyz': pa.FixedSizeListArray.from_arrays(
+                pa.array(self.vertices.ravel()), 3)}),
+            'faces': pa.table({'surface_type': pa.array(self.face_surface_type),
+                               'edges': list_column(self.relations['face_edges']),
+                               'wires': list_column(self.relations['face_wires'])}),
+            'edges': pa.table({'curve_type': pa.array(self.edge_curve_type),
+                               'vertices': list_column(self.relations['edge_vertices'])}),
+            'wires': pa.table({'edges': list_column(self.relations['wire_edges'])}),
+            'shells': pa.table({'faces': list_column(self.relations['shell_faces'])}),
+            'solids': pa.table({'faces': list_column(self.relations['solid_faces'])}),
+        }
+        if self.coedges is not None:
+            tables['coedges'] = pa.table({name: pa.array(getattr(self.coedges, name))
+                                          for name in CoedgeTable.COLUMNS})
+        with zipfile.ZipFile(file, 'w') as archive:
+            for name, table in tables.items():
+                sink = pa.BufferOutputStream()
+                with pa.ipc.new_stream(sink, table.schema) as writer:
+                    writer.write_table(table)
+                archive.writestr(f"{name}.arrow", sink.getvalue().to_pybytes())
+
+    def to_dict(self):
+        return {
+            'counts': self.counts(),
+            'vertices': self.vertices.tolist(),
+            'face_surface_type': self.face_surface_type.tolist(),
+            'edge_curve_type': self.edge_curve_type.tolist(),
+            'relations': {name: {'offsets': relation.offsets.tolist(), 'indices': relation.indices.tolist()}
+                          for name, relation in self.relations.items()},
+            'coedges': self.coedges.to_dict() if self.coedges is not None else None,
+            'codes': {'surface_type': list(SURFACE_TYPE_NAMES), 'curve_type': list(CURVE_TYPE_NAMES)}
+        }
+
+
+class CoedgeTable(object):
+    """
+    Oriented uses of edges by wires (half-edges), one row per coedge, with
+    the coedges of every wire stored contiguously in wire order. Columns are
+    int32 indices into the model's unique edges, faces, wires, vertices and
+    coedges: face is -1 for wires outside any face, vertex is the start
+    vertex along the wire, next/prev wrap around closed wires (-1 at the ends
+    of open ones) and mate is the coedge of the same edge on the other side
+    (-1 for boundary edges; a cycle through all uses on non-manifold edges).
+    A seam edge gives two coedges of the same face that are each other's mate.
+    """
+
+    __slots__ = ('edge', 'face', 'wire', 'vertex', 'next', 'prev', 'mate', 'reversed', 'wire_coedges')
+
+    COLUMNS = ('edge', 'face', 'wire', 'vertex', 'next', 'prev', 'mate', 'reversed')
+
+    def __init__(self, edge, face, wire, vertex, next, prev, mate, reversed, wire_coedges):
+        self.edge = np.asarray(edge, dtype=np.int32)
+        self.face = np.asarray(face, dtype=np.int32)
+        self.wire = np.asarray(wire, dtype=np.int32)
+        self.vertex = np.asarray(vertex, dtype=np.int32)
+        self.next = np.asarray(next, dtype=np.int32)
+        self.prev = np.asarray(prev, dtype=np.int32)
+        self.mate = np.asarray(mate, dtype=np.int32)
+        self.reversed = np.asarray(reversed, dtype=np.int8)
+        self.wire_coedges = wire_coedges  # CsrRelation wire -> coedges in order
+
+    @classmethod
+    def from_arrays(cls, data):
+        columns = [data[f"coedge_{name}"] for name in cls.COLUMNS]
+        return cls(*columns, CsrRelation(data['wire_coedges_offsets'], data['wire_coedges_indices']))
+
+    def __len__(self):
+        return len(self.edge)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.COLUMNS) + self.wire_coedges.nbytes
+
+    def arrays(self):
+        """Flat name -> ndarray mapping (views, no copies)"""
+        arrays = {f"coedge_{name}": getattr(self, name) for name in self.COLUMNS}
+        arrays['wire_coedges_offsets'] = self.wire_coedges.offsets
+        arrays['wire_coedges_indices'] = self.wire_coedges.indices
+        return arrays
+
+    def _distinct(self, column, wire_index):
+        values = []
+        seen = set()
+        for value in column[self.wire_coedges.row(wire_index)].tolist():
+            if value not in seen:
+                seen.add(value)
+                values.append(value)
+        return values
+
+    def ordered_edges(self, wire_index):
+        """Edge indices along a wire, a seam edge only once"""
+        return self._distinct(self.edge, wire_index)
+
+    def ordered_vertices(self, wire_index):
+        """Start vertex indices along a wire, each only once"""
+        return self._distinct(self.vertex, wire_index)
+
+    def to_dict(self):
+        table = {name: getattr(self, name).tolist() for name in self.COLUMNS}
+        table['wire_coedges'] = {'offsets': self.wire_coedges.offsets.tolist(),
+                                 'indices': self.wire_coedges.indices.tolist()}
+        return table
+
+
+# === Dual graphs === #
+# Face-face links through shared edges and edge-edge links through shared
+# vertices. Links are directed (both directions are listed) and indices are
+# the /parse-step output indices.
+DUAL_GRAPH_FORMATS = ('coo', 'csr')
+
+
+def resolve_graph_format(value):
+    """Validate a requested dual graph format, falling back to COO"""
+    graph_format = (value or 'coo').strip().lower()
+    if graph_format not in DUAL_GRAPH_FORMATS:
+        raise ValueError(f"Unknown graph_format '{graph_format}', expected one of: {', '.join(DUAL_GRAPH_FORMATS)}")
+    return graph_format
+
+
+def sparse_links(rows, attribute_names, graph_format):
+    """Serialize per-source link lists [(target, *attributes)] as COO or CSR columns"""
+    relation = CsrRelation.from_rows([link[0] for link in row] for row in rows)
+    if graph_format == 'csr':
+        data = {'offsets': relation.offsets.tolist(), 'indices': relation.indices.tolist()}
+    else:
+        sources = np.repeat(np.arange(len(relation), dtype=np.int32), np.diff(relation.offsets))
+        data = {'rows': sources.tolist(), 'cols': relation.indices.tolist()}
+    for position, name in enumerate(attribute_names, 1):
+        data[name] = [link[position] for row in rows for link in row]
+    data['shape'] = [len(rows), len(rows)]
+    return data
+
+
+def dual_graphs(num_faces, edge_faces, vertex_edges, convexity, dihedral_angle, graph_format='coo'):
+    """
+    Dual graphs from the distinct faces of every edge (edge_faces) and the
+    distinct edges of every vertex (vertex_edges). Face-face links carry the
+    shared edge with its convexity code and dihedral angle, edge-edge links the
+    shared vertex. Edges with fewer than two faces link no faces.
+    """
+    face_rows = [[] for _ in range(num_faces)]
+    for edge_index, faces in enumerate(edge_faces):
+        for source in faces:
+            for target in faces:
+                if source != target:
+                    face_rows[source].append((target, edge_index, convexity[edge_index],
+                                              dihedral_angle[edge_index]))
+
+    edge_rows = [[] for _ in edge_faces]
+    for vertex_index, edges in enumerate(vertex_edges):
+        for source in edges:
+            for target in edges:
+                if source != target:
+                    edge_rows[source].append((target, vertex_index))
+
+    return {
+        'format': graph_format,
+        'face_face': sparse_links(face_rows, ('edge', 'convexity', 'dihedral_angle'), graph_format),
+        'edge_edge': sparse_links(edge_rows, ('vertex',), graph_format),
+        'codes': {'convexity': EDGE_CONVEXITY_CODES}
+    }
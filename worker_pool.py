@@ -0,0 +1,175 @@
+"""Supervised pool of worker processes for work that can hang or crash inside OCC.
+
+Each worker process is handed one task at a time over a pipe, so the pool
+always knows which task every worker is on. A worker past the per-task
+timeout, or one that died, is killed and replaced and its task is reported
+as 'timeout' or 'crashed'. Workers are also replaced after max_tasks tasks
+to return memory leaked by OCC. Used by /parse-step-batch in app.py and by
+convert_dataset.py; nothing here imports OpenCASCADE. Workers start with the
+default multiprocessing start method unless a context is given; a threaded
+caller should pass a forkserver or spawn context, whose workers import target
+by name instead of inheriting the caller's locks.
+"""
+import multiprocessing
+import multiprocessing.connection
+import time
+
+
+def worker_main(conn, target, args):
+    """
+    Run target(task, *args) for the tasks sent over conn one at a time, sending
+    back its record (a dict, 'status' defaults to 'success') for each
+    """
+    while True:
+        task = conn.recv()
+        if task is None:
+            return
+        start = time.perf_counter()
+        try:
+            record = target(task, *args)
+            record.setdefault('status', 'success')
+        except Exception as e:
+            record = {'status': 'error', 'error': str(e)}
+        record['seconds'] = round(time.perf_counter() - start, 3)
+        conn.send(record)
+
+
+class PoolWorker(object):
+    """
+    One worker process and the pipe it receives tasks and returns records on
+    """
+
+    def __init__(self, target, args, context=None):
+        context = context or multiprocessing
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child_conn, target, args), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.key = None
+        self.task = None
+        self.started_at = None
+        self.timeout = None
+        self.completed = 0
+
+    @property
+    def busy(self):
+        return self.started_at is not None
+
+    def submit(self, key, task, timeout):
+        self.conn.send(task)
+        self.key = key
+        self.task = task
+        self.timeout = timeout
+        self.started_at = time.time()
+
+    def finish(self):
+        key = self.key
+        self.key = self.task = self.started_at = self.timeout = None
+        self.completed += 1
+        return key
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool(object):
+    """
+    Up to size worker processes running target(task, *args). Workers start on
+    the first submit() that needs one; wait() returns the records of finished
+    tasks and kills workers past their timeout. close() kills workers that are
+    still busy, so it never blocks on a stuck task. context is the
+    multiprocessing context workers start from (the default one if None).
+    """
+
+    def __init__(self, size, timeout, target, args=(), max_tasks=None, context=None):
+        self.size = size
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+        self.target = target
+        self.args = args
+        self.context = context
+        self.workers = []
+
+    @property
+    def busy(self):
+        return sum(1 for worker in self.workers if worker.busy)
+
+    def idle(self):
+        """Number of tasks that can be submitted without waiting"""
+        return self.size - self.busy
+
+    def submit(self, key, task, timeout=None):
+        """Start a task on an idle worker; key identifies it in the records of wait()"""
+        worker = next((worker for worker in self.workers if not worker.busy), None)
+        if worker is None:
+            if len(self.workers) >= self.size:
+                raise RuntimeError('No idle worker')
+            worker = PoolWorker(self.target, self.args, self.context)
+            self.workers.append(worker)
+        worker.submit(key, task, self.timeout if timeout is None else timeout)
+
+    def _result(self, worker, now):
+        """Record of the worker's current task if it finished, failed or overran, else None"""
+        if worker.conn.poll():
+            try:
+                return worker.conn.recv()
+            except EOFError:
+                return {'status': 'crashed', 'error': 'Worker process died'}
+        if not worker.process.is_alive():
+            return {'status': 'crashed', 'error': f'Worker process died with exit code {worker.process.exitcode}'}
+        if worker.timeout and now - worker.started_at > worker.timeout:
+            return {'status': 'timeout', 'error': f'Exceeded {worker.timeout:.0f}s',
+                    'seconds': round(now - worker.started_at, 3)}
+        return None
+
+    def wait(self, timeout=1.0):
+        """Wait up to timeout seconds for busy workers; returns [(key, record)] of the tasks that ended"""
+        busy = [worker for worker in self.workers if worker.busy]
+        if not busy:
+            return []
+        multiprocessing.connection.wait([worker.conn for worker in busy]
+                                        + [worker.process.sentinel for worker in busy], timeout=timeout)
+        now = time.time()
+        done = []
+        for worker in busy:
+            record = self._result(worker, now)
+            if record is None:
+                continue
+            done.append((worker.finish(), record))
+
+            failed = record['status'] in ('timeout', 'crashed')
+            if failed or (self.max_tasks and worker.completed >= self.max_tasks):
+                # Replaced by the next submit()
+                worker.stop(kill=failed)
+                self.workers.remove(worker)
+        return done
+
+    def run(self, tasks, on_done):
+        """Run all tasks, calling on_done(task, record) as each one finishes"""
+        pending = iter(tasks)
+        try:
+            while True:
+                while self.idle():
+                    task = next(pending, None)
+                    if task is None:
+                        break
+                    self.submit(task, task)
+                if not self.busy:
+                    break
+                for task, record in self.wait():
+                    on_done(task, record)
+        finally:
+            self.close()
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop(kill=worker.busy)
+        self.workers = []